@@ -1,73 +1,215 @@
-"""DynamoDB-backed client store with in-memory TTL cache."""
+"""DynamoDB-backed client store (low-level client) with in-memory LRU + TTL cache."""
 
+import asyncio
+import hashlib
+import threading
 import time
+from collections import OrderedDict
+from collections.abc import Callable
+from operator import itemgetter
 
 from src.clients.models import ClientConfig
 from src.clients.store import ClientStore
 
+# boto3 clients by region, shared by every store instance in the process so a
+# rebuilt store (settings reload, tests) reuses the pooled keep-alive connections
+_shared_clients: dict[str, object] = {}
+_shared_clients_lock = threading.Lock()  # first use may race in to_thread workers
+
+
+def _miss_key(api_key: str) -> bytes:
+    """Fixed-size negative-cache key.
+
+    Missed keys are caller-supplied and unbounded in length (anything up to
+    the header size limit); a 16-byte digest caps each entry's footprint.
+    """
+    return hashlib.blake2b(api_key.encode(), digest_size=16).digest()
+
+
+def _shared_client(region: str):
+    client = _shared_clients.get(region)
+    if client is None:
+        with _shared_clients_lock:
+            client = _shared_clients.get(region)
+            if client is None:
+                import boto3
+                from botocore.config import Config
+
+                # Keep pooled HTTPS connections alive across warm invocations
+                config = Config(
+                    tcp_keepalive=True,
+                    max_pool_connections=10,
+                    retries={"mode": "adaptive", "max_attempts": 3},
+                )
+                client = boto3.client("dynamodb", region_name=region, config=config)
+                _shared_clients[region] = client
+    return client
+
 
 class DynamoDBClientStore(ClientStore):
     """Looks up client config from a DynamoDB table with GSI on api_key."""
 
     CACHE_TTL = 300  # 5 minutes
-
-    def __init__(self, table_name: str, region: str = "us-east-1"):
+    CACHE_MAX_SIZE = 1024  # least-recently-used entries evicted beyond this
+    NEGATIVE_CACHE_MAX_SIZE = 4096
+
+    def __init__(
+        self,
+        table_name: str,
+        region: str = "us-east-1",
+        negative_cache_ttl: float = 5.0,
+    ):
         self._table_name = table_name
         self._region = region
-        self._table = None
-        self._cache: dict[str, tuple[ClientConfig, float]] = {}
-
-    def _get_table(self):
-        """Lazy-init boto3 Table resource."""
-        if self._table is None:
-            import boto3
-
-            dynamodb = boto3.resource("dynamodb", region_name=self._region)
-            self._table = dynamodb.Table(self._table_name)
-        return self._table
+        self._client = None
+        self._cache: OrderedDict[str, tuple[ClientConfig, float]] = OrderedDict()
+        # Unknown keys -> expiry. Short TTL so new clients are picked up quickly.
+        self._negative_cache_ttl = negative_cache_ttl
+        self._neg_cache: OrderedDict[bytes, float] = OrderedDict()
+        # In-flight lookups, so concurrent misses for one key share a query
+        self._inflight: dict[str, asyncio.Task] = {}
+
+    def _get_client(self):
+        """Lazy-init low-level boto3 DynamoDB client (shared per region)."""
+        if self._client is None:
+            self._client = _shared_client(self._region)
+        return self._client
+
+    def warm(self) -> None:
+        """Build the boto3 client now (e.g. during Lambda init) instead of on first request."""
+        self._get_client()
 
     async def get_by_api_key(self, api_key: str) -> ClientConfig | None:
         # Check cache first
-        if api_key in self._cache:
-            config, expires_at = self._cache[api_key]
+        cached = self._cache.get(api_key)
+        if cached is not None:
+            config, expires_at = cached
             if time.monotonic() < expires_at:
+                self._cache.move_to_end(api_key)
                 return config
             # Expired — remove and re-query
             del self._cache[api_key]
 
-        import asyncio
-
+        # Recently-missed key — skip the query during a burst of bad keys
+        miss_key = _miss_key(api_key)
+        neg_expires_at = self._neg_cache.get(miss_key)
+        if neg_expires_at is not None:
+            if time.monotonic() < neg_expires_at:
+                return None
+            del self._neg_cache[miss_key]
+
+        task = self._inflight.get(api_key)
+        if task is None:
+            task = asyncio.ensure_future(self._fetch(api_key))
+            self._inflight[api_key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(api_key, None))
+
+        # Shield so one cancelled waiter doesn't cancel the lookup for the rest
+        return await asyncio.shield(task)
+
+    def load_all(self) -> int:
+        """Scan the whole table into the cache (blocking). Returns clients loaded.
+
+        For bounded client rosters: one paginated Scan replaces a Query per
+        key, and a periodic refresh keeps lookups pure cache hits.
+        """
+        client = self._get_client()
+        expires_at = time.monotonic() + self.CACHE_TTL
+        count = 0
+        kwargs = {
+            "TableName": self._table_name,
+            "ProjectionExpression": _PROJECTION,
+            "ExpressionAttributeNames": _PROJECTION_NAMES,
+        }
+        while True:
+            resp = client.scan(**kwargs)
+            for item in resp.get("Items", []):
+                config = _item_to_config(item)
+                self._remember(config.api_key, config, expires_at)
+                self._neg_cache.pop(_miss_key(config.api_key), None)
+                count += 1
+            last_key = resp.get("LastEvaluatedKey")
+            if not last_key:
+                return count
+            kwargs["ExclusiveStartKey"] = last_key
+
+    async def prefetch(self) -> int:
+        """load_all() off the event loop."""
+        return await asyncio.to_thread(self.load_all)
+
+    def _remember(self, api_key: str, config: ClientConfig, expires_at: float) -> None:
+        self._cache[api_key] = (config, expires_at)
+        self._cache.move_to_end(api_key)
+        if len(self._cache) > self.CACHE_MAX_SIZE:
+            self._cache.popitem(last=False)
+
+    async def _fetch(self, api_key: str) -> ClientConfig | None:
+        """Query DynamoDB off the event loop and populate the caches."""
         result = await asyncio.to_thread(self._query_by_key, api_key)
 
-        # Only cache hits — don't cache None (avoids stale denial for new clients)
         if result is not None:
-            self._cache[api_key] = (result, time.monotonic() + self.CACHE_TTL)
+            self._remember(api_key, result, time.monotonic() + self.CACHE_TTL)
+        elif self._negative_cache_ttl > 0:
+            # Misses only live for a few seconds (avoids stale denial for new clients)
+            miss_key = _miss_key(api_key)
+            self._neg_cache[miss_key] = time.monotonic() + self._negative_cache_ttl
+            self._neg_cache.move_to_end(miss_key)
+            if len(self._neg_cache) > self.NEGATIVE_CACHE_MAX_SIZE:
+                self._neg_cache.popitem(last=False)
 
         return result
 
     def _query_by_key(self, api_key: str) -> ClientConfig | None:
-        """Query GSI for a client by api_key."""
-        from boto3.dynamodb.conditions import Key
+        """Query GSI for a client by api_key.
 
-        table = self._get_table()
-        resp = table.query(
+        Uses the low-level client with a literal key expression — skips the
+        resource layer's (de)serializers and the conditions expression builder.
+        """
+        resp = self._get_client().query(
+            TableName=self._table_name,
             IndexName="api_key_index",
-            KeyConditionExpression=Key("api_key").eq(api_key),
+            KeyConditionExpression="api_key = :k",
+            ExpressionAttributeValues={":k": {"S": api_key}},
+            ProjectionExpression=_PROJECTION,
+            ExpressionAttributeNames=_PROJECTION_NAMES,
             Limit=1,
         )
 
         items = resp.get("Items", [])
         if not items:
             return None
-
-        item = items[0]
-        return ClientConfig(
-            client_id=item["client_id"],
-            api_key=item["api_key"],
-            provider=item.get("provider", "openai"),
-            rate_limit_rpm=int(item.get("rate_limit_rpm", 60)),
-            model_allowlist=item.get("model_allowlist", []),
-            upstream_api_key=item.get("upstream_api_key", ""),
-            bedrock_model_id=item.get("bedrock_model_id", ""),
-            status=item.get("status", "active"),
-        )
+        return _item_to_config(items[0])
+
+
+def _string_list(attr: dict) -> list[str]:
+    """A string list stored as either L (list of S) or SS (string set)."""
+    if "SS" in attr:
+        return list(attr["SS"])
+    return [entry["S"] for entry in attr.get("L", [])]
+
+
+# Typed attribute decoder per ClientConfig field. Absent attributes are left
+# out so ClientConfig's own defaults apply, as for the JSON store.
+_FIELD_DECODERS: tuple[tuple[str, Callable[[dict], object]], ...] = (
+    ("client_id", itemgetter("S")),
+    ("api_key", itemgetter("S")),
+    ("provider", itemgetter("S")),
+    ("rate_limit_rpm", lambda attr: int(attr["N"])),
+    ("model_allowlist", _string_list),
+    ("upstream_api_key", itemgetter("S")),
+    ("bedrock_model_id", itemgetter("S")),
+    ("status", itemgetter("S")),
+    ("max_prompt_chars", lambda attr: int(attr["N"])),
+)
+
+# Fetch only the ClientConfig attributes, not whatever else the table's items
+# carry. Names go through placeholders: "status" is a DynamoDB reserved word.
+_PROJECTION_NAMES = {f"#f{i}": name for i, (name, _) in enumerate(_FIELD_DECODERS)}
+_PROJECTION = ", ".join(_PROJECTION_NAMES)
+
+
+def _item_to_config(item: dict) -> ClientConfig:
+    """Build a ClientConfig from a low-level (typed) DynamoDB item."""
+    return ClientConfig(**{
+        name: decode(item[name]) for name, decode in _FIELD_DECODERS if name in item
+    })
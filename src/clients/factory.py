@@ -28,6 +28,7 @@ def get_client_store() -> ClientStore | None:
         _store = DynamoDBClientStore(
             table_name=settings.dynamodb_table_name,
             region=settings.aws_region,
+            negative_cache_ttl=settings.client_negative_cache_ttl,
         )
         return _store
 
@@ -3,7 +3,7 @@
 from dataclasses import dataclass, field
 
 
-@dataclass
+@dataclass(slots=True)
 class ClientConfig:
     client_id: str
     api_key: str
@@ -13,3 +13,4 @@ class ClientConfig:
     upstream_api_key: str = ""  # per-client upstream key (falls back to global)
     bedrock_model_id: str = ""  # e.g. "anthropic.claude-3-sonnet-20240229-v1:0"
     status: str = "active"  # "active" | "suspended"
+    max_prompt_chars: int = 0  # 0 = use the global MAX_PROMPT_CHARS
@@ -1,58 +1,86 @@
 """Client store abstraction + JSON file implementation."""
 
-import hmac
-import json
+import hashlib
 import os
-from abc import ABC, abstractmethod
+import time
+
+import orjson
 
 from src.clients.models import ClientConfig
 
 
-class ClientStore(ABC):
-    """Abstract base for client config lookups."""
+class ClientStore:
+    """Base for client config lookups. Subclasses implement get_by_api_key."""
 
-    @abstractmethod
     async def get_by_api_key(self, api_key: str) -> ClientConfig | None:
         """Look up a client by API key. Returns None if not found."""
-        ...
+        raise NotImplementedError(f"{type(self).__name__} does not implement get_by_api_key")
+
+    def warm(self) -> None:
+        """Eagerly initialize backend resources. No-op by default."""
+
+    def load_all(self) -> int:
+        """Bulk-load every client into the lookup cache (blocking). No-op by default."""
+        return 0
+
+    async def prefetch(self) -> int:
+        """Async load_all(); backends doing I/O run it off the event loop."""
+        return self.load_all()
 
 
 class JSONClientStore(ClientStore):
     """File-backed client store. Reloads on mtime change."""
 
+    STAT_INTERVAL = 2.0  # seconds between mtime checks
+
     def __init__(self, path: str):
         self._path = path
         self._clients: list[ClientConfig] = []
+        self._by_digest: dict[bytes, ClientConfig] = {}
         self._last_mtime: float = 0.0
+        self._last_stat: float = 0.0
         self._load()
 
     def _load(self) -> None:
         """Load clients from JSON file."""
+        # Stat at most once per interval — avoids a syscall on every request
+        now = time.monotonic()
+        if self._last_stat and now - self._last_stat < self.STAT_INTERVAL:
+            return
+        self._last_stat = now
+
         try:
             mtime = os.path.getmtime(self._path)
         except OSError:
             self._clients = []
+            self._by_digest = {}
             return
 
         if mtime == self._last_mtime and self._clients:
             return
 
-        with open(self._path, encoding="utf-8") as f:
-            data = json.load(f)
+        with open(self._path, "rb") as f:
+            data = orjson.loads(f.read())
 
         self._clients = [
             ClientConfig(**entry) for entry in data.get("clients", [])
         ]
+        # Index by SHA-256 digest: lookups probe a hash of the key, never the raw secret
+        self._by_digest = {}
+        for client in self._clients:
+            self._by_digest[_digest(client.api_key)] = client
         self._last_mtime = mtime
 
     async def get_by_api_key(self, api_key: str) -> ClientConfig | None:
-        """Constant-time key lookup across all clients."""
+        """O(1) key lookup by SHA-256 digest.
+
+        The dict lookup is the comparison. Its timing can only leak how much of
+        a digest matched, which says nothing about the key that produced it.
+        """
         self._load()  # reload if file changed
+        return self._by_digest.get(_digest(api_key))
 
-        match: ClientConfig | None = None
-        for client in self._clients:
-            # Always iterate all keys to maintain constant-time behavior
-            if hmac.compare_digest(api_key, client.api_key):
-                match = client
 
-        return match
+def _digest(api_key: str) -> bytes:
+    """SHA-256 digest of an API key, used for fixed-length comparisons."""
+    return hashlib.sha256(api_key.encode()).digest()
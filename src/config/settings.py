@@ -1,6 +1,6 @@
 """Application settings loaded from environment variables."""
 
-from functools import lru_cache
+from functools import cached_property, lru_cache
 
 from pydantic_settings import BaseSettings
 
@@ -14,17 +14,35 @@ class Settings(BaseSettings):
     # Upstream LLM provider
     upstream_base_url: str = "https://api.openai.com"
     upstream_api_key: str = ""
+    upstream_http2: bool = True  # set false for upstreams that only speak HTTP/1.1
+    upstream_max_connections: int = 512
+    upstream_max_keepalive: int = 256
 
     # Security pipeline
     injection_threshold: float = 0.7  # Risk score at which to block (0.0-1.0)
     pii_action: str = "redact"  # redact | block | log_only
     response_pii_action: str = "log_only"  # redact | block | log_only
     rate_limit_rpm: int = 60  # Requests per minute per client
+    rate_limit_algorithm: str = "token_bucket"  # "token_bucket" | "sliding_window" (exact, O(limit) memory)
+    max_prompt_chars: int = 0  # Reject prompts longer than this before scanning (0 = no limit)
+
+    # Response cache (exact match, non-streaming only)
+    response_cache_ttl: float = 0.0  # seconds to keep responses (0 = off)
+    response_cache_max_size: int = 1024
+    response_cache_max_temperature: float = 0.2  # skip caching above this temperature
+    request_coalescing: bool = False  # share one upstream call among identical temperature-0 requests
+
+    # Bedrock
+    bedrock_transport: str = "boto3"  # "boto3" | "aioboto3" (requires aioboto3 installed) | "httpx"
+    bedrock_max_workers: int = 64  # boto3 transport thread pool size
+    bedrock_prompt_caching: bool = False  # add cachePoint markers after long prompt prefixes
 
     # Client store
     client_store_backend: str = "json"  # "json" | "dynamodb"
     client_config_path: str = "clients.json"  # path to JSON client config
     dynamodb_table_name: str = "llm-gateway-clients"
+    client_negative_cache_ttl: float = 5.0  # seconds to remember unknown keys (0 = off)
+    client_prefetch_interval: float = 0.0  # seconds between full DynamoDB table loads (0 = off; lifespan only, so not on Lambda)
     aws_region: str = "us-east-1"
 
     # Logging
@@ -33,12 +51,30 @@ class Settings(BaseSettings):
 
     model_config = {"env_file": ".env", "env_file_encoding": "utf-8"}
 
-    @property
-    def api_keys_list(self) -> list[str]:
-        """Parse comma-separated API keys into a set for O(1) lookup."""
-        return [k.strip() for k in self.gateway_api_keys.split(",") if k.strip()]
+    @cached_property
+    def api_keys_list(self) -> frozenset[str]:
+        """Parse comma-separated API keys into a set for O(1) lookup (parsed once)."""
+        return frozenset(k.strip() for k in self.gateway_api_keys.split(",") if k.strip())
+
+    # Normalized once per Settings instance so scanners don't re-derive them per
+    # request; a cache_clear() builds a new instance and recomputes them.
+    @cached_property
+    def pii_mode(self) -> str:
+        """pii_action lowercased (redact | block | log_only)."""
+        return self.pii_action.lower()
+
+    @cached_property
+    def response_pii_mode(self) -> str:
+        """response_pii_action lowercased (redact | block | log_only)."""
+        return self.response_pii_action.lower()
 
 
 @lru_cache
 def get_settings() -> Settings:
+    """Process-wide settings, parsed from the environment once.
+
+    Field reads on a pydantic v2 model are plain instance-dict lookups, so hot
+    paths may call this freely. Kept behind lru_cache (not frozen into module
+    constants) so get_settings.cache_clear() can re-read the environment.
+    """
     return Settings()
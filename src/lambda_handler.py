@@ -2,10 +2,18 @@
 
 Mangum translates API Gateway HTTP API (v2) events into ASGI,
 letting the existing FastAPI app run unchanged on Lambda.
+
+The client store is built at import time so boto3/botocore service-model
+loading happens during the Lambda init phase, not on the first request.
 """
 
 from mangum import Mangum
 
+from src.clients.factory import get_client_store
 from src.main import app
 
+_store = get_client_store()
+if _store is not None:
+    _store.warm()
+
 handler = Mangum(app, lifespan="off")
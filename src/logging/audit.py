@@ -7,35 +7,63 @@ Downstream log aggregators (CloudWatch, Elastic, Splunk) ingest
 structured JSON directly — no parsing rules needed.
 """
 
-import json
 import logging
+import os
 import sys
 import time
-import uuid
-from datetime import datetime, timezone
 from contextvars import ContextVar
 
+import orjson
+
 from src.config.settings import get_settings
 
 # Request-scoped context for correlating log entries
 request_id_var: ContextVar[str] = ContextVar("request_id", default="")
 
+# Request-scoped fields (client_id, client_ip, ...) merged into every log entry,
+# so individual log calls only pass what is specific to them
+audit_base_var: ContextVar[dict] = ContextVar("audit_base", default={})
+
+# (whole second, formatted "YYYY-MM-DDTHH:MM:SS") — reused for all records in that second
+_ts_cache: tuple[int, str] = (-1, "")
+
+
+def _iso_timestamp(created: float) -> str:
+    """Format an epoch timestamp as ISO-8601 UTC with microseconds.
+
+    Same output as datetime.fromtimestamp(created, tz=timezone.utc)
+    .isoformat(timespec="microseconds") (always six fraction digits, rounded
+    half-to-even like datetime), without building a datetime per record.
+    """
+    global _ts_cache
+    second = int(created)
+    micros = round((created - second) * 1_000_000)
+    if micros == 1_000_000:  # rounded up into the next second
+        second += 1
+        micros = 0
+    cached_second, prefix = _ts_cache
+    if second != cached_second:
+        prefix = time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(second))
+        _ts_cache = (second, prefix)
+    return f"{prefix}.{micros:06d}+00:00"
+
 
 class JSONFormatter(logging.Formatter):
     """Formats log records as single-line JSON objects."""
 
     def format(self, record: logging.LogRecord) -> str:
         log_entry = {
-            "timestamp": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(),
+            "timestamp": _iso_timestamp(record.created),
             "level": record.levelname,
             "logger": record.name,
             "message": record.getMessage(),
             "request_id": request_id_var.get(""),
         }
+        log_entry.update(audit_base_var.get())
         # Merge any extra fields passed via `extra={}` kwarg
         if hasattr(record, "audit_data"):
             log_entry.update(record.audit_data)
-        return json.dumps(log_entry, default=str)
+        return orjson.dumps(log_entry, default=str, option=orjson.OPT_NON_STR_KEYS).decode()
 
 
 def setup_logging() -> None:
@@ -68,7 +96,8 @@ def get_audit_logger() -> logging.Logger:
 
 
 def generate_request_id() -> str:
-    return uuid.uuid4().hex[:12]
+    """12 hex chars (48 random bits) — no uuid.UUID allocation per request."""
+    return os.urandom(6).hex()
 
 
 class RequestTimer:
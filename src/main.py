@@ -4,23 +4,34 @@ A security proxy that sits between applications and LLM APIs,
 enforcing authentication, logging, and security policies.
 """
 
-import json
+import asyncio
+import io
+import logging
 import os
 from contextlib import asynccontextmanager
 
+import orjson
 from fastapi import Depends, FastAPI, Request
-from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from starlette.exceptions import HTTPException as StarletteHTTPException
 
+from src.clients.factory import get_client_store
 from src.clients.models import ClientConfig
 from src.config.settings import get_settings
 from src.logging.audit import (
     RequestTimer,
+    audit_base_var,
     generate_request_id,
     get_audit_logger,
     request_id_var,
     setup_logging,
 )
-from src.proxy.handler import close_client, forward_to_provider, stream_from_provider
+from src.proxy.handler import (
+    close_client,
+    forward_to_provider,
+    preflight_error,
+    stream_from_provider,
+)
 from src.security.auth import verify_api_key
 from src.security.injection import scan_prompt
 from src.security.pii import scan_for_pii
@@ -29,15 +40,44 @@ from src.security.response import scan_response
 
 VERSION = "0.5.0"
 
+# Bound once at import: logging.getLogger returns the same object for the
+# process lifetime, and setup_logging() configures it in place.
+_LOGGER = get_audit_logger()
+
+
+class OrjsonResponse(JSONResponse):
+    """JSONResponse rendered with orjson (much faster on large completions)."""
+
+    def render(self, content) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Startup and shutdown lifecycle hooks."""
     setup_logging()
-    get_audit_logger().info("Gateway started")
+    _LOGGER.info("Gateway started")
+    refresh = None
+    interval = get_settings().client_prefetch_interval
+    store = get_client_store() if interval > 0 else None
+    if store is not None:
+        refresh = asyncio.create_task(_refresh_clients(store, interval))
     yield
+    if refresh is not None:
+        refresh.cancel()
     await close_client()
-    get_audit_logger().info("Gateway stopped")
+    _LOGGER.info("Gateway stopped")
+
+
+async def _refresh_clients(store, interval: float) -> None:
+    """Bulk-load the client store now and every `interval` seconds."""
+    while True:
+        try:
+            count = await store.prefetch()
+            _LOGGER.info("Client store prefetched", extra={"audit_data": {"clients": count}})
+        except Exception:
+            _LOGGER.warning("Client store prefetch failed", exc_info=True)
+        await asyncio.sleep(interval)
 
 
 app = FastAPI(
@@ -45,9 +85,18 @@ app = FastAPI(
     description="Security proxy for LLM API requests",
     version=VERSION,
     lifespan=lifespan,
+    default_response_class=OrjsonResponse,
 )
 
 
+@app.exception_handler(StarletteHTTPException)
+async def http_exception_handler(request: Request, exc: StarletteHTTPException):
+    """FastAPI's default handler, rendered with orjson (auth rejections, upstream errors)."""
+    if exc.status_code in (204, 304):
+        return Response(status_code=exc.status_code, headers=exc.headers)
+    return OrjsonResponse({"detail": exc.detail}, status_code=exc.status_code, headers=exc.headers)
+
+
 @app.get("/health")
 async def health():
     return {"status": "healthy", "version": VERSION}
@@ -59,95 +108,97 @@ async def chat_completions(request: Request, client: ClientConfig = Depends(veri
 
     Pipeline: Auth -> Rate Limit -> Model Allowlist -> Injection Scan -> PII Scan -> Forward -> Response Scan -> Log
     """
-    logger = get_audit_logger()
+    logger = _LOGGER
     rid = generate_request_id()
     request_id_var.set(rid)
 
-    body = await request.json()
+    # Parse raw bytes with orjson (single pass; Request.json() uses stdlib json)
+    body = orjson.loads(await request.body())
     client_ip = request.client.host if request.client else "unknown"
     model = body.get("model", "unknown")
     is_stream = body.get("stream", False)
+    audit_base_var.set({"client_id": client.client_id, "client_ip": client_ip})
 
     # --- Security pipeline ---
 
     # 1. Rate limiting (per-client)
     rate_result = await check_rate_limit(client.client_id, client.rate_limit_rpm)
     if not rate_result.allowed:
-        logger.warning(
-            "Rate limit exceeded",
-            extra={"audit_data": {
-                "client_id": client.client_id,
-                "client_ip": client_ip,
-                "rate_limit": rate_result.limit,
-                "retry_after": rate_result.reset_seconds,
-            }},
-        )
-        return JSONResponse(
+        if logger.isEnabledFor(logging.WARNING):
+            logger.warning(
+                "Rate limit exceeded",
+                extra={"audit_data": {
+                    "rate_limit": rate_result.limit,
+                    "retry_after": rate_result.reset_seconds,
+                }},
+            )
+        return OrjsonResponse(
             status_code=429,
             content={"error": "Rate limit exceeded"},
-            headers={
-                "Retry-After": str(int(rate_result.reset_seconds)),
-                "X-RateLimit-Limit": str(rate_result.limit),
-                "X-RateLimit-Remaining": "0",
-                "X-RateLimit-Reset": str(int(rate_result.reset_seconds)),
-            },
+            headers={"Retry-After": str(int(rate_result.reset_seconds)), **rate_result.headers()},
         )
 
     # 2. Model allowlist check
     if client.model_allowlist and model not in client.model_allowlist:
-        logger.warning(
-            "Model not allowed",
-            extra={"audit_data": {
-                "client_id": client.client_id,
-                "client_ip": client_ip,
-                "model": model,
-                "allowed_models": client.model_allowlist,
-            }},
-        )
-        return JSONResponse(
+        if logger.isEnabledFor(logging.WARNING):
+            logger.warning(
+                "Model not allowed",
+                extra={"audit_data": {
+                    "model": model,
+                    "allowed_models": client.model_allowlist,
+                }},
+            )
+        return OrjsonResponse(
             status_code=403,
             content={"error": f"Model '{model}' not allowed for this client"},
         )
 
+    # Preflight: reject requests the upstream would refuse, before paying for scans
+    error = preflight_error(body, client)
+    if error is not None:
+        if logger.isEnabledFor(logging.WARNING):
+            logger.warning("Request failed preflight", extra={"audit_data": {"reason": error}})
+        return OrjsonResponse(status_code=400, content={"error": error})
+
     # 3. Prompt injection scan
+    # Runs before the PII scan so blocked prompts skip the PII pass entirely.
+    # Both scanners are plain functions: pure CPU-bound regex work, no I/O.
     prompt_content = _extract_prompt_content(body)
-    injection_result = await scan_prompt(prompt_content)
+    injection_result = scan_prompt(prompt_content)
     if not injection_result.allowed:
-        logger.warning(
-            "Prompt injection blocked",
-            extra={"audit_data": {
-                "client_id": client.client_id,
-                "client_ip": client_ip,
-                "risk_score": injection_result.risk_score,
-                "reason": injection_result.reason,
-                "categories": injection_result.matched_categories,
-            }},
-        )
-        return JSONResponse(
+        if logger.isEnabledFor(logging.WARNING):
+            logger.warning(
+                "Prompt injection blocked",
+                extra={"audit_data": {
+                    "risk_score": injection_result.risk_score,
+                    "reason": injection_result.reason,
+                    "categories": injection_result.matched_categories,
+                }},
+            )
+        return OrjsonResponse(
             status_code=400,
             content={"error": "Request blocked by security policy"},
         )
 
     # 4. PII scan
-    pii_result = await scan_for_pii(prompt_content)
+    pii_result = scan_for_pii(prompt_content)
 
-    # Block mode: reject the entire request if PII found
+    # Block mode: reject the entire request if PII found.
+    # scan_for_pii only returns an unredacted, non-clean result when PII_ACTION=block,
+    # so no per-request settings lookup is needed here.
     if not pii_result.clean and pii_result.redacted_content is None and pii_result.detection_count > 0:
-        settings = get_settings()
-        if settings.pii_action == "block":
+        if logger.isEnabledFor(logging.WARNING):
             logger.warning(
                 "PII detected — request blocked",
                 extra={"audit_data": {
-                    "client_id": client.client_id,
-                    "client_ip": client_ip,
                     "pii_types": pii_result.detections,
                     "pii_count": pii_result.detection_count,
                 }},
             )
-            return JSONResponse(
-                status_code=400,
-                content={"error": "Request contains sensitive data (PII)"},
-            )
+        return OrjsonResponse(
+            status_code=400,
+            content={"error": "Request contains sensitive data (PII)"},
+        )
 
     # Redact mode: swap in sanitized content
     if pii_result.redacted_content:
@@ -155,7 +206,7 @@ async def chat_completions(request: Request, client: ClientConfig = Depends(veri
 
     # 5. Lambda guard: reject streaming on Lambda (no SSE support via API Gateway + Mangum)
     if is_stream and os.environ.get("AWS_LAMBDA_FUNCTION_NAME"):
-        return JSONResponse(
+        return OrjsonResponse(
             status_code=400,
             content={"error": "Streaming is not supported in Lambda deployments"},
         )
@@ -163,132 +214,134 @@ async def chat_completions(request: Request, client: ClientConfig = Depends(veri
     # --- Branch: streaming vs non-streaming ---
 
     if is_stream:
-        return await _handle_streaming(body, client, client_ip, model, rid, rate_result,
+        return await _handle_streaming(body, client, model, rid, rate_result,
                                        injection_result, pii_result, logger)
 
     # --- Non-streaming: Forward to upstream ---
     with RequestTimer() as timer:
         result = await forward_to_provider(body, client)
 
-    # Response scanning (non-streaming)
-    response_content = _extract_response_content(result.body)
-    response_scan = await scan_response(response_content)
+    # Response scanning (non-streaming). Upstream errors carry no completion
+    # text, so their body is never parsed.
+    response_content = _extract_response_content(result.body) if result.status_code < 300 else ""
+    response_scan = scan_response(response_content)
 
     if response_scan.blocked:
-        logger.warning(
-            "Response blocked — PII in LLM output",
-            extra={"audit_data": {
-                "client_id": client.client_id,
-                "client_ip": client_ip,
-                "response_pii_types": response_scan.pii.detections,
-                "response_pii_count": response_scan.pii.detection_count,
-            }},
-        )
-        return JSONResponse(
+        if logger.isEnabledFor(logging.WARNING):
+            logger.warning(
+                "Response blocked — PII in LLM output",
+                extra={"audit_data": {
+                    "response_pii_types": response_scan.pii.detections,
+                    "response_pii_count": response_scan.pii.detection_count,
+                }},
+            )
+        return OrjsonResponse(
             status_code=400,
             content={"error": "Response blocked by security policy — contains sensitive data"},
         )
 
     # --- Audit log ---
-    logger.info(
-        "Request proxied",
-        extra={"audit_data": {
-            "client_id": client.client_id,
-            "client_ip": client_ip,
-            "provider": client.provider,
-            "model": model,
-            "upstream_status": result.status_code,
-            "latency_ms": timer.elapsed_ms,
-            "injection_score": injection_result.risk_score,
-            "injection_categories": injection_result.matched_categories,
-            "pii_detections": pii_result.detections,
-            "pii_count": pii_result.detection_count,
-            "response_injection_score": response_scan.injection.risk_score,
-            "response_pii_detections": response_scan.pii.detections,
-            "rate_limit_remaining": rate_result.remaining,
-        }},
-    )
+    if logger.isEnabledFor(logging.INFO):
+        logger.info(
+            "Request proxied",
+            extra={"audit_data": {
+                "provider": client.provider,
+                "model": model,
+                "upstream_status": result.status_code,
+                "latency_ms": timer.elapsed_ms,
+                "injection_score": injection_result.risk_score,
+                "injection_categories": injection_result.matched_categories,
+                "pii_detections": pii_result.detections,
+                "pii_count": pii_result.detection_count,
+                "response_injection_score": response_scan.injection.risk_score,
+                "response_pii_detections": response_scan.pii.detections,
+                "rate_limit_remaining": rate_result.remaining,
+            }},
+        )
 
     # Return upstream response with rate limit headers
-    return JSONResponse(
-        status_code=result.status_code,
-        content=result.body,
-        headers={
-            "X-RateLimit-Limit": str(rate_result.limit),
-            "X-RateLimit-Remaining": str(rate_result.remaining),
-            "X-RateLimit-Reset": str(int(rate_result.reset_seconds)),
-            "X-Request-Id": rid,
-        },
-    )
+    headers = {**rate_result.headers(), "X-Request-Id": rid}
+    if result.raw is not None:
+        # Forward upstream bytes verbatim (with the upstream's media type)
+        # rather than re-serializing the body
+        return Response(
+            content=result.raw, status_code=result.status_code,
+            media_type=result.content_type, headers=headers,
+        )
+    return OrjsonResponse(status_code=result.status_code, content=result.body, headers=headers)
 
 
-async def _handle_streaming(body, client, client_ip, model, rid, rate_result,
+async def _handle_streaming(body, client, model, rid, rate_result,
                              injection_result, pii_result, logger):
     """Handle streaming requests — forward chunks, scan accumulated text at end."""
 
     async def event_generator():
-        accumulated_text = []
+        # Single growable buffer rather than a list of per-token fragments
+        accumulated_text = io.StringIO()
 
         try:
             async for chunk in stream_from_provider(body, client):
                 if chunk.text_delta:
-                    accumulated_text.append(chunk.text_delta)
+                    accumulated_text.write(chunk.text_delta)
 
                 if chunk.is_done:
                     # Scan accumulated response before sending [DONE]
-                    full_text = "".join(accumulated_text)
-                    response_scan = await scan_response(full_text)
+                    full_text = accumulated_text.getvalue()
+                    response_scan = scan_response(full_text)
 
                     # Log response scan results
-                    logger.info(
-                        "Stream completed",
-                        extra={"audit_data": {
-                            "client_id": client.client_id,
-                            "client_ip": client_ip,
-                            "provider": client.provider,
-                            "model": model,
-                            "stream": True,
-                            "injection_score": injection_result.risk_score,
-                            "pii_detections": pii_result.detections,
-                            "response_injection_score": response_scan.injection.risk_score,
-                            "response_pii_detections": response_scan.pii.detections,
-                            "rate_limit_remaining": rate_result.remaining,
-                        }},
-                    )
+                    if logger.isEnabledFor(logging.INFO):
+                        logger.info(
+                            "Stream completed",
+                            extra={"audit_data": {
+                                "provider": client.provider,
+                                "model": model,
+                                "stream": True,
+                                "injection_score": injection_result.risk_score,
+                                "pii_detections": pii_result.detections,
+                                "response_injection_score": response_scan.injection.risk_score,
+                                "response_pii_detections": response_scan.pii.detections,
+                                "rate_limit_remaining": rate_result.remaining,
+                            }},
+                        )
 
                     if response_scan.blocked:
                         # Send error event instead of [DONE]
-                        error_data = json.dumps({
+                        error_data = orjson.dumps({
                             "error": "Response blocked by security policy — contains sensitive data"
                         })
-                        yield f"data: {error_data}\n\n"
+                        yield b"data: " + error_data + b"\n\n"
                         return
 
                     yield "data: [DONE]\n\n"
                     return
 
-                yield f"data: {chunk.data}\n\n"
+                if isinstance(chunk.data, bytes):
+                    yield b"data: " + chunk.data + b"\n\n"
+                else:
+                    yield f"data: {chunk.data}\n\n"
 
         except Exception as e:
-            error_data = json.dumps({"error": str(e)})
-            yield f"data: {error_data}\n\n"
+            error_data = orjson.dumps({"error": str(e)})
+            yield b"data: " + error_data + b"\n\n"
 
     return StreamingResponse(
         event_generator(),
         media_type="text/event-stream",
-        headers={
-            "X-RateLimit-Limit": str(rate_result.limit),
-            "X-RateLimit-Remaining": str(rate_result.remaining),
-            "X-RateLimit-Reset": str(int(rate_result.reset_seconds)),
-            "X-Request-Id": rid,
-            "Cache-Control": "no-cache",
-        },
+        headers={**rate_result.headers(), "X-Request-Id": rid, "Cache-Control": "no-cache"},
     )
 
 
 def _extract_prompt_content(body: dict) -> str:
     """Extract user message content from a chat completions request body."""
     messages = body.get("messages", [])
+
+    # Fast path: single plain-text message (the common case) needs no join
+    if len(messages) == 1:
+        content = messages[0].get("content", "")
+        if isinstance(content, str):
+            return content
+
     parts = []
     for msg in messages:
         content = msg.get("content", "")
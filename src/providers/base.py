@@ -4,16 +4,45 @@ from abc import ABC, abstractmethod
 from collections.abc import AsyncGenerator
 from dataclasses import dataclass
 
+import orjson
+
 
-@dataclass
 class ProviderResponse:
-    status_code: int
-    body: dict
+    """Upstream response. Built from either a parsed body or the raw JSON bytes.
+
+    With raw bytes, body is parsed on first access only, so error responses and
+    pass-through paths that never read it cost no JSON decode. content_type is
+    the upstream's, so forwarded raw bytes keep their real media type (e.g. an
+    HTML error page from a proxy in front of the provider).
+    """
+
+    __slots__ = ("status_code", "raw", "content_type", "_body")
+
+    def __init__(
+        self,
+        status_code: int,
+        body: dict | None = None,
+        raw: bytes | None = None,
+        content_type: str = "application/json",
+    ):
+        self.status_code = status_code
+        self.raw = raw
+        self.content_type = content_type
+        self._body = body
+
+    @property
+    def body(self) -> dict:
+        if self._body is None and self.raw is not None:
+            self._body = orjson.loads(self.raw)
+        return self._body
+
+    def __repr__(self) -> str:
+        return f"ProviderResponse(status_code={self.status_code!r}, body={self.body!r})"
 
 
-@dataclass
+@dataclass(slots=True)
 class StreamChunk:
-    data: str          # Raw SSE payload (JSON string or "[DONE]")
+    data: str | bytes  # Raw SSE payload (JSON string/bytes or "[DONE]")
     is_done: bool      # True for terminal signal
     text_delta: str    # Extracted text for accumulation
 
@@ -1,49 +1,140 @@
-"""AWS Bedrock Converse API provider — translates OpenAI format to/from Bedrock."""
+"""AWS Bedrock Converse API provider — translates OpenAI format to/from Bedrock.
+
+Two transports, selected by BEDROCK_TRANSPORT:
+- boto3 (default): sync client run on a dedicated thread pool
+- aioboto3: native async client, no threadpool hop (optional dependency)
+- httpx: SigV4-signed REST calls on a shared httpx client, no boto3 marshaling
+"""
 
 import asyncio
-import json
+import functools
 import time
 from collections.abc import AsyncGenerator
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote
 
+import httpx
+import orjson
 from fastapi import HTTPException
 
+from src.config.settings import get_settings
 from src.providers.base import LLMProvider, ProviderResponse, StreamChunk
+from src.providers.http import get_http_client
+
+_CACHE_POINT = {"cachePoint": {"type": "default"}}
+
+# Bedrock only caches prefixes of ~1024+ tokens; at ~4 chars/token, skip
+# markers on anything shorter
+CACHE_POINT_MIN_CHARS = 4096
+
 
+def _add_cache_point(blocks: list[dict]) -> None:
+    """Append a cachePoint if the blocks carry enough text and lack one."""
+    if not blocks or "cachePoint" in blocks[-1]:
+        return
+    if sum(len(b.get("text", "")) for b in blocks) >= CACHE_POINT_MIN_CHARS:
+        blocks.append(_CACHE_POINT)
+
+
+# Bedrock stopReason -> OpenAI finish_reason; anything else maps to "stop".
+# tool_use stays "stop": tool calls are not translated, so "tool_calls" would
+# promise a message.tool_calls field that is never sent.
+_FINISH_REASON = {
+    "end_turn": "stop",
+    "stop_sequence": "stop",
+    "max_tokens": "length",
+    "guardrail_intervened": "content_filter",
+    "content_filtered": "content_filter",
+}
 
 class BedrockProvider(LLMProvider):
     """Sends requests to AWS Bedrock via the Converse API."""
 
     def __init__(self):
         self._client = None
+        settings = get_settings()
+        self._transport = settings.bedrock_transport
+        self._prompt_caching = settings.bedrock_prompt_caching
+        # boto3 transport: own pool so Bedrock calls don't queue behind (or
+        # starve) other to_thread users of the default executor
+        self._max_workers = settings.bedrock_max_workers
+        self._executor: ThreadPoolExecutor | None = None
+        # aioboto3 transport: one long-lived client, entered on first use
+        self._session = None
+        self._async_ctx = None
+        self._async_client = None
+        self._async_init_lock = asyncio.Lock()
+        # httpx transport: credentials resolved once, refreshed by botocore
+        self._credentials = None
+        self._http: httpx.AsyncClient | None = None
 
     def _get_client(self):
         """Lazy-init boto3 client (avoids import when not needed)."""
         if self._client is None:
             import boto3
-            from src.config.settings import get_settings
+            from botocore.config import Config
 
             settings = get_settings()
+            # One pooled connection per worker thread (botocore defaults to 10)
             self._client = boto3.client(
-                "bedrock-runtime", region_name=settings.aws_region
+                "bedrock-runtime", region_name=settings.aws_region,
+                config=Config(max_pool_connections=self._max_workers),
             )
         return self._client
 
+    async def _run_blocking(self, fn, **kwargs):
+        """Run a blocking boto3 call on the Bedrock thread pool."""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self._max_workers, thread_name_prefix="bedrock",
+            )
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(fn, **kwargs))
+
+    @staticmethod
+    def _content_blocks(content) -> list[dict]:
+        """Translate OpenAI message content to Converse blocks.
+
+        List content keeps its text parts; an Anthropic-style ``cache_control``
+        on a part becomes a Bedrock cachePoint right after it.
+        """
+        if isinstance(content, str):
+            return [{"text": content}]
+        blocks = []
+        for part in content:
+            if part.get("type", "text") != "text":
+                continue
+            blocks.append({"text": part.get("text", "")})
+            if part.get("cache_control"):
+                blocks.append(_CACHE_POINT)
+        return blocks
+
     @staticmethod
-    def _translate_request(body: dict, model_id: str) -> dict:
-        """Translate OpenAI chat completion request to Bedrock Converse params."""
+    def _translate_request(body: dict, model_id: str, auto_cache: bool = False) -> dict:
+        """Translate OpenAI chat completion request to Bedrock Converse params.
+
+        With auto_cache, cachePoint markers are added after a long system prompt
+        and after a long first user message so Bedrock can reuse the prefix.
+        """
         kwargs = {"modelId": model_id}
 
         # Separate system messages from conversation messages
         system_msgs = []
         converse_msgs = []
         for msg in body.get("messages", []):
+            blocks = BedrockProvider._content_blocks(msg["content"])
+            if msg.get("cache_control") and blocks and blocks[-1] is not _CACHE_POINT:
+                blocks.append(_CACHE_POINT)
             if msg.get("role") == "system":
-                system_msgs.append({"text": msg["content"]})
+                system_msgs.extend(blocks)
             else:
-                converse_msgs.append({
-                    "role": msg["role"],
-                    "content": [{"text": msg["content"]}],
-                })
+                converse_msgs.append({"role": msg["role"], "content": blocks})
+
+        if auto_cache:
+            _add_cache_point(system_msgs)
+            first_user = next((m for m in converse_msgs if m["role"] == "user"), None)
+            if first_user is not None:
+                _add_cache_point(first_user["content"])
 
         if system_msgs:
             kwargs["system"] = system_msgs
@@ -73,16 +164,16 @@ class BedrockProvider(LLMProvider):
         text = "".join(block.get("text", "") for block in content_blocks)
 
         # Map stop reason
-        stop_reason = response.get("stopReason", "end_turn")
-        finish_reason = "length" if stop_reason == "max_tokens" else "stop"
+        finish_reason = _FINISH_REASON.get(response.get("stopReason"), "stop")
 
         # Map usage
         usage = response.get("usage", {})
 
+        now = int(time.time())
         return {
-            "id": f"bedrock-{int(time.time())}",
+            "id": f"bedrock-{now}",
             "object": "chat.completion",
-            "created": int(time.time()),
+            "created": now,
             "model": model_id,
             "choices": [{
                 "index": 0,
@@ -97,13 +188,156 @@ class BedrockProvider(LLMProvider):
         }
 
     def _call_converse(self, **kwargs) -> dict:
-        """Synchronous Converse API call (run via asyncio.to_thread)."""
+        """Synchronous Converse API call (run on the Bedrock thread pool)."""
         return self._get_client().converse(**kwargs)
 
     def _call_converse_stream(self, **kwargs) -> dict:
-        """Synchronous ConverseStream API call (run via asyncio.to_thread)."""
+        """Synchronous ConverseStream API call (run on the Bedrock thread pool)."""
         return self._get_client().converse_stream(**kwargs)
 
+    async def _get_async_client(self):
+        """Lazy-init a shared aioboto3 client (optional dependency).
+
+        Reused across requests so the aiohttp connection pool, TLS sessions and
+        resolved credentials persist. Init is serialized; calls run concurrently.
+        """
+        if self._async_client is None:
+            async with self._async_init_lock:
+                if self._async_client is None:
+                    if self._session is None:
+                        import aioboto3
+
+                        self._session = aioboto3.Session()
+                    ctx = self._session.client(
+                        "bedrock-runtime", region_name=get_settings().aws_region
+                    )
+                    self._async_client = await ctx.__aenter__()
+                    self._async_ctx = ctx
+        return self._async_client
+
+    def _get_http(self) -> httpx.AsyncClient:
+        """httpx transport client: the process-wide pool shared with OpenAI."""
+        if self._http is None or self._http.is_closed:
+            self._http = get_http_client()
+        return self._http
+
+    def _signed_request(self, kwargs: dict, action: str) -> tuple[str, bytes, dict]:
+        """Build a SigV4-signed Bedrock REST request from Converse kwargs."""
+        from botocore.awsrequest import AWSRequest
+
+        from src.providers.sigv4 import CachedSigV4Auth
+
+        if self._credentials is None:
+            import botocore.session
+
+            self._credentials = botocore.session.get_session().get_credentials()
+            if self._credentials is None:
+                raise HTTPException(status_code=500, detail="No AWS credentials available for Bedrock")
+
+        region = get_settings().aws_region
+        params = dict(kwargs)
+        model_id = quote(params.pop("modelId"), safe="")
+        url = f"https://bedrock-runtime.{region}.amazonaws.com/model/{model_id}/{action}"
+        data = orjson.dumps(params)
+
+        request = AWSRequest(
+            method="POST", url=url, data=data,
+            headers={"Content-Type": "application/json"},
+        )
+        CachedSigV4Auth(self._credentials.get_frozen_credentials(), "bedrock", region).add_auth(request)
+        return url, data, dict(request.headers.items())
+
+    @staticmethod
+    def _http_error(response: httpx.Response) -> Exception:
+        """Wrap a non-2xx Bedrock REST response so _handle_bedrock_error can map it."""
+        error_type = response.headers.get("x-amzn-ErrorType", "").split(":")[0]
+        try:
+            message = orjson.loads(response.content).get("message", "")
+        except (ValueError, AttributeError):
+            message = response.text
+        error = Exception(f"{error_type or response.status_code}: {message}")
+        error.response = {"Error": {"Code": error_type, "Message": message}}
+        return error
+
+    async def _http_converse(self, kwargs: dict) -> dict:
+        url, data, headers = self._signed_request(kwargs, "converse")
+        response = await self._get_http().post(url, content=data, headers=headers)
+        if response.status_code >= 300:
+            raise self._http_error(response)
+        return orjson.loads(response.content)
+
+    async def _http_converse_stream(self, kwargs: dict) -> AsyncGenerator[dict, None]:
+        """Yield ConverseStream events decoded from the AWS event-stream framing."""
+        from botocore.eventstream import EventStreamBuffer
+
+        url, data, headers = self._signed_request(kwargs, "converse-stream")
+        async with self._get_http().stream("POST", url, content=data, headers=headers) as response:
+            if response.status_code >= 300:
+                await response.aread()
+                self._handle_bedrock_error(self._http_error(response))
+
+            buffer = EventStreamBuffer()
+            async for raw in response.aiter_bytes():
+                buffer.add_data(raw)
+                for message in buffer:
+                    msg_headers = message.headers
+                    payload = orjson.loads(message.payload) if message.payload else {}
+                    if msg_headers.get(":message-type") == "event":
+                        yield {msg_headers[":event-type"]: payload}
+                    else:
+                        code = msg_headers.get(":exception-type") or msg_headers.get(":error-code", "")
+                        error = Exception(f"{code}: {payload.get('message', '')}")
+                        error.response = {"Error": {"Code": code}}
+                        self._handle_bedrock_error(error)
+
+    async def _converse(self, kwargs: dict) -> dict:
+        """Converse call on the configured transport. Maps errors to HTTPException."""
+        try:
+            if self._transport == "httpx":
+                return await self._http_converse(kwargs)
+            if self._transport == "aioboto3":
+                client = await self._get_async_client()
+                return await client.converse(**kwargs)
+            return await self._run_blocking(self._call_converse, **kwargs)
+        except HTTPException:
+            raise
+        except Exception as e:
+            self._handle_bedrock_error(e)
+
+    async def _converse_stream_events(self, kwargs: dict) -> AsyncGenerator[dict, None]:
+        """Yield raw ConverseStream events on the configured transport."""
+        if self._transport == "httpx":
+            try:
+                async for event in self._http_converse_stream(kwargs):
+                    yield event
+            except HTTPException:
+                raise
+            except Exception as e:
+                self._handle_bedrock_error(e)
+            return
+
+        if self._transport == "aioboto3":
+            try:
+                client = await self._get_async_client()
+                response = await client.converse_stream(**kwargs)
+            except Exception as e:
+                self._handle_bedrock_error(e)
+            # Each read awaits the network, so other requests run in between
+            async for event in response["stream"]:
+                yield event
+            return
+
+        try:
+            response = await self._run_blocking(self._call_converse_stream, **kwargs)
+        except HTTPException:
+            raise
+        except Exception as e:
+            self._handle_bedrock_error(e)
+
+        # Iterate the EventStream (sync iterator from boto3)
+        for event in response.get("stream", []):
+            yield event
+
     def _handle_bedrock_error(self, e: Exception):
         """Map boto3 exceptions to HTTPExceptions."""
         if isinstance(getattr(e, "response", None), dict):
@@ -130,14 +364,8 @@ class BedrockProvider(LLMProvider):
                 detail="bedrock_model_id is required for Bedrock provider",
             )
 
-        kwargs = self._translate_request(body, model_id)
-
-        try:
-            response = await asyncio.to_thread(self._call_converse, **kwargs)
-        except HTTPException:
-            raise
-        except Exception as e:
-            self._handle_bedrock_error(e)
+        kwargs = self._translate_request(body, model_id, self._prompt_caching)
+        response = await self._converse(kwargs)
 
         response_body = self._translate_response(response, model_id)
         return ProviderResponse(status_code=200, body=response_body)
@@ -151,41 +379,28 @@ class BedrockProvider(LLMProvider):
                 detail="bedrock_model_id is required for Bedrock provider",
             )
 
-        kwargs = self._translate_request(body, model_id)
-
-        try:
-            response = await asyncio.to_thread(self._call_converse_stream, **kwargs)
-        except HTTPException:
-            raise
-        except Exception as e:
-            self._handle_bedrock_error(e)
-
-        stream = response.get("stream", [])
+        kwargs = self._translate_request(body, model_id, self._prompt_caching)
         chunk_id = f"bedrock-{int(time.time())}"
+        # Per-token chunks differ only in the delta text: serialize the fixed
+        # envelope once and splice in the escaped text for each delta
+        delta_prefix = orjson.dumps({
+            "id": chunk_id,
+            "object": "chat.completion.chunk",
+            "model": model_id,
+        })[:-1] + b',"choices":[{"index":0,"delta":{"content":'
+        delta_suffix = b'},"finish_reason":null}]}'
 
-        # Iterate the EventStream (sync iterator from boto3)
-        for event in stream:
+        async for event in self._converse_stream_events(kwargs):
             if "contentBlockDelta" in event:
                 delta_text = event["contentBlockDelta"].get("delta", {}).get("text", "")
-                chunk_data = {
-                    "id": chunk_id,
-                    "object": "chat.completion.chunk",
-                    "model": model_id,
-                    "choices": [{
-                        "index": 0,
-                        "delta": {"content": delta_text},
-                        "finish_reason": None,
-                    }],
-                }
                 yield StreamChunk(
-                    data=json.dumps(chunk_data),
+                    data=delta_prefix + orjson.dumps(delta_text) + delta_suffix,
                     is_done=False,
                     text_delta=delta_text,
                 )
 
             elif "messageStop" in event:
-                stop_reason = event["messageStop"].get("stopReason", "end_turn")
-                finish_reason = "length" if stop_reason == "max_tokens" else "stop"
+                finish_reason = _FINISH_REASON.get(event["messageStop"].get("stopReason"), "stop")
                 finish_chunk = {
                     "id": chunk_id,
                     "object": "chat.completion.chunk",
@@ -197,7 +412,7 @@ class BedrockProvider(LLMProvider):
                     }],
                 }
                 yield StreamChunk(
-                    data=json.dumps(finish_chunk),
+                    data=orjson.dumps(finish_chunk),
                     is_done=False,
                     text_delta="",
                 )
@@ -205,5 +420,14 @@ class BedrockProvider(LLMProvider):
                 return
 
     async def close(self) -> None:
-        # boto3 clients don't need explicit cleanup
+        # boto3 clients don't need explicit cleanup; the aioboto3 one does
         self._client = None
+        if self._async_ctx is not None:
+            await self._async_ctx.__aexit__(None, None, None)
+            self._async_ctx = None
+            self._async_client = None
+        # The httpx pool is shared; close_all_providers() closes it
+        self._http = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
@@ -0,0 +1,37 @@
+"""Process-wide httpx client shared by all HTTP-based providers.
+
+One connection pool per process: keep-alive connections (and, with HTTP/2,
+multiplexed streams) are reused across providers and requests. Created lazily
+on first use so it also works under Lambda, where lifespan events are off.
+"""
+
+import httpx
+
+from src.config.settings import get_settings
+
+_client: httpx.AsyncClient | None = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Get (or create) the shared upstream httpx client."""
+    global _client
+    if _client is None or _client.is_closed:
+        settings = get_settings()
+        _client = httpx.AsyncClient(
+            http2=settings.upstream_http2,
+            limits=httpx.Limits(
+                max_connections=settings.upstream_max_connections,
+                max_keepalive_connections=settings.upstream_max_keepalive,
+                keepalive_expiry=60.0,
+            ),
+            timeout=httpx.Timeout(60.0, connect=5.0),
+        )
+    return _client
+
+
+async def close_http_client() -> None:
+    """Close the shared client's connection pool (shutdown)."""
+    global _client
+    if _client is not None and not _client.is_closed:
+        await _client.aclose()
+    _client = None
@@ -1,13 +1,46 @@
 """OpenAI provider implementation."""
 
-import json
 from collections.abc import AsyncGenerator
 
 import httpx
+import orjson
 from fastapi import HTTPException
 
 from src.config.settings import get_settings
 from src.providers.base import LLMProvider, ProviderResponse, StreamChunk
+from src.providers.http import get_http_client
+
+_DONE = StreamChunk(data="[DONE]", is_done=True, text_delta="")
+_DATA_PREFIX = b"data:"
+_DONE_PAYLOAD = b"[DONE]"
+
+
+def _parse_sse_line(line: bytes) -> StreamChunk | None:
+    """Turn one upstream SSE line into a StreamChunk (None for non-data lines).
+
+    The payload is passed through as bytes; it is only JSON-decoded when it can
+    contain a content delta.
+    """
+    # SSE field names start the line, so only the payload needs trimming
+    # (leading space, trailing \r): one copy per line instead of two
+    if not line.startswith(_DATA_PREFIX):
+        return None
+
+    payload = line[5:].strip()
+    if payload == _DONE_PAYLOAD:
+        return _DONE
+
+    # Extract text delta from chunk (role/finish-only chunks carry no "content")
+    text_delta = ""
+    if b'"content"' in payload:
+        try:
+            choices = orjson.loads(payload).get("choices", [])
+            if choices:
+                text_delta = choices[0].get("delta", {}).get("content", "") or ""
+        except orjson.JSONDecodeError:
+            pass
+
+    return StreamChunk(data=payload, is_done=False, text_delta=text_delta)
 
 
 class OpenAIProvider(LLMProvider):
@@ -15,29 +48,46 @@ class OpenAIProvider(LLMProvider):
 
     def __init__(self):
         self._client: httpx.AsyncClient | None = None
+        # Upstream URL and default-key headers, captured from settings on first use
+        self._url: str | None = None
+        self._default_headers: dict | None = None
 
     async def _get_client(self) -> httpx.AsyncClient:
         if self._client is None or self._client.is_closed:
-            self._client = httpx.AsyncClient(timeout=httpx.Timeout(60.0, connect=10.0))
+            self._client = get_http_client()
         return self._client
 
+    def _upstream_url(self) -> str:
+        if self._url is None:
+            self._url = f"{get_settings().upstream_base_url.rstrip('/')}/v1/chat/completions"
+        return self._url
+
     def _build_headers(self, api_key: str) -> dict:
-        settings = get_settings()
-        upstream_key = api_key or settings.upstream_api_key
-        return {
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {upstream_key}",
-        }
+        if api_key:
+            return {
+                "Content-Type": "application/json",
+                "Authorization": f"Bearer {api_key}",
+            }
+        # Clients without their own upstream key all share one prebuilt dict
+        if self._default_headers is None:
+            self._default_headers = {
+                "Content-Type": "application/json",
+                "Authorization": f"Bearer {get_settings().upstream_api_key}",
+            }
+        return self._default_headers
 
     async def chat_completion(self, body: dict, api_key: str, model_id: str) -> ProviderResponse:
-        settings = get_settings()
-        upstream_url = f"{settings.upstream_base_url.rstrip('/')}/v1/chat/completions"
+        upstream_url = self._upstream_url()
         headers = self._build_headers(api_key)
 
         client = await self._get_client()
         try:
-            response = await client.post(upstream_url, json=body, headers=headers)
-            return ProviderResponse(status_code=response.status_code, body=response.json())
+            response = await client.post(upstream_url, content=orjson.dumps(body), headers=headers)
+            return ProviderResponse(
+                status_code=response.status_code,
+                raw=response.content,
+                content_type=response.headers.get("content-type", "application/json"),
+            )
         except httpx.ConnectError:
             raise HTTPException(status_code=502, detail="Cannot reach upstream provider")
         except httpx.TimeoutException:
@@ -48,8 +98,7 @@ class OpenAIProvider(LLMProvider):
     async def chat_completion_stream(
         self, body: dict, api_key: str, model_id: str
     ) -> AsyncGenerator[StreamChunk, None]:
-        settings = get_settings()
-        upstream_url = f"{settings.upstream_base_url.rstrip('/')}/v1/chat/completions"
+        upstream_url = self._upstream_url()
         headers = self._build_headers(api_key)
 
         # Ensure stream flag is set in the forwarded body
@@ -57,7 +106,9 @@ class OpenAIProvider(LLMProvider):
 
         client = await self._get_client()
         try:
-            async with client.stream("POST", upstream_url, json=stream_body, headers=headers) as response:
+            async with client.stream(
+                "POST", upstream_url, content=orjson.dumps(stream_body), headers=headers
+            ) as response:
                 if response.status_code != 200:
                     body_bytes = await response.aread()
                     raise HTTPException(
@@ -65,28 +116,24 @@ class OpenAIProvider(LLMProvider):
                         detail=body_bytes.decode(errors="replace"),
                     )
 
-                async for line in response.aiter_lines():
-                    line = line.strip()
-                    if not line or not line.startswith("data:"):
-                        continue
-
-                    payload = line[len("data:"):].strip()
-                    if payload == "[DONE]":
-                        yield StreamChunk(data="[DONE]", is_done=True, text_delta="")
-                        return
-
-                    # Extract text delta from chunk
-                    text_delta = ""
-                    try:
-                        chunk = json.loads(payload)
-                        choices = chunk.get("choices", [])
-                        if choices:
-                            delta = choices[0].get("delta", {})
-                            text_delta = delta.get("content", "") or ""
-                    except json.JSONDecodeError:
-                        pass
-
-                    yield StreamChunk(data=payload, is_done=False, text_delta=text_delta)
+                # Split raw bytes on newlines ourselves: no per-line str decode,
+                # and payloads go downstream as the bytes upstream sent
+                buffer = b""
+                async for raw in response.aiter_bytes():
+                    if buffer:
+                        raw = buffer + raw
+                    *lines, buffer = raw.split(b"\n")
+                    for line in lines:
+                        chunk = _parse_sse_line(line)
+                        if chunk is None:
+                            continue
+                        yield chunk
+                        if chunk.is_done:
+                            return
+
+                chunk = _parse_sse_line(buffer)
+                if chunk is not None:
+                    yield chunk
 
         except httpx.ConnectError:
             raise HTTPException(status_code=502, detail="Cannot reach upstream provider")
@@ -96,6 +143,5 @@ class OpenAIProvider(LLMProvider):
             raise HTTPException(status_code=502, detail=f"Upstream error: {e}")
 
     async def close(self) -> None:
-        if self._client and not self._client.is_closed:
-            await self._client.aclose()
-            self._client = None
+        # The pool is shared; close_all_providers() closes it
+        self._client = None
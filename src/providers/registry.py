@@ -1,26 +1,39 @@
 """Provider registry — singleton map of provider name → instance."""
 
+import threading
+
 from src.providers.base import LLMProvider, ProviderResponse
+from src.providers.http import close_http_client
 from src.providers.openai import OpenAIProvider
 
 _providers: dict[str, LLMProvider] = {}
+# Guards creation only; lookups of existing providers never take it. A thread
+# lock (not asyncio) so get_provider also stays safe from threadpool callers.
+_providers_lock = threading.Lock()
 
 
 def get_provider(name: str) -> LLMProvider:
     """Get or create a provider instance by name."""
-    if name in _providers:
-        return _providers[name]
+    provider = _providers.get(name)
+    if provider is not None:
+        return provider
+
+    with _providers_lock:
+        # Re-check: another thread may have created it while we waited
+        if name in _providers:
+            return _providers[name]
 
-    if name == "openai":
-        _providers[name] = OpenAIProvider()
-    elif name == "bedrock":
-        # Lazy import to avoid pulling in boto3 for OpenAI-only setups
-        from src.providers.bedrock import BedrockProvider
-        _providers[name] = BedrockProvider()
-    else:
-        raise ValueError(f"Unknown provider: {name}")
+        if name == "openai":
+            provider = OpenAIProvider()
+        elif name == "bedrock":
+            # Lazy import to avoid pulling in boto3 for OpenAI-only setups
+            from src.providers.bedrock import BedrockProvider
+            provider = BedrockProvider()
+        else:
+            raise ValueError(f"Unknown provider: {name}")
 
-    return _providers[name]
+        _providers[name] = provider
+        return provider
 
 
 async def close_all_providers() -> None:
@@ -28,3 +41,4 @@ async def close_all_providers() -> None:
     for provider in _providers.values():
         await provider.close()
     _providers.clear()
+    await close_http_client()
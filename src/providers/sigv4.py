@@ -0,0 +1,46 @@
+"""SigV4 signing with the derived signing key cached per day.
+
+botocore derives kSigning (four chained HMAC-SHA256s over the secret, date,
+region and service) on every request, though it only changes at UTC midnight
+or when credentials rotate. Imported lazily by the Bedrock httpx transport.
+"""
+
+import hashlib
+import hmac
+
+from botocore.auth import SigV4Auth
+
+# (secret, date, region, service) -> kSigning. Bounded: a handful of live
+# credential/date combinations at most, so drop everything when it fills.
+_MAX_KEYS = 16
+_signing_keys: dict[tuple[str, str, str, str], bytes] = {}
+
+
+def _hmac(key: bytes, msg: str) -> bytes:
+    return hmac.new(key, msg.encode("utf-8"), hashlib.sha256).digest()
+
+
+def signing_key(secret_key: str, date: str, region: str, service: str) -> bytes:
+    """Derived SigV4 signing key for a YYYYMMDD date (cached)."""
+    cache_key = (secret_key, date, region, service)
+    key = _signing_keys.get(cache_key)
+    if key is None:
+        k_date = _hmac(f"AWS4{secret_key}".encode(), date)
+        key = _hmac(_hmac(_hmac(k_date, region), service), "aws4_request")
+        if len(_signing_keys) >= _MAX_KEYS:
+            _signing_keys.clear()
+        _signing_keys[cache_key] = key
+    return key
+
+
+class CachedSigV4Auth(SigV4Auth):
+    """SigV4Auth that reuses the derived signing key across requests."""
+
+    def signature(self, string_to_sign, request):
+        key = signing_key(
+            self.credentials.secret_key,
+            request.context["timestamp"][0:8],
+            self._region_name,
+            self._service_name,
+        )
+        return hmac.new(key, string_to_sign.encode("utf-8"), hashlib.sha256).hexdigest()
@@ -0,0 +1,89 @@
+"""Exact-match response cache in front of provider dispatch (in-memory LRU + TTL)."""
+
+import hashlib
+import time
+from collections import OrderedDict
+
+import orjson
+
+from src.clients.models import ClientConfig
+from src.config.settings import get_settings
+from src.providers.base import ProviderResponse
+
+# Request fields that cannot change the completion. Every other field is part
+# of the key, so new or unknown options (tools, response_format, n, seed, ...)
+# never let two different requests share a response.
+_NON_KEY_FIELDS = frozenset({"stream", "stream_options", "user"})
+
+
+def request_key(body: dict, client: ClientConfig) -> bytes:
+    """Digest of the request body minus non-output fields, scoped to the client."""
+    canonical = {field: value for field, value in body.items() if field not in _NON_KEY_FIELDS}
+    scope = (client.client_id, client.provider, client.bedrock_model_id)
+    return hashlib.sha256(orjson.dumps([scope, canonical], option=orjson.OPT_SORT_KEYS)).digest()
+
+
+class ResponseCache:
+    """Per-process cache of successful non-streaming provider responses.
+
+    Keys are scoped to the client, so one tenant can never be served another
+    tenant's completion.
+    """
+
+    def __init__(self, ttl: float, max_size: int = 1024, max_temperature: float = 0.2):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.max_temperature = max_temperature
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[bytes, tuple[ProviderResponse, float]] = OrderedDict()
+
+    def cacheable(self, body: dict) -> bool:
+        """Only deterministic-ish, non-streaming requests are worth caching."""
+        if body.get("stream"):
+            return False
+        # OpenAI's default temperature is 1.0
+        temperature = body.get("temperature", 1.0)
+        return isinstance(temperature, (int, float)) and temperature <= self.max_temperature
+
+    def get(self, key: bytes) -> ProviderResponse | None:
+        entry = self._entries.get(key)
+        if entry is not None:
+            response, cached_at = entry
+            if time.monotonic() - cached_at < self.ttl:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return response
+            del self._entries[key]
+        self.misses += 1
+        return None
+
+    def put(self, key: bytes, response: ProviderResponse) -> None:
+        self._entries[key] = (response, time.monotonic())
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+_cache: ResponseCache | None = None
+
+
+def get_response_cache() -> ResponseCache | None:
+    """Get the response cache singleton. Returns None if caching is disabled."""
+    global _cache
+    if _cache is not None:
+        return _cache
+
+    settings = get_settings()
+    if settings.response_cache_ttl <= 0:
+        return None
+
+    _cache = ResponseCache(
+        ttl=settings.response_cache_ttl,
+        max_size=settings.response_cache_max_size,
+        max_temperature=settings.response_cache_max_temperature,
+    )
+    return _cache
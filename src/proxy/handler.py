@@ -3,15 +3,79 @@
 Kept for backward compatibility (close_client, forward_to_provider).
 """
 
+import asyncio
 from collections.abc import AsyncGenerator
 
 from src.clients.models import ClientConfig
+from src.config.settings import get_settings
 from src.providers.base import ProviderResponse, StreamChunk
 from src.providers.registry import close_all_providers, get_provider
+from src.proxy.cache import get_response_cache, request_key
+
+# In-flight upstream calls by request key (request coalescing)
+_inflight: dict[bytes, asyncio.Task] = {}
+
+
+def preflight_error(body: dict, client: ClientConfig) -> str | None:
+    """Cheap local checks for requests the upstream would reject anyway.
+
+    Returns an error message, or None if the request may proceed.
+    """
+    messages = body.get("messages")
+    if not isinstance(messages, list) or not messages:
+        return "'messages' must be a non-empty list"
+
+    limit = client.max_prompt_chars or get_settings().max_prompt_chars
+    if limit:
+        total = 0
+        for msg in messages:
+            content = msg.get("content") if isinstance(msg, dict) else None
+            if isinstance(content, str):
+                total += len(content)
+            elif isinstance(content, list):
+                total += sum(
+                    len(part.get("text", "")) for part in content
+                    if isinstance(part, dict) and part.get("type") == "text"
+                )
+        if total > limit:
+            return f"Prompt too long ({total} characters, limit {limit})"
+
+    return None
 
 
 async def forward_to_provider(body: dict, client: ClientConfig) -> ProviderResponse:
-    """Route a request to the correct provider based on client config."""
+    """Route a request to the correct provider based on client config.
+
+    Served from the response cache when enabled and the request is cacheable;
+    identical concurrent deterministic requests share one upstream call.
+    """
+    cache = get_response_cache()
+    use_cache = cache is not None and cache.cacheable(body)
+    coalesce = _coalescable(body)
+    key = request_key(body, client) if use_cache or coalesce else None
+
+    if use_cache:
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+
+    if coalesce:
+        task = _inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(_dispatch(body, client))
+            _inflight[key] = task
+            task.add_done_callback(lambda _: _inflight.pop(key, None))
+        # Shield so one cancelled waiter doesn't cancel the call for the rest
+        result = await asyncio.shield(task)
+    else:
+        result = await _dispatch(body, client)
+
+    if use_cache and result.status_code == 200:
+        cache.put(key, result)
+    return result
+
+
+async def _dispatch(body: dict, client: ClientConfig) -> ProviderResponse:
     provider = get_provider(client.provider)
     return await provider.chat_completion(
         body=body,
@@ -20,6 +84,18 @@ async def forward_to_provider(body: dict, client: ClientConfig) -> ProviderRespo
     )
 
 
+def _coalescable(body: dict) -> bool:
+    """Only temperature-0 requests are safe to answer with another caller's result."""
+    temperature = body.get("temperature")
+    # type() rather than isinstance(): False == 0, but is not a temperature
+    return (
+        not body.get("stream")
+        and type(temperature) in (int, float)
+        and temperature == 0
+        and get_settings().request_coalescing
+    )
+
+
 async def stream_from_provider(
     body: dict, client: ClientConfig
 ) -> AsyncGenerator[StreamChunk, None]:
@@ -15,41 +15,190 @@ import re
 from dataclasses import dataclass
 
 from src.config.settings import get_settings
+from src.security.prefilter import compile_prefilter
+from src.security.scan_cache import SCAN_CACHE_MAX_CHARS, ScanCache, text_digest
+
+# Shared compile flags. No pattern uses ".", "^" or "$", so DOTALL/MULTILINE
+# would be no-ops; \s already spans newlines in multi-line prompts/responses.
+_FLAGS = re.IGNORECASE
 
 # Each pattern: (compiled regex, weight, category label)
-# Weights reflect severity — higher = more suspicious
-_PATTERNS: list[tuple[re.Pattern, float, str]] = [
+# Weights reflect severity — higher = more suspicious. A tuple: the fused
+# regex and trigger literals below are derived from it once, at import.
+_PATTERNS: tuple[tuple[re.Pattern, float, str], ...] = (
     # --- Instruction override ---
-    (re.compile(r"ignore\s+(all\s+)?(previous|prior|above)\s+(instructions|prompts|rules)", re.I), 0.5, "instruction_override"),
-    (re.compile(r"disregard\s+(all\s+)?(previous|prior|above|your)\s+(instructions|prompts|rules|programming)", re.I), 0.5, "instruction_override"),
-    (re.compile(r"forget\s+(all\s+)?(previous|prior|your)\s+(instructions|rules|context|programming)", re.I), 0.5, "instruction_override"),
-    (re.compile(r"do\s+not\s+follow\s+(your|any|the)\s+(previous|prior|original)\s+(instructions|rules)", re.I), 0.5, "instruction_override"),
-    (re.compile(r"override\s+(your|all|the)\s+(instructions|rules|guidelines|programming)", re.I), 0.4, "instruction_override"),
-    (re.compile(r"new\s+instructions?\s*:", re.I), 0.3, "instruction_override"),
+    (re.compile(r"ignore\s+(all\s+)?(previous|prior|above)\s+(instructions|prompts|rules)", _FLAGS), 0.5, "instruction_override"),
+    (re.compile(r"disregard\s+(all\s+)?(previous|prior|above|your)\s+(instructions|prompts|rules|programming)", _FLAGS), 0.5, "instruction_override"),
+    (re.compile(r"forget\s+(all\s+)?(previous|prior|your)\s+(instructions|rules|context|programming)", _FLAGS), 0.5, "instruction_override"),
+    (re.compile(r"do\s+not\s+follow\s+(your|any|the)\s+(previous|prior|original)\s+(instructions|rules)", _FLAGS), 0.5, "instruction_override"),
+    (re.compile(r"override\s+(your|all|the)\s+(instructions|rules|guidelines|programming)", _FLAGS), 0.4, "instruction_override"),
+    (re.compile(r"new\s+instructions?\s*:", _FLAGS), 0.3, "instruction_override"),
 
     # --- Role manipulation ---
-    (re.compile(r"you\s+are\s+now\s+", re.I), 0.4, "role_manipulation"),
-    (re.compile(r"act\s+as\s+(an?\s+)?(unrestricted|unfiltered|uncensored|evil)", re.I), 0.5, "role_manipulation"),
-    (re.compile(r"pretend\s+(you'?re?|to\s+be)\s+(an?\s+)?(unrestricted|unfiltered|different\s+ai)", re.I), 0.5, "role_manipulation"),
-    (re.compile(r"\bDAN\s*(mode)?\b", re.I), 0.6, "role_manipulation"),
-    (re.compile(r"jailbreak", re.I), 0.7, "role_manipulation"),
-    (re.compile(r"developer\s+mode\s+(enabled|on|activated)", re.I), 0.5, "role_manipulation"),
+    (re.compile(r"you\s+are\s+now\s+", _FLAGS), 0.4, "role_manipulation"),
+    (re.compile(r"act\s+as\s+(an?\s+)?(unrestricted|unfiltered|uncensored|evil)", _FLAGS), 0.5, "role_manipulation"),
+    (re.compile(r"pretend\s+(you'?re?|to\s+be)\s+(an?\s+)?(unrestricted|unfiltered|different\s+ai)", _FLAGS), 0.5, "role_manipulation"),
+    (re.compile(r"\bDAN\s*(mode)?\b", _FLAGS), 0.6, "role_manipulation"),
+    (re.compile(r"jailbreak", _FLAGS), 0.7, "role_manipulation"),
+    (re.compile(r"developer\s+mode\s+(enabled|on|activated)", _FLAGS), 0.5, "role_manipulation"),
 
     # --- Delimiter injection ---
-    (re.compile(r"<\|?(system|im_start|im_end|endoftext)\|?>", re.I), 0.6, "delimiter_injection"),
-    (re.compile(r"\[SYSTEM\]", re.I), 0.4, "delimiter_injection"),
-    (re.compile(r"#{3,}\s*(system|instruction|prompt)", re.I), 0.3, "delimiter_injection"),
-    (re.compile(r"```\s*(system|instruction)", re.I), 0.3, "delimiter_injection"),
+    (re.compile(r"<\|?(system|im_start|im_end|endoftext)\|?>", _FLAGS), 0.6, "delimiter_injection"),
+    (re.compile(r"\[SYSTEM\]", _FLAGS), 0.4, "delimiter_injection"),
+    # (?<!#): only try from the start of a run of #s, or a long run is rescanned from every offset
+    (re.compile(r"(?<!#)#{3,}\s*(system|instruction|prompt)", _FLAGS), 0.3, "delimiter_injection"),
+    (re.compile(r"```\s*(system|instruction)", _FLAGS), 0.3, "delimiter_injection"),
 
     # --- Context manipulation ---
-    (re.compile(r"(respond|answer|reply)\s+(without|with\s+no)\s+(restrictions|limits|filters|guidelines)", re.I), 0.5, "context_manipulation"),
-    (re.compile(r"no\s+(ethical|moral|safety)\s+(guidelines|restrictions|filters|limits)", re.I), 0.5, "context_manipulation"),
-    (re.compile(r"bypass\s+(your|all|the|any)\s+(restrictions|filters|safety|guidelines)", re.I), 0.6, "context_manipulation"),
-    (re.compile(r"enable\s+(unrestricted|unfiltered|uncensored)\s+mode", re.I), 0.5, "context_manipulation"),
+    (re.compile(r"(respond|answer|reply)\s+(without|with\s+no)\s+(restrictions|limits|filters|guidelines)", _FLAGS), 0.5, "context_manipulation"),
+    (re.compile(r"no\s+(ethical|moral|safety)\s+(guidelines|restrictions|filters|limits)", _FLAGS), 0.5, "context_manipulation"),
+    (re.compile(r"bypass\s+(your|all|the|any)\s+(restrictions|filters|safety|guidelines)", _FLAGS), 0.6, "context_manipulation"),
+    (re.compile(r"enable\s+(unrestricted|unfiltered|uncensored)\s+mode", _FLAGS), 0.5, "context_manipulation"),
+)
+
+_ZERO_WIDTH_PREFIX = re.compile(r"^(?:\\b|\(\?<![^)]*\))+")
+
+
+def _lead_chars(source: str) -> set[str]:
+    """Characters a pattern's match can start with (before case folding).
+
+    Handles the shapes used in _PATTERNS: an optional \\b / (?<!..) prefix,
+    then a literal, an escaped literal, or a group of literal alternatives.
+    Raises ValueError for anything else so a new pattern can't silently be
+    skipped by the lead-character lookahead.
+    """
+    source = _ZERO_WIDTH_PREFIX.sub("", source)
+    if source.startswith("("):
+        alternatives = source[1:source.index(")")].split("|")
+        leads = {alt[0] for alt in alternatives}
+        if all(lead.isalnum() for lead in leads):
+            return leads
+    elif source.startswith("\\") and not source[1].isalnum():
+        return {source[1]}
+    elif source and source[0] not in ".^$*+?{}[]()|\\":
+        return {source[0]}
+    raise ValueError(f"cannot determine lead characters of {source!r}")
+
+
+# All patterns fused into one alternation so the prompt is scanned once, not
+# once per pattern. Group p<i> identifies which pattern matched. The leading
+# lookahead rejects, in one charset test, every position that can't start any
+# pattern (most of them), instead of trying all 20 branches there.
+_LEAD_CLASS = "".join(
+    re.escape(c) for c in sorted({c for pattern, _, _ in _PATTERNS for c in _lead_chars(pattern.pattern)})
+)
+_COMBINED = re.compile(
+    f"(?=[{_LEAD_CLASS}])(?:"
+    + "|".join(f"(?P<p{i}>{pattern.pattern})" for i, (pattern, _, _) in enumerate(_PATTERNS))
+    + ")",
+    _FLAGS,
+)
+
+
+def _required_literals(source: str) -> set[str]:
+    """Lowercase substrings at least one of which every match must contain.
+
+    Walks the top level of a pattern: runs of literal characters, and groups
+    whose alternatives each start with a literal, are required unless made
+    optional by ? or *. Returns the candidate with the longest shortest
+    member (the most selective). Raises ValueError if there is none.
+    """
+
+    def literal_prefix(fragment: str) -> str:
+        out, i = "", 0
+        while i < len(fragment):
+            if fragment[i] == "\\" and i + 1 < len(fragment) and not fragment[i + 1].isalnum():
+                char, i = fragment[i + 1], i + 2
+            elif fragment[i] not in ".^$*+?{}[]()|\\":
+                char, i = fragment[i], i + 1
+            else:
+                break
+            quantifier = fragment[i:i + 1]
+            if quantifier in ("?", "*"):
+                break
+            if quantifier == "{":
+                return out + char * int(re.match(r"\{(\d+)", fragment[i:])[1])
+            out += char
+            if quantifier == "+":
+                break
+        return out
+
+    candidates: list[set[str]] = []
+    i = 0
+    while i < len(source):
+        if source[i] == "(":
+            end = source.index(")", i)
+            optional = source[end + 1:end + 2] in ("?", "*")
+            if not source.startswith("(?", i) and not optional:
+                alternatives = {literal_prefix(alt) for alt in source[i + 1:end].split("|")}
+                if all(alternatives):
+                    candidates.append(alternatives)
+            i = end + 1
+        elif source[i] == "[":  # character class
+            i = source.index("]", i + 2) + 1
+        elif source[i] == "\\" and source[i + 1].isalnum():  # \s, \b, \d: not literal
+            i += 2
+        elif source[i] in "?*+":
+            i += 1
+        else:
+            run = literal_prefix(source[i:])
+            if run:
+                candidates.append({run})
+            # Skip past the run's characters and any quantifier that ended it
+            match = re.match(r"(?:\\[^A-Za-z0-9]|[^.^$*+?{}\[\]()|\\])+", source[i:])
+            i += match.end() if match else 1
+            if i < len(source) and source[i] == "{":
+                i = source.index("}", i) + 1
+    if not candidates:
+        raise ValueError(f"no required literal in {source!r}")
+    return {literal.lower() for literal in max(candidates, key=lambda c: min(map(len, c)))}
+
+
+# Cheap pre-check: every pattern needs one of these substrings, so ASCII text
+# containing none of them can't match and skips the regex pass. Non-ASCII text
+# always takes the full scan, since IGNORECASE also folds characters like
+# "ſ" and "İ" that str.lower() leaves alone.
+_ALL_LITERALS = {literal for pattern, _, _ in _PATTERNS for literal in _required_literals(pattern.pattern)}
+# Drop literals containing a shorter one ("[system]" is covered by "system")
+_TRIGGERS: tuple[str, ...] = tuple(
+    sorted(t for t in _ALL_LITERALS if not any(o != t and o in t for o in _ALL_LITERALS))
+)
+
+
+# With hyperscan installed, the exact pattern set replaces the literal check:
+# also rejects text that has a trigger word ("you") but no actual match.
+# Lookbehinds only guard re against rescans, so dropping them just widens
+# the prefilter; \s gets str-mode's \x1c-\x1f back, as in pii._ascii_variant.
+_HS_MATCH = compile_prefilter(
+    [
+        re.sub(r"\(\?<![^)]*\)", "", pattern.pattern).replace(r"\s", r"[\s\x1c-\x1f]").encode("ascii")
+        for pattern, _, _ in _PATTERNS
+    ],
+    caseless=True,
+)
+
+
+def _may_match(content: str) -> bool:
+    if not content.isascii():
+        return True
+    if _HS_MATCH is not None:
+        return _HS_MATCH(content.encode())
+    lowered = content.lower()
+    return any(trigger in lowered for trigger in _TRIGGERS)
+
+
+# Categories in pattern order, each with a bit so matches accumulate into an int
+_CATEGORY_BITS: list[tuple[str, int]] = [
+    (category, 1 << i)
+    for i, category in enumerate(dict.fromkeys(category for _, _, category in _PATTERNS))
 ]
+_BIT_OF = dict(_CATEGORY_BITS)
+_META: dict[str, tuple[float, int]] = {
+    f"p{i}": (weight, _BIT_OF[category]) for i, (_, weight, category) in enumerate(_PATTERNS)
+}
 
 
-@dataclass
+@dataclass(slots=True)
 class ScanResult:
     allowed: bool
     risk_score: float  # 0.0 (safe) to 1.0+ (blocked)
@@ -57,30 +206,62 @@ class ScanResult:
     matched_categories: list[str]
 
 
-async def scan_prompt(content: str) -> ScanResult:
+def _score(content: str, threshold: float) -> tuple[float, int]:
+    """(total score, matched category bits), stopping once threshold is reached."""
+    total_score = 0.0
+    matched_bits = 0
+
+    for match in _COMBINED.finditer(content):
+        weight, bit = _META[match.lastgroup]
+        total_score += weight
+        matched_bits |= bit
+        if total_score >= threshold:
+            break
+
+    return total_score, matched_bits
+
+
+# Scores of short prompts are cached by digest; the threshold is part of the
+# key because scoring stops early at it.
+_score_cache = ScanCache()
+
+
+def _score_cached(content: str, threshold: float) -> tuple[float, int]:
+    key = (text_digest(content), threshold)
+    result = _score_cache.get(key)
+    if result is None:
+        result = _score(content, threshold)
+        _score_cache.put(key, result)
+    return result
+
+
+def scan_cache_stats() -> dict[str, int]:
+    """Hit/miss counters of the prompt score cache."""
+    return _score_cache.stats()
+
+
+def scan_prompt(content: str) -> ScanResult:
     """Scan prompt content for injection attempts.
 
     Runs all patterns against the content and accumulates a risk score.
-    Blocks if score >= configured threshold.
+    Blocks if score >= configured threshold. Scanning stops at the match that
+    crosses the threshold, so blocked results list the categories seen so far.
     """
-    if not content.strip():
+    if not content or content.isspace():  # isspace() stops at the first non-space; strip() copies
         return ScanResult(allowed=True, risk_score=0.0, reason="empty", matched_categories=[])
+    if not _may_match(content):
+        return ScanResult(allowed=True, risk_score=0.0, reason="pass", matched_categories=[])
 
-    settings = get_settings()
-    total_score = 0.0
-    matched = []
+    threshold = get_settings().injection_threshold
+    score = _score_cached if len(content) <= SCAN_CACHE_MAX_CHARS else _score
+    total_score, matched_bits = score(content, threshold)
 
-    for pattern, weight, category in _PATTERNS:
-        hits = pattern.findall(content)
-        if hits:
-            total_score += weight * len(hits)
-            if category not in matched:
-                matched.append(category)
+    matched = [category for category, bit in _CATEGORY_BITS if matched_bits & bit]
 
     # Cap at 1.0 for clean reporting, but actual can exceed
     display_score = round(min(total_score, 1.0), 2)
 
-    if total_score >= settings.injection_threshold:
+    if total_score >= threshold:
         return ScanResult(
             allowed=False,
             risk_score=display_score,
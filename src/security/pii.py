@@ -18,18 +18,24 @@ import re
 from dataclasses import dataclass, field
 
 from src.config.settings import get_settings
+from src.security.prefilter import compile_prefilter
+from src.security.scan_cache import SCAN_CACHE_MAX_CHARS, ScanCache, text_digest
 
-# Pattern definitions: (compiled regex, PII type label, redaction placeholder)
-_PII_PATTERNS: list[tuple[re.Pattern, str, str]] = [
+# Pattern definitions: (compiled regex, PII type label, redaction placeholder).
+# A tuple: the fused regexes below are built from it once, at import.
+_PII_PATTERNS: tuple[tuple[re.Pattern, str, str], ...] = (
     # SSN: 123-45-6789 or 123 45 6789
     (re.compile(r"\b\d{3}[-\s]\d{2}[-\s]\d{4}\b"), "SSN", "[REDACTED_SSN]"),
 
     # Credit card: 13-19 digits, optionally separated by spaces or dashes
     # Common formats: 4111-1111-1111-1111, 4111 1111 1111 1111, 4111111111111111
+    # One \d per repetition, so every match already has 13-19 digits: no
+    # digit-count prefilter is needed before the Luhn check.
     (re.compile(r"\b(?:\d[-\s]?){12,18}\d\b"), "CREDIT_CARD", "[REDACTED_CC]"),
 
-    # Email
-    (re.compile(r"\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}\b"), "EMAIL", "[REDACTED_EMAIL]"),
+    # Email: local part capped at the RFC 5321 limit of 64 chars; unbounded, a
+    # long run of local-part chars is rescanned from every word boundary
+    (re.compile(r"\b[A-Za-z0-9._%+-]{1,64}@[A-Za-z0-9.-]+\.[A-Za-z]{2,}\b"), "EMAIL", "[REDACTED_EMAIL]"),
 
     # US phone: requires separators to avoid matching bare digit strings
     # Matches: (123) 456-7890, 123-456-7890, 123.456.7890, +1-123-456-7890
@@ -37,27 +43,113 @@ _PII_PATTERNS: list[tuple[re.Pattern, str, str]] = [
 
     # IPv4 address (avoid matching version numbers like 1.2.3)
     (re.compile(r"\b(?:(?:25[0-5]|2[0-4]\d|[01]?\d\d?)\.){3}(?:25[0-5]|2[0-4]\d|[01]?\d\d?)\b"), "IP_ADDRESS", "[REDACTED_IP]"),
-]
+)
+
+
+def _fuse(patterns: tuple[tuple[re.Pattern, str, str], ...]) -> re.Pattern:
+    """One alternation over all patterns; group t<i> names the matching pattern."""
+    return re.compile("|".join(f"(?P<t{i}>{p.pattern})" for i, (p, _, _) in enumerate(patterns)))
+
+
+# Single-pass scan: every type in one regex traversal. A credit-card candidate
+# that fails Luhn is not consumed; the other patterns are searched from its
+# start, so PII inside or overlapping it (e.g. an SSN) is still found.
+_COMBINED_PII = _fuse(_PII_PATTERNS)
+_META: dict[str, tuple[str, str]] = {
+    f"t{i}": (pii_type, placeholder) for i, (_, pii_type, placeholder) in enumerate(_PII_PATTERNS)
+}
+_NON_CC_PATTERNS = tuple(p for p in _PII_PATTERNS if p[1] != "CREDIT_CARD")
+_NON_CC_PII = _fuse(_NON_CC_PATTERNS)
+_NON_CC_META: dict[str, tuple[str, str]] = {
+    f"t{i}": (pii_type, placeholder) for i, (_, pii_type, placeholder) in enumerate(_NON_CC_PATTERNS)
+}
+_PII_TYPES: list[str] = [pii_type for _, pii_type, _ in _PII_PATTERNS]
+
+
+def _ascii_variant(pattern: re.Pattern) -> re.Pattern:
+    """bytes-mode twin of a str pattern, for content that is pure ASCII.
+
+    On ASCII input \\d, \\b and \\w agree between the two modes; \\s does
+    not (str mode also matches \\x1c-\\x1f), so those are added back. Every
+    \\s in these patterns sits inside a [...] class, where that is valid.
+    """
+    return re.compile(pattern.pattern.replace(r"\s", r"\s\x1c-\x1f").encode("ascii"))
+
+
+# bytes-mode scan for ASCII content (most LLM traffic): _sre skips its
+# per-character width dispatch, ~25% faster on large response bodies
+_COMBINED_PII_ASCII = _ascii_variant(_COMBINED_PII)
+_NON_CC_PII_ASCII = _ascii_variant(_NON_CC_PII)
+_META_ASCII: dict[str, tuple[str, bytes]] = {
+    group: (pii_type, placeholder.encode()) for group, (pii_type, placeholder) in _META.items()
+}
+_NON_CC_META_ASCII: dict[str, tuple[str, bytes]] = {
+    group: (pii_type, placeholder.encode()) for group, (pii_type, placeholder) in _NON_CC_META.items()
+}
+
+# Optional Hyperscan check over the same bytes patterns: ASCII text with
+# digits but no PII (ids, prices, dates) skips the fused re pass
+_HS_PII = compile_prefilter([_ascii_variant(pattern).pattern for pattern, _, _ in _PII_PATTERNS])
+
+# Every pattern needs a digit or an "@" (email); text with neither (most chat
+# prose) can skip the fused pass. Uses \d so it agrees with the patterns on
+# non-ASCII digits.
+_PII_TRIGGER = re.compile(r"[\d@]")
+
+
+# Luhn value of a doubled digit: 2d, minus 9 when that exceeds 9
+_LUHN_DOUBLED = bytes(2 * d - 9 if 2 * d > 9 else 2 * d for d in range(10))
+# bytes.translate tables: delete everything but ASCII digits; map a digit
+# byte straight to its doubled Luhn value
+_NON_DIGIT_BYTES = bytes(c for c in range(256) if not 0x30 <= c <= 0x39)
+_LUHN_DOUBLED_BYTES = bytes(_LUHN_DOUBLED[c - 0x30] if 0x30 <= c <= 0x39 else 0 for c in range(256))
 
 
 def _luhn_check(number: str) -> bool:
-    """Validate a credit card number using the Luhn algorithm."""
-    digits = [int(d) for d in number if d.isdigit()]
-    if len(digits) < 13 or len(digits) > 19:
+    """Validate a credit card number using the Luhn algorithm.
+
+    ASCII input (the common case) is checked with C-level translate/sum over
+    the digit bytes; no per-digit Python loop.
+    """
+    if not number.isascii():
+        return _luhn_check_unicode(number)
+    return _luhn_check_ascii(number.encode())
+
+
+def _luhn_check_ascii(number: bytes) -> bool:
+    digits = number.translate(None, _NON_DIGIT_BYTES)
+    # Leading 0 (ISO 7812 major industry identifier 0) is never a payment
+    # card: zero-padded order/account IDs skip the checksum. Every other
+    # leading digit has issuers (1 UATP, 7 fleet cards, 8-9 national schemes).
+    if not 13 <= len(digits) <= 19 or digits[0] == 0x30:
         return False
+    undoubled = digits[-1::-2]
+    checksum = sum(undoubled) - 0x30 * len(undoubled) + sum(digits[-2::-2].translate(_LUHN_DOUBLED_BYTES))
+    return checksum % 10 == 0
 
+
+def _luhn_check_unicode(number: str) -> bool:
+    """Luhn over any decimal digits (\\d also matches non-ASCII digits)."""
     checksum = 0
-    reverse = digits[::-1]
-    for i, d in enumerate(reverse):
-        if i % 2 == 1:
-            d *= 2
-            if d > 9:
-                d -= 9
-        checksum += d
-    return checksum % 10 == 0
+    count = 0
+    lead = next((c for c in number if c.isdecimal()), "0")
+    if int(lead) == 0:
+        return False
+    for c in reversed(number):
+        if not c.isdecimal():
+            continue
+        d = int(c)
+        checksum += _LUHN_DOUBLED[d] if count & 1 else d
+        count += 1
+    return 13 <= count <= 19 and checksum % 10 == 0
+
+
+# (fused regex, group meta, non-CC rescan regex, its meta, Luhn check) per mode
+_UNICODE_SCAN = (_COMBINED_PII, _META, _NON_CC_PII, _NON_CC_META, _luhn_check)
+_ASCII_SCAN = (_COMBINED_PII_ASCII, _META_ASCII, _NON_CC_PII_ASCII, _NON_CC_META_ASCII, _luhn_check_ascii)
 
 
-@dataclass
+@dataclass(slots=True)
 class PIIResult:
     clean: bool
     detections: list[str] = field(default_factory=list)
@@ -65,7 +157,77 @@ class PIIResult:
     detection_count: int = 0
 
 
-async def scan_for_pii(content: str) -> PIIResult:
+def _detect(content: str) -> tuple[tuple[str, ...], int, str]:
+    """(detected types in pattern order, detection count, redacted content)."""
+    found: set[str] = set()
+    total_detections = 0
+
+    if content.isascii():
+        subject = content.encode()
+        if _HS_PII is not None and not _HS_PII(subject):
+            return (), 0, content
+        combined, meta, non_cc, non_cc_meta, luhn = _ASCII_SCAN
+    else:
+        subject = content
+        combined, meta, non_cc, non_cc_meta, luhn = _UNICODE_SCAN
+
+    pieces = []
+    last = pos = 0
+    # Leftmost non-card match from the last failed card candidate on. Reused
+    # while it still lies ahead, so a run of failed candidates doesn't rescan
+    # the rest of the text once per candidate.
+    pending: re.Match | None = None
+    searched = False
+    while (match := combined.search(subject, pos)) is not None:
+        pii_type, placeholder = meta[match.lastgroup]
+        # Credit cards need Luhn validation to reduce false positives. A failed
+        # candidate consumes nothing: other PII may start inside it and end past it.
+        if pii_type == "CREDIT_CARD" and not luhn(match.group()):
+            start = match.start()
+            if not searched or (pending is not None and pending.start() < start):
+                pending = non_cc.search(subject, start)
+                searched = True
+            if pending is None or pending.start() >= match.end():
+                pos = match.end()
+                continue
+            match = pending
+            pii_type, placeholder = non_cc_meta[match.lastgroup]
+        total_detections += 1
+        found.add(pii_type)
+        pieces.append(subject[last:match.start()])
+        pieces.append(placeholder)
+        last = pos = match.end()
+
+    if not found:
+        return (), 0, content
+
+    pieces.append(subject[last:])
+    redacted = subject[:0].join(pieces)  # "" or b"", like subject
+    detections = tuple(pii_type for pii_type in _PII_TYPES if pii_type in found)
+    return detections, total_detections, redacted if subject is content else redacted.decode()
+
+
+# Only "no PII found" outcomes are cached (by digest): a cached detection
+# would have to keep the redacted text, and with it the surrounding prompt.
+_clean_cache = ScanCache()
+
+
+def _detect_cached(content: str) -> tuple[tuple[str, ...], int, str]:
+    key = text_digest(content)
+    if _clean_cache.get(key):
+        return (), 0, content
+    result = _detect(content)
+    if not result[0]:
+        _clean_cache.put(key, True)
+    return result
+
+
+def scan_cache_stats() -> dict[str, int]:
+    """Hit/miss counters of the PII clean-result cache."""
+    return _clean_cache.stats()
+
+
+def scan_for_pii(content: str) -> PIIResult:
     """Scan content for PII and optionally redact.
 
     Returns detection results based on configured PII_ACTION:
@@ -73,33 +235,17 @@ async def scan_for_pii(content: str) -> PIIResult:
     - block: clean=False, caller should reject the request
     - log_only: clean=True, detections logged but content unchanged
     """
-    if not content.strip():
+    if not _PII_TRIGGER.search(content):
         return PIIResult(clean=True)
 
-    settings = get_settings()
-    detections: list[str] = []
-    redacted = content
-    total_detections = 0
-
-    for pattern, pii_type, placeholder in _PII_PATTERNS:
-        matches = pattern.finditer(content)
-        for match in matches:
-            matched_text = match.group()
-
-            # Credit cards need Luhn validation to reduce false positives
-            if pii_type == "CREDIT_CARD":
-                if not _luhn_check(matched_text):
-                    continue
-
-            total_detections += 1
-            if pii_type not in detections:
-                detections.append(pii_type)
-            redacted = redacted.replace(matched_text, placeholder, 1)
+    detect = _detect_cached if len(content) <= SCAN_CACHE_MAX_CHARS else _detect
+    detected, total_detections, redacted = detect(content)
 
-    if not detections:
+    if not detected:
         return PIIResult(clean=True)
 
-    action = settings.pii_action.lower()
+    detections = list(detected)
+    action = get_settings().pii_mode
 
     if action == "block":
         return PIIResult(
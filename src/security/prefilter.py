@@ -0,0 +1,51 @@
+"""Optional Hyperscan prefilter for the scanners' regex sets.
+
+With the hyperscan package installed (x86-64; Vectorscan builds elsewhere),
+each scanner compiles its patterns into one SIMD automaton and asks only
+"does anything match?". Text with no match skips the Python regex pass;
+text with a match still gets the full re scan, so scores, detections and
+redactions are identical with or without Hyperscan.
+
+Only ASCII text is prefiltered: IGNORECASE and \\s/\\d/\\b in str patterns
+are Unicode-aware in re, and Hyperscan's byte semantics are not.
+"""
+
+from collections.abc import Callable
+
+try:
+    import hyperscan
+except ImportError:  # optional dependency: scanners fall back to re alone
+    hyperscan = None
+
+
+def _stop(*_args) -> bool:
+    return True  # first match is enough; hyperscan raises ScanTerminated
+
+
+def compile_prefilter(patterns: list[bytes], caseless: bool = False) -> Callable[[bytes], bool] | None:
+    """any_match(data) over the patterns, or None when hyperscan isn't installed.
+
+    Patterns must be Hyperscan-compatible (no lookaround or backreferences).
+    One database and scratch per pattern set: call from a single thread, as
+    the scanners are (they run on the event loop).
+    """
+    if hyperscan is None:
+        return None
+
+    flags = hyperscan.HS_FLAG_SINGLEMATCH | (hyperscan.HS_FLAG_CASELESS if caseless else 0)
+    db = hyperscan.Database(mode=hyperscan.HS_MODE_BLOCK)
+    db.compile(
+        expressions=patterns,
+        ids=list(range(len(patterns))),
+        elements=len(patterns),
+        flags=[flags] * len(patterns),
+    )
+
+    def any_match(data: bytes) -> bool:
+        try:
+            db.scan(data, match_event_handler=_stop)
+        except hyperscan.ScanTerminated:
+            return True
+        return False
+
+    return any_match
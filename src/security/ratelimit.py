@@ -1,8 +1,11 @@
-"""Rate limiting module using in-memory sliding window counters.
+"""Rate limiting module using in-memory per-client counters.
 
-Enforces per-client request limits keyed by client_id. Uses a sliding
-window algorithm: timestamps of recent requests are stored in a deque,
-and expired entries are pruned on each check.
+Enforces per-client request limits keyed by client_id. Two algorithms,
+selected by RATE_LIMIT_ALGORITHM:
+- token_bucket (default): a bucket of `limit` tokens refilled continuously
+  at limit/minute. O(1) state per client.
+- sliding_window: timestamps of recent requests are stored in a deque and
+  expired entries are pruned on each check. Exact, but O(limit) per client.
 
 Returns standard rate limit metadata for response headers:
 - X-RateLimit-Limit
@@ -11,23 +14,63 @@ Returns standard rate limit metadata for response headers:
 """
 
 import time
-from collections import defaultdict, deque
+from collections import OrderedDict, deque
 from dataclasses import dataclass
+from operator import itemgetter
 
-# Per-client request timestamp deques
-# Key: client_id, Value: deque of request timestamps
-_client_windows: dict[str, deque[float]] = defaultdict(deque)
+from src.config.settings import get_settings
+
+# Per-client request timestamp deques (sliding_window)
+# Key: client_id, Value: deque of request timestamps (monotonic ns)
+_client_windows: OrderedDict[str, deque[int]] = OrderedDict()
+
+# Per-client token buckets (token_bucket)
+# Key: client_id, Value: (tokens left, monotonic ns of last refill)
+_buckets: OrderedDict[str, tuple[float, int]] = OrderedDict()
+
+# Both maps are kept in least-recently-used order so idle clients can be
+# dropped from the front, and capped so unbounded client_ids can't grow them.
+MAX_CLIENTS = 100_000
 
 WINDOW_SECONDS = 60.0  # 1-minute sliding window
+WINDOW_NS = int(WINDOW_SECONDS * 1_000_000_000)  # integer ns: no float rounding at the edge
+
+
+def _window_last_seen(window: deque[int]) -> int:
+    return window[-1] if window else 0
+
+
+_bucket_last_seen = itemgetter(1)
 
 
-@dataclass
+def _sweep(entries: OrderedDict, cutoff: int, last_seen) -> None:
+    """Drop idle clients from the LRU end and make room for one insert.
+
+    A client with no activity since `cutoff` (one window ago) has a fully
+    expired window / fully refilled bucket, the same as having no entry, so
+    dropping it loses nothing. Stops at the first live client: amortized O(1).
+    """
+    while entries and last_seen(next(iter(entries.values()))) < cutoff:
+        entries.popitem(last=False)
+    while len(entries) >= MAX_CLIENTS:
+        entries.popitem(last=False)
+
+
+@dataclass(slots=True)
 class RateLimitResult:
     allowed: bool
     limit: int
     remaining: int
     reset_seconds: float
 
+    def headers(self) -> dict[str, str]:
+        """X-RateLimit-* response headers for this result."""
+        return {
+            "X-RateLimit-Limit": str(self.limit),
+            "X-RateLimit-Remaining": str(self.remaining),
+            "X-RateLimit-Reset": str(int(self.reset_seconds)),
+        }
+
 
 async def check_rate_limit(client_id: str, limit: int) -> RateLimitResult:
     """Check if the client has exceeded their rate limit.
@@ -36,10 +79,58 @@ async def check_rate_limit(client_id: str, limit: int) -> RateLimitResult:
         client_id: Unique client identifier (not raw API key).
         limit: Max requests per minute for this client.
     """
-    now = time.monotonic()
-    window_start = now - WINDOW_SECONDS
+    if get_settings().rate_limit_algorithm == "sliding_window":
+        return _check_sliding_window(client_id, limit)
+    return _check_token_bucket(client_id, limit)
+
+
+def _check_token_bucket(client_id: str, limit: int) -> RateLimitResult:
+    now = time.monotonic_ns()
+    _sweep(_buckets, now - WINDOW_NS, _bucket_last_seen)
+    # pop + reinsert below moves the client to the most-recently-used end
+    entry = _buckets.pop(client_id, None)
+    tokens, last_refill = entry if entry is not None else (float(limit), now)
+
+    # Refill for the time elapsed since the last check, capped at a full bucket
+    tokens = min(float(limit), tokens + (now - last_refill) * limit / WINDOW_NS)
+
+    if tokens < 1.0:
+        # Unknown clients are only stored once a request is accepted
+        if entry is not None:
+            _buckets[client_id] = (tokens, now)
+        # Time until the next whole token
+        reset = (1.0 - tokens) * WINDOW_SECONDS / limit if limit > 0 else WINDOW_SECONDS
+        return RateLimitResult(
+            allowed=False,
+            limit=limit,
+            remaining=0,
+            reset_seconds=round(reset, 1),
+        )
 
-    window = _client_windows[client_id]
+    tokens -= 1.0
+    _buckets[client_id] = (tokens, now)
+
+    # Reset = time until the bucket is full again
+    return RateLimitResult(
+        allowed=True,
+        limit=limit,
+        remaining=int(tokens),
+        reset_seconds=round((limit - tokens) * WINDOW_SECONDS / limit, 1),
+    )
+
+
+def _check_sliding_window(client_id: str, limit: int) -> RateLimitResult:
+    now = time.monotonic_ns()
+    window_start = now - WINDOW_NS
+
+    _sweep(_client_windows, window_start, _window_last_seen)
+    window = _client_windows.get(client_id)
+    is_new = window is None
+    if is_new:
+        # Not stored until a request is accepted: denied probes mint no state
+        window = deque()
+    else:
+        _client_windows.move_to_end(client_id)
 
     # Prune expired timestamps from the left
     while window and window[0] < window_start:
@@ -47,29 +138,32 @@ async def check_rate_limit(client_id: str, limit: int) -> RateLimitResult:
 
     if len(window) >= limit:
         # Calculate when the oldest request in the window expires
-        reset = window[0] + WINDOW_SECONDS - now
+        reset = window[0] + WINDOW_NS - now if window else WINDOW_NS
         return RateLimitResult(
             allowed=False,
             limit=limit,
             remaining=0,
-            reset_seconds=round(reset, 1),
+            reset_seconds=round(reset / 1e9, 1),
         )
 
     # Record this request
     window.append(now)
+    if is_new:
+        _client_windows[client_id] = window
     remaining = max(0, limit - len(window))
 
     # Reset = time until the oldest entry in window expires
-    reset = window[0] + WINDOW_SECONDS - now if window else WINDOW_SECONDS
+    reset = window[0] + WINDOW_NS - now
 
     return RateLimitResult(
         allowed=True,
         limit=limit,
         remaining=remaining,
-        reset_seconds=round(reset, 1),
+        reset_seconds=round(reset / 1e9, 1),
     )
 
 
 def reset_client(client_key: str) -> None:
     """Clear rate limit state for a client. Useful for testing."""
     _client_windows.pop(client_key, None)
+    _buckets.pop(client_key, None)
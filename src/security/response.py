@@ -7,27 +7,27 @@ from src.security.injection import ScanResult, scan_prompt
 from src.security.pii import PIIResult, scan_for_pii
 
 
-@dataclass
+@dataclass(slots=True)
 class ResponseScanResult:
     injection: ScanResult
     pii: PIIResult
     blocked: bool = False
 
 
-async def scan_response(content: str) -> ResponseScanResult:
+def scan_response(content: str) -> ResponseScanResult:
     """Scan LLM response content for PII and injection patterns.
 
     Injection in responses is always advisory (log-only).
     PII blocking depends on response_pii_action setting.
     """
-    injection_result = await scan_prompt(content)
-    pii_result = await scan_for_pii(content)
+    injection_result = scan_prompt(content)
+    pii_result = scan_for_pii(content)
 
-    settings = get_settings()
+    # Settings are only consulted when PII was actually found (the rare case)
     blocked = (
-        settings.response_pii_action == "block"
-        and not pii_result.clean
+        not pii_result.clean
         and pii_result.detection_count > 0
+        and get_settings().response_pii_mode == "block"
     )
 
     return ResponseScanResult(
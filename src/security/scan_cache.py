@@ -0,0 +1,46 @@
+"""Bounded LRU of scan outcomes, keyed by a digest of the scanned text.
+
+Identical short texts (retries, canned greetings, health probes) skip the
+regex pass. Keys are 16-byte BLAKE2b digests rather than the text itself, so
+the process never holds on to prompts or PII just because they were scanned;
+callers only store outcomes that carry no text either.
+"""
+
+import hashlib
+from collections import OrderedDict
+
+# Only texts up to this many chars are cached: longer ones rarely repeat, and
+# hashing them would cost a noticeable share of the scan it might save.
+SCAN_CACHE_MAX_CHARS = 8192
+
+
+def text_digest(content: str) -> bytes:
+    # surrogatepass: JSON bodies may decode to lone surrogates
+    return hashlib.blake2b(content.encode("utf-8", "surrogatepass"), digest_size=16).digest()
+
+
+class ScanCache:
+    """Per-process LRU of scan outcomes (single-threaded: the event loop)."""
+
+    def __init__(self, max_size: int = 1024):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[object, object] = OrderedDict()
+
+    def get(self, key):
+        value = self._entries.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value) -> None:
+        self._entries[key] = value
+        if len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._entries)}
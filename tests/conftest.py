@@ -1,8 +1,6 @@
 """Shared fixtures for the LLM Security Gateway test suite."""
 
 import json
-import os
-import tempfile
 
 import pytest
 
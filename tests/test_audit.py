@@ -2,12 +2,14 @@
 
 import json
 import logging
-
-import pytest
+import random
+from datetime import datetime, timezone
 
 from src.logging.audit import (
     JSONFormatter,
     RequestTimer,
+    _iso_timestamp,
+    audit_base_var,
     generate_request_id,
     get_audit_logger,
     request_id_var,
@@ -55,6 +57,33 @@ class TestJSONFormatter:
         assert parsed["client_id"] == "c1"
         assert parsed["model"] == "gpt-4o"
 
+    def test_merges_audit_base(self):
+        token = audit_base_var.set({"client_id": "c1", "client_ip": "10.0.0.1"})
+        try:
+            formatter = JSONFormatter()
+            record = logging.LogRecord(
+                name="test", level=logging.INFO, pathname="",
+                lineno=0, msg="test", args=(), exc_info=None,
+            )
+            record.audit_data = {"client_ip": "override", "model": "gpt-4o"}
+            parsed = json.loads(formatter.format(record))
+            assert parsed["client_id"] == "c1"
+            assert parsed["client_ip"] == "override"
+            assert parsed["model"] == "gpt-4o"
+        finally:
+            audit_base_var.reset(token)
+
+    def test_non_serializable_values_stringified(self):
+        formatter = JSONFormatter()
+        record = logging.LogRecord(
+            name="test", level=logging.INFO, pathname="",
+            lineno=0, msg="test", args=(), exc_info=None,
+        )
+        record.audit_data = {"obj": object, "counts": {1: "one"}}
+        parsed = json.loads(formatter.format(record))
+        assert parsed["obj"] == str(object)
+        assert parsed["counts"] == {"1": "one"}
+
     def test_empty_request_id_default(self):
         formatter = JSONFormatter()
         record = logging.LogRecord(
@@ -66,6 +95,29 @@ class TestJSONFormatter:
         assert parsed["request_id"] == ""
 
 
+class TestIsoTimestamp:
+
+    def test_matches_datetime_isoformat(self):
+        rng = random.Random(1234)
+        for _ in range(10_000):
+            created = rng.uniform(1_600_000_000, 1_900_000_000)
+            expected = datetime.fromtimestamp(created, tz=timezone.utc).isoformat(timespec="microseconds")
+            assert _iso_timestamp(created) == expected, created
+
+    def test_rounds_up_into_next_second(self):
+        created = 1700000000.9999996
+        expected = datetime.fromtimestamp(created, tz=timezone.utc).isoformat(timespec="microseconds")
+        assert expected == "2023-11-14T22:13:21.000000+00:00"
+        assert _iso_timestamp(created) == expected
+
+    def test_same_second_reuses_prefix(self):
+        assert _iso_timestamp(1700000000.5).startswith("2023-11-14T22:13:20.5")
+        assert _iso_timestamp(1700000000.75) == "2023-11-14T22:13:20.750000+00:00"
+
+    def test_second_rollover(self):
+        assert _iso_timestamp(1700000001.0) == "2023-11-14T22:13:21.000000+00:00"
+
+
 class TestGenerateRequestId:
 
     def test_length(self):
@@ -1,21 +1,15 @@
 """Tests for src/security/auth.py — API key authentication."""
 
-from unittest.mock import AsyncMock, patch
-
 import pytest
 from fastapi import HTTPException
 
 import src.clients.factory as factory_mod
-from src.clients.models import ClientConfig
-from src.clients.store import JSONClientStore
 from src.security.auth import verify_api_key
 
 
 @pytest.fixture(autouse=True)
 def reset_factory(monkeypatch):
     monkeypatch.setattr(factory_mod, "_store", None)
-    yield
-    monkeypatch.setattr(factory_mod, "_store", None)
 
 
 class TestVerifyApiKey:
@@ -10,8 +10,6 @@ from src.clients.store import JSONClientStore
 def reset_store_singleton(monkeypatch):
     """Reset the factory singleton between tests."""
     monkeypatch.setattr(factory_mod, "_store", None)
-    yield
-    monkeypatch.setattr(factory_mod, "_store", None)
 
 
 class TestGetClientStore:
@@ -42,3 +42,7 @@ class TestClientConfig:
         a = ClientConfig(client_id="x", api_key="y")
         b = ClientConfig(client_id="x", api_key="y")
         assert a == b
+
+    def test_uses_slots(self):
+        c = ClientConfig(client_id="x", api_key="y")
+        assert not hasattr(c, "__dict__")
@@ -3,10 +3,25 @@
 import json
 import os
 import time
+from unittest.mock import patch
 
 import pytest
 
-from src.clients.store import JSONClientStore
+from src.clients.store import ClientStore, JSONClientStore, _digest
+
+
+class TestClientStoreBase:
+
+    async def test_base_lookup_not_implemented(self):
+        with pytest.raises(NotImplementedError):
+            await ClientStore().get_by_api_key("any")
+
+    def test_base_warm_is_noop(self):
+        ClientStore().warm()
+
+    async def test_base_prefetch_is_noop(self):
+        assert ClientStore().load_all() == 0
+        assert await ClientStore().prefetch() == 0
 
 
 class TestJSONClientStoreLoad:
@@ -39,13 +54,26 @@ class TestJSONClientStoreLookup:
         client = await store.get_by_api_key("nonexistent-key")
         assert client is None
 
-    async def test_timing_safe_comparison(self, clients_json_file):
-        """get_by_api_key iterates ALL clients even after finding a match
-        (constant-time via hmac.compare_digest)."""
+    async def test_keys_stored_as_digests(self, clients_json_file):
         store = JSONClientStore(clients_json_file)
-        # First client matches — ensure we still get correct result
-        client = await store.get_by_api_key("key-aaa-111")
-        assert client.client_id == "client-a"
+        assert len(store._by_digest) == 2
+        assert all(len(digest) == 32 for digest in store._by_digest)
+
+    async def test_prefix_of_valid_key_rejected(self, clients_json_file):
+        store = JSONClientStore(clients_json_file)
+        assert await store.get_by_api_key("key-aaa") is None
+
+    async def test_one_digest_regardless_of_client_count(self, tmp_path):
+        """Lookup cost doesn't scale with the number of clients."""
+        path = tmp_path / "clients.json"
+        path.write_text(json.dumps({"clients": [
+            {"client_id": f"c{i}", "api_key": f"key-{i:04d}"} for i in range(1000)
+        ]}))
+        store = JSONClientStore(str(path))
+        with patch("src.clients.store._digest", wraps=_digest) as digest:
+            client = await store.get_by_api_key("key-0999")
+        assert client.client_id == "c999"
+        assert digest.call_count == 1
 
 
 class TestJSONClientStoreReload:
@@ -66,7 +94,18 @@ class TestJSONClientStoreReload:
             json.dump(new_data, f)
         # Force mtime to be different
         os.utime(clients_json_file, (time.time() + 1, time.time() + 1))
+        # Let the stat interval elapse
+        store._last_stat -= store.STAT_INTERVAL
 
         client = await store.get_by_api_key("key-ccc-333")
         assert client is not None
         assert client.client_id == "client-c"
+
+    async def test_no_stat_within_interval(self, clients_json_file):
+        store = JSONClientStore(clients_json_file)
+
+        with patch("src.clients.store.os.path.getmtime") as mock_getmtime:
+            await store.get_by_api_key("key-aaa-111")
+            await store.get_by_api_key("key-aaa-111")
+
+        mock_getmtime.assert_not_called()
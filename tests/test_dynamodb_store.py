@@ -1,43 +1,48 @@
 """Tests for src/clients/dynamodb_store.py — DynamoDB client store."""
 
+import asyncio
+import threading
 import time
 from unittest.mock import MagicMock, patch
 
 import pytest
 
-from src.clients.dynamodb_store import DynamoDBClientStore
+import src.clients.dynamodb_store as dynamodb_mod
+from src.clients.dynamodb_store import DynamoDBClientStore, _miss_key
 
 
 @pytest.fixture
-def mock_table():
-    """Mock boto3 DynamoDB Table."""
+def mock_client():
+    """Mock low-level boto3 DynamoDB client."""
     return MagicMock()
 
 
 @pytest.fixture
-def store(mock_table):
-    """DynamoDBClientStore with pre-injected mock table."""
+def store(mock_client):
+    """DynamoDBClientStore with pre-injected mock client."""
     s = DynamoDBClientStore(table_name="test-table", region="us-east-1")
-    s._table = mock_table
+    s._client = mock_client
     return s
 
 
+# Low-level (typed) attribute format, as returned by client.query
 FULL_ITEM = {
-    "client_id": "client-1",
-    "api_key": "sk-test-key",
-    "provider": "bedrock",
-    "rate_limit_rpm": 30,
-    "model_allowlist": ["anthropic.claude-3-sonnet"],
-    "upstream_api_key": "sk-upstream",
-    "bedrock_model_id": "anthropic.claude-3-sonnet-20240229-v1:0",
-    "status": "active",
+    "client_id": {"S": "client-1"},
+    "api_key": {"S": "sk-test-key"},
+    "provider": {"S": "bedrock"},
+    "rate_limit_rpm": {"N": "30"},
+    "model_allowlist": {"L": [{"S": "anthropic.claude-3-sonnet"}]},
+    "upstream_api_key": {"S": "sk-upstream"},
+    "bedrock_model_id": {"S": "anthropic.claude-3-sonnet-20240229-v1:0"},
+    "status": {"S": "active"},
+    "max_prompt_chars": {"N": "20000"},
 }
 
 
 class TestQueryByKey:
 
-    async def test_found_client(self, store, mock_table):
-        mock_table.query.return_value = {"Items": [FULL_ITEM]}
+    async def test_found_client(self, store, mock_client):
+        mock_client.query.return_value = {"Items": [FULL_ITEM]}
 
         result = await store.get_by_api_key("sk-test-key")
         assert result is not None
@@ -45,24 +50,25 @@ class TestQueryByKey:
         assert result.provider == "bedrock"
         assert result.bedrock_model_id == "anthropic.claude-3-sonnet-20240229-v1:0"
 
-    async def test_not_found(self, store, mock_table):
-        mock_table.query.return_value = {"Items": []}
+    async def test_not_found(self, store, mock_client):
+        mock_client.query.return_value = {"Items": []}
 
         result = await store.get_by_api_key("sk-nonexistent")
         assert result is None
 
-    async def test_maps_all_fields(self, store, mock_table):
-        mock_table.query.return_value = {"Items": [FULL_ITEM]}
+    async def test_maps_all_fields(self, store, mock_client):
+        mock_client.query.return_value = {"Items": [FULL_ITEM]}
 
         result = await store.get_by_api_key("sk-test-key")
         assert result.rate_limit_rpm == 30
         assert result.model_allowlist == ["anthropic.claude-3-sonnet"]
         assert result.upstream_api_key == "sk-upstream"
         assert result.status == "active"
+        assert result.max_prompt_chars == 20000
 
-    async def test_defaults_for_missing_fields(self, store, mock_table):
-        minimal_item = {"client_id": "client-2", "api_key": "sk-minimal"}
-        mock_table.query.return_value = {"Items": [minimal_item]}
+    async def test_defaults_for_missing_fields(self, store, mock_client):
+        minimal_item = {"client_id": {"S": "client-2"}, "api_key": {"S": "sk-minimal"}}
+        mock_client.query.return_value = {"Items": [minimal_item]}
 
         result = await store.get_by_api_key("sk-minimal")
         assert result.provider == "openai"
@@ -71,55 +77,234 @@ class TestQueryByKey:
         assert result.upstream_api_key == ""
         assert result.bedrock_model_id == ""
         assert result.status == "active"
+        assert result.max_prompt_chars == 0
+
+    async def test_allowlist_as_string_set(self, store, mock_client):
+        item = {**FULL_ITEM, "model_allowlist": {"SS": ["gpt-4o"]}}
+        mock_client.query.return_value = {"Items": [item]}
+
+        result = await store.get_by_api_key("sk-test-key")
+        assert result.model_allowlist == ["gpt-4o"]
+
+    def test_every_config_field_has_a_decoder(self):
+        from dataclasses import fields
+
+        from src.clients.models import ClientConfig
+
+        assert [name for name, _ in dynamodb_mod._FIELD_DECODERS] == [f.name for f in fields(ClientConfig)]
+
+    async def test_query_uses_gsi_and_typed_key(self, store, mock_client):
+        mock_client.query.return_value = {"Items": []}
+
+        await store.get_by_api_key("sk-test-key")
+        kwargs = mock_client.query.call_args.kwargs
+        assert kwargs["TableName"] == "test-table"
+        assert kwargs["IndexName"] == "api_key_index"
+        assert kwargs["ExpressionAttributeValues"] == {":k": {"S": "sk-test-key"}}
+
+    async def test_query_projects_config_fields_only(self, store, mock_client):
+        mock_client.query.return_value = {"Items": []}
+
+        await store.get_by_api_key("sk-test-key")
+        kwargs = mock_client.query.call_args.kwargs
+        names = kwargs["ExpressionAttributeNames"]
+        projected = [names[p.strip()] for p in kwargs["ProjectionExpression"].split(",")]
+        assert projected == [name for name, _ in dynamodb_mod._FIELD_DECODERS]
 
 
 class TestCache:
 
-    async def test_cache_hit_skips_query(self, store, mock_table):
-        mock_table.query.return_value = {"Items": [FULL_ITEM]}
+    async def test_cache_hit_skips_query(self, store, mock_client):
+        mock_client.query.return_value = {"Items": [FULL_ITEM]}
 
         # First call — queries DynamoDB
         await store.get_by_api_key("sk-test-key")
-        assert mock_table.query.call_count == 1
+        assert mock_client.query.call_count == 1
 
         # Second call — cache hit, no query
         await store.get_by_api_key("sk-test-key")
-        assert mock_table.query.call_count == 1
+        assert mock_client.query.call_count == 1
 
-    async def test_cache_expired_re_queries(self, store, mock_table):
-        mock_table.query.return_value = {"Items": [FULL_ITEM]}
+    async def test_cache_expired_re_queries(self, store, mock_client):
+        mock_client.query.return_value = {"Items": [FULL_ITEM]}
 
         await store.get_by_api_key("sk-test-key")
-        assert mock_table.query.call_count == 1
+        assert mock_client.query.call_count == 1
 
         # Expire the cache entry
         key, (config, _) = next(iter(store._cache.items()))
         store._cache[key] = (config, time.monotonic() - 1)
 
         await store.get_by_api_key("sk-test-key")
-        assert mock_table.query.call_count == 2
+        assert mock_client.query.call_count == 2
 
-    async def test_none_not_cached(self, store, mock_table):
-        mock_table.query.return_value = {"Items": []}
+    async def test_none_not_cached(self, store, mock_client):
+        mock_client.query.return_value = {"Items": []}
 
         await store.get_by_api_key("sk-missing")
         assert "sk-missing" not in store._cache
 
+    async def test_negative_cache_skips_repeat_query(self, store, mock_client):
+        mock_client.query.return_value = {"Items": []}
+
+        assert await store.get_by_api_key("sk-missing") is None
+        assert await store.get_by_api_key("sk-missing") is None
+        assert mock_client.query.call_count == 1
+
+    async def test_negative_cache_expired_re_queries(self, store, mock_client):
+        mock_client.query.return_value = {"Items": []}
+
+        await store.get_by_api_key("sk-missing")
+        store._neg_cache[_miss_key("sk-missing")] = time.monotonic() - 1
+
+        mock_client.query.return_value = {"Items": [FULL_ITEM]}
+        result = await store.get_by_api_key("sk-missing")
+        assert result is not None
+        assert mock_client.query.call_count == 2
+
+    async def test_negative_cache_entries_are_fixed_size(self, store, mock_client):
+        mock_client.query.return_value = {"Items": []}
+
+        await store.get_by_api_key("sk-" + "x" * 8000)
+        assert [len(k) for k in store._neg_cache] == [16]
+
+    async def test_negative_cache_disabled(self, mock_client):
+        store = DynamoDBClientStore(table_name="t", negative_cache_ttl=0)
+        store._client = mock_client
+        mock_client.query.return_value = {"Items": []}
+
+        await store.get_by_api_key("sk-missing")
+        await store.get_by_api_key("sk-missing")
+        assert mock_client.query.call_count == 2
+
+    async def test_lru_eviction_at_max_size(self, store, mock_client):
+        mock_client.query.return_value = {"Items": [FULL_ITEM]}
+        store.CACHE_MAX_SIZE = 2
+
+        await store.get_by_api_key("key-a")
+        await store.get_by_api_key("key-b")
+        await store.get_by_api_key("key-a")  # refresh recency of key-a
+        await store.get_by_api_key("key-c")  # evicts key-b
+
+        assert list(store._cache) == ["key-a", "key-c"]
+
+
+class TestCoalescing:
+
+    async def test_concurrent_misses_share_one_query(self, store, mock_client):
+        def slow_query(**kwargs):
+            time.sleep(0.05)  # keep the first lookup in flight
+            return {"Items": [FULL_ITEM]}
+
+        mock_client.query.side_effect = slow_query
+
+        results = await asyncio.gather(*(store.get_by_api_key("sk-test-key") for _ in range(5)))
+
+        assert mock_client.query.call_count == 1
+        assert all(r is results[0] for r in results)
+        assert store._inflight == {}
+
+    async def test_query_error_propagates_to_all_waiters(self, store, mock_client):
+        mock_client.query.side_effect = RuntimeError("boom")
+
+        results = await asyncio.gather(
+            store.get_by_api_key("sk-test-key"),
+            store.get_by_api_key("sk-test-key"),
+            return_exceptions=True,
+        )
+
+        assert all(isinstance(r, RuntimeError) for r in results)
+        assert mock_client.query.call_count == 1
+
+    async def test_lookups_for_distinct_keys_run_off_loop(self, store, mock_client):
+        # Each blocking boto3 call waits for the other: only passes if both are
+        # in flight at once in worker threads (on the loop they'd deadlock and
+        # the barrier would time out)
+        both_in_flight = threading.Barrier(2, timeout=5)
+
+        def query(**kwargs):
+            both_in_flight.wait()
+            return {"Items": [FULL_ITEM]}
+
+        mock_client.query.side_effect = query
+
+        await asyncio.gather(store.get_by_api_key("sk-key-a"), store.get_by_api_key("sk-key-b"))
+        assert mock_client.query.call_count == 2
+
+
+class TestPrefetch:
+
+    def test_load_all_pages_through_scan(self, store, mock_client):
+        second = dict(FULL_ITEM, client_id={"S": "client-2"}, api_key={"S": "sk-second"})
+        mock_client.scan.side_effect = [
+            {"Items": [FULL_ITEM], "LastEvaluatedKey": {"client_id": {"S": "client-1"}}},
+            {"Items": [second]},
+        ]
+
+        assert store.load_all() == 2
+        assert mock_client.scan.call_count == 2
+        assert mock_client.scan.call_args.kwargs["ExclusiveStartKey"] == {"client_id": {"S": "client-1"}}
+        assert mock_client.scan.call_args.kwargs["ProjectionExpression"] == dynamodb_mod._PROJECTION
+        assert set(store._cache) == {"sk-test-key", "sk-second"}
+
+    async def test_prefetched_keys_skip_query(self, store, mock_client):
+        mock_client.scan.return_value = {"Items": [FULL_ITEM]}
+        assert await store.prefetch() == 1
+
+        result = await store.get_by_api_key("sk-test-key")
+        assert result.client_id == "client-1"
+        mock_client.query.assert_not_called()
+
+    def test_load_all_clears_negative_entries(self, store, mock_client):
+        store._neg_cache[_miss_key("sk-test-key")] = time.monotonic() + 60
+        mock_client.scan.return_value = {"Items": [FULL_ITEM]}
+        store.load_all()
+        assert _miss_key("sk-test-key") not in store._neg_cache
+
 
 class TestLazyInit:
 
-    def test_table_is_none_initially(self):
+    @pytest.fixture(autouse=True)
+    def fresh_shared_clients(self, monkeypatch):
+        monkeypatch.setattr(dynamodb_mod, "_shared_clients", {})
+
+    def test_client_is_none_initially(self):
         store = DynamoDBClientStore(table_name="t", region="us-east-1")
-        assert store._table is None
+        assert store._client is None
 
-    @patch("boto3.resource")
-    def test_table_created_on_first_query(self, mock_resource):
-        mock_dynamodb = MagicMock()
-        mock_resource.return_value = mock_dynamodb
-        mock_dynamodb.Table.return_value = MagicMock()
+    @patch("boto3.client")
+    def test_client_created_on_first_query(self, mock_boto_client):
+        store = DynamoDBClientStore(table_name="my-table", region="us-west-2")
+        store._get_client()
+
+        mock_boto_client.assert_called_once()
+        assert mock_boto_client.call_args.args == ("dynamodb",)
+        assert mock_boto_client.call_args.kwargs["region_name"] == "us-west-2"
 
+    @patch("boto3.client")
+    def test_client_uses_keepalive_config(self, mock_boto_client):
         store = DynamoDBClientStore(table_name="my-table", region="us-west-2")
-        store._get_table()
+        store._get_client()
+
+        config = mock_boto_client.call_args.kwargs["config"]
+        assert config.tcp_keepalive is True
+        assert config.max_pool_connections == 10
+
+    @patch("boto3.client")
+    def test_warm_builds_client(self, mock_boto_client):
+        store = DynamoDBClientStore(table_name="my-table", region="us-west-2")
+        store.warm()
+
+        assert store._client is not None
+        mock_boto_client.assert_called_once()
+
+    @patch("boto3.client")
+    def test_stores_share_client_per_region(self, mock_boto_client):
+        mock_boto_client.side_effect = lambda *args, **kwargs: MagicMock()
+        a = DynamoDBClientStore(table_name="t", region="us-west-2")
+        b = DynamoDBClientStore(table_name="t", region="us-west-2")
+        c = DynamoDBClientStore(table_name="t", region="eu-west-1")
 
-        mock_resource.assert_called_once_with("dynamodb", region_name="us-west-2")
-        mock_dynamodb.Table.assert_called_once_with("my-table")
+        assert a._get_client() is b._get_client()
+        assert c._get_client() is not a._get_client()
+        assert mock_boto_client.call_count == 2
@@ -1,15 +1,17 @@
 """Integration tests for src/main.py — full security pipeline via ASGI transport."""
 
+import logging
 from unittest.mock import AsyncMock, patch
 
+import orjson
 import pytest
 import httpx
 
 import src.clients.factory as factory_mod
 import src.providers.registry as registry_mod
-from src.clients.models import ClientConfig
+from src.main import _extract_prompt_content, _refresh_clients, app, lifespan
 from src.providers.base import ProviderResponse
-from src.security.ratelimit import _client_windows
+from src.security.ratelimit import _buckets, _client_windows
 
 
 @pytest.fixture(autouse=True)
@@ -18,10 +20,10 @@ def reset_singletons(monkeypatch):
     monkeypatch.setattr(factory_mod, "_store", None)
     monkeypatch.setattr(registry_mod, "_providers", {})
     _client_windows.clear()
+    _buckets.clear()
     yield
-    monkeypatch.setattr(factory_mod, "_store", None)
-    monkeypatch.setattr(registry_mod, "_providers", {})
     _client_windows.clear()
+    _buckets.clear()
 
 
 @pytest.fixture
@@ -50,7 +52,6 @@ def app_client(override_settings, mock_provider, clients_json_file):
     with patch(
         "src.proxy.handler.get_provider", return_value=mock_provider
     ):
-        from src.main import app
         transport = httpx.ASGITransport(app=app)
         client = httpx.AsyncClient(transport=transport, base_url="http://test")
         yield client
@@ -65,6 +66,11 @@ class TestHealthEndpoint:
         assert data["status"] == "healthy"
         assert "version" in data
 
+    async def test_health_exposes_no_scan_cache_stats(self, app_client):
+        """Unauthenticated; cache hits would reveal what other clients sent."""
+        data = (await app_client.get("/health")).json()
+        assert set(data) == {"status", "version"}
+
 
 class TestAuthPipeline:
 
@@ -83,6 +89,13 @@ class TestAuthPipeline:
         )
         assert resp.status_code == 403
 
+    async def test_http_errors_rendered_with_orjson(self, app_client):
+        with patch("src.main.orjson.dumps", wraps=orjson.dumps) as dumps:
+            resp = await app_client.post("/v1/chat/completions", json={})
+        assert resp.status_code == 401
+        assert resp.json() == {"detail": "Missing API key"}
+        dumps.assert_called_once()
+
     async def test_suspended_client(self, app_client):
         resp = await app_client.post(
             "/v1/chat/completions",
@@ -142,6 +155,30 @@ class TestModelAllowlist:
         assert resp.status_code == 200
 
 
+class TestPreflight:
+
+    async def test_empty_messages_rejected(self, app_client, mock_provider):
+        resp = await app_client.post(
+            "/v1/chat/completions",
+            json={"model": "gpt-4o", "messages": []},
+            headers={"X-API-Key": "key-aaa-111"},
+        )
+        assert resp.status_code == 400
+        assert "messages" in resp.json()["error"]
+        mock_provider.chat_completion.assert_not_called()
+
+    async def test_prompt_too_long_rejected(self, app_client, override_settings, mock_provider):
+        override_settings(MAX_PROMPT_CHARS="10")
+        resp = await app_client.post(
+            "/v1/chat/completions",
+            json={"model": "gpt-4o", "messages": [{"role": "user", "content": "x" * 11}]},
+            headers={"X-API-Key": "key-aaa-111"},
+        )
+        assert resp.status_code == 400
+        assert "too long" in resp.json()["error"]
+        mock_provider.chat_completion.assert_not_called()
+
+
 class TestInjectionScanning:
 
     async def test_injection_blocked(self, app_client):
@@ -197,7 +234,6 @@ class TestPIIScanning:
             PII_ACTION="block",
         )
         with patch("src.proxy.handler.get_provider", return_value=mock_provider):
-            from src.main import app
             transport = httpx.ASGITransport(app=app)
             async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
                 resp = await client.post(
@@ -213,6 +249,24 @@ class TestPIIScanning:
             assert resp.status_code == 400
             assert "PII" in resp.json()["error"]
 
+    async def test_pii_block_mode_case_insensitive(self, override_settings, mock_provider, clients_json_file):
+        """PII_ACTION is matched case-insensitively, same as the scanner."""
+        override_settings(
+            CLIENT_STORE_BACKEND="json",
+            CLIENT_CONFIG_PATH=clients_json_file,
+            PII_ACTION="BLOCK",
+        )
+        with patch("src.proxy.handler.get_provider", return_value=mock_provider):
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                resp = await client.post(
+                    "/v1/chat/completions",
+                    json={"model": "gpt-4o", "messages": [{"role": "user", "content": "My SSN is 123-45-6789"}]},
+                    headers={"X-API-Key": "key-aaa-111"},
+                )
+            assert resp.status_code == 400
+            mock_provider.chat_completion.assert_not_called()
+
 
 class TestSuccessResponse:
 
@@ -236,6 +290,32 @@ class TestSuccessResponse:
         data = resp.json()
         assert data["choices"][0]["message"]["content"] == "Hello!"
 
+    async def test_raw_body_forwarded_verbatim(self, app_client, mock_provider):
+        raw = b'{"choices": [{"message": {"content": "Hi"}}], "x": 1.50}'
+        mock_provider.chat_completion.return_value = ProviderResponse(status_code=200, raw=raw)
+        resp = await app_client.post(
+            "/v1/chat/completions",
+            json={"model": "gpt-4o", "messages": [{"role": "user", "content": "hi"}]},
+            headers={"X-API-Key": "key-aaa-111"},
+        )
+        assert resp.content == raw
+        assert resp.headers["content-type"] == "application/json"
+        assert "x-request-id" in resp.headers
+
+    async def test_upstream_error_body_not_parsed(self, app_client, mock_provider):
+        raw = b"<html>Bad Gateway</html>"
+        mock_provider.chat_completion.return_value = ProviderResponse(
+            status_code=502, raw=raw, content_type="text/html; charset=utf-8",
+        )
+        resp = await app_client.post(
+            "/v1/chat/completions",
+            json={"model": "gpt-4o", "messages": [{"role": "user", "content": "hi"}]},
+            headers={"X-API-Key": "key-aaa-111"},
+        )
+        assert resp.status_code == 502
+        assert resp.content == raw
+        assert resp.headers["content-type"] == "text/html; charset=utf-8"
+
 
 class TestLegacyAuth:
 
@@ -248,7 +328,6 @@ class TestLegacyAuth:
             UPSTREAM_API_KEY="sk-test",
         )
         with patch("src.proxy.handler.get_provider", return_value=mock_provider):
-            from src.main import app
             transport = httpx.ASGITransport(app=app)
             async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
                 resp = await client.post(
@@ -257,3 +336,85 @@ class TestLegacyAuth:
                     headers={"X-API-Key": "legacy-test-key"},
                 )
             assert resp.status_code == 200
+
+
+class TestAuditLogging:
+
+    async def test_audit_skipped_when_level_disabled(self, app_client):
+        from src.logging.audit import get_audit_logger
+
+        logger = get_audit_logger()
+        original_level = logger.level
+        logger.setLevel(logging.ERROR)
+        try:
+            with patch.object(logger, "info") as mock_info:
+                resp = await app_client.post(
+                    "/v1/chat/completions",
+                    json={"model": "gpt-4o", "messages": [{"role": "user", "content": "hi"}]},
+                    headers={"X-API-Key": "key-aaa-111"},
+                )
+            assert resp.status_code == 200
+            mock_info.assert_not_called()
+        finally:
+            logger.setLevel(original_level)
+
+
+class TestRequestParsing:
+
+    async def test_raw_bytes_body_parsed(self, app_client):
+        resp = await app_client.post(
+            "/v1/chat/completions",
+            content=b'{"model": "gpt-4o", "messages": [{"role": "user", "content": "h\\u00e9llo"}]}',
+            headers={"X-API-Key": "key-aaa-111", "Content-Type": "application/json"},
+        )
+        assert resp.status_code == 200
+
+
+class TestExtractPromptContent:
+
+    def test_single_string_message(self):
+        body = {"messages": [{"role": "user", "content": "hello"}]}
+        assert _extract_prompt_content(body) == "hello"
+
+    def test_multiple_messages_joined(self, chat_request_body):
+        assert _extract_prompt_content(chat_request_body) == (
+            "You are a helpful assistant.\nHello, how are you?"
+        )
+
+    def test_single_multipart_message(self):
+        body = {"messages": [{"role": "user", "content": [
+            {"type": "text", "text": "describe"},
+            {"type": "image_url", "image_url": {"url": "https://example.com/a.png"}},
+            {"type": "text", "text": "this"},
+        ]}]}
+        assert _extract_prompt_content(body) == "describe\nthis"
+
+    def test_no_messages(self):
+        assert _extract_prompt_content({}) == ""
+
+
+class TestClientRefresh:
+
+    async def test_refresh_loop_survives_prefetch_errors(self):
+        import asyncio
+
+        store = AsyncMock()
+        store.prefetch.side_effect = [RuntimeError("throttled"), 3]
+        sleeps = 0
+
+        async def fake_sleep(_):
+            nonlocal sleeps
+            sleeps += 1
+            if sleeps == 2:
+                raise asyncio.CancelledError
+
+        with patch("src.main.asyncio.sleep", fake_sleep), pytest.raises(asyncio.CancelledError):
+            await _refresh_clients(store, 60)
+        assert store.prefetch.await_count == 2
+
+    async def test_lifespan_starts_refresh_only_when_enabled(self, override_settings):
+        override_settings(CLIENT_PREFETCH_INTERVAL="0")
+        with patch("src.main.get_client_store") as get_store:
+            async with lifespan(app):
+                pass
+        get_store.assert_not_called()
@@ -1,5 +1,9 @@
 """Tests for src/security/pii.py — PII detection and redaction."""
 
+import random
+import time
+from unittest.mock import patch
+
 import pytest
 
 from src.security.pii import _luhn_check, scan_for_pii
@@ -22,138 +26,367 @@ class TestLuhnCheck:
     def test_too_long(self):
         assert _luhn_check("4111111111111111111111") is False
 
+    def test_separators_ignored(self):
+        assert _luhn_check("4111-1111 1111-1111") is True
+
+    @pytest.mark.parametrize("number", ["135410014004955", "378282246310005", "6011111111111117"])
+    def test_other_issuer_prefixes(self, number):
+        """UATP (1), Amex (3) and Discover (6) cards are still checked."""
+        assert _luhn_check(number) is True
+
+    def test_leading_zero_is_not_a_card(self):
+        """Checksum-valid but MII 0: a zero-padded ID, not a payment card."""
+        arabic = str.maketrans("0123456789", "٠١٢٣٤٥٦٧٨٩")
+        assert _luhn_check("0004111111111111") is False
+        assert _luhn_check("0004111111111111".translate(arabic)) is False
+
+    def test_matches_reference_algorithm(self):
+        def reference(number):
+            digits = [int(d) for d in number if d.isdigit()]
+            if len(digits) < 13 or len(digits) > 19:
+                return False
+            checksum = 0
+            for i, d in enumerate(digits[::-1]):
+                if i % 2 == 1:
+                    d *= 2
+                    if d > 9:
+                        d -= 9
+                checksum += d
+            return checksum % 10 == 0
+
+        for n in range(4111111111111100, 4111111111111200):
+            assert _luhn_check(str(n)) is reference(str(n))
+
+    def test_non_ascii_digits(self):
+        """Arabic-Indic digits take the per-character path."""
+        arabic = str.maketrans("0123456789", "٠١٢٣٤٥٦٧٨٩")
+        assert _luhn_check("4111 1111 1111 1111".translate(arabic)) is True
+        assert _luhn_check("4111 1111 1111 1112".translate(arabic)) is False
+
+    @pytest.mark.parametrize("number", [
+        "4111-1111-1111-1111", "5555 5555 5555 4444", "1234-5678-9012-345",
+        "4111\t1111\t1111\t1112", "123456789012", "12345678901234567890",
+    ])
+    def test_byte_path_matches_unicode_path(self, number):
+        from src.security.pii import _luhn_check_unicode
+
+        assert _luhn_check(number) is _luhn_check_unicode(number)
+
 
 class TestSSNDetection:
 
-    async def test_ssn_dash_format(self, override_settings):
+    def test_ssn_dash_format(self, override_settings):
         override_settings(PII_ACTION="redact")
-        result = await scan_for_pii("My SSN is 123-45-6789")
+        result = scan_for_pii("My SSN is 123-45-6789")
         assert "SSN" in result.detections
         assert "[REDACTED_SSN]" in result.redacted_content
 
-    async def test_ssn_space_format(self, override_settings):
+    def test_ssn_space_format(self, override_settings):
         override_settings(PII_ACTION="redact")
-        result = await scan_for_pii("My SSN is 123 45 6789")
+        result = scan_for_pii("My SSN is 123 45 6789")
         assert "SSN" in result.detections
 
 
 class TestCreditCardDetection:
 
-    async def test_valid_cc_plain(self, override_settings):
+    def test_valid_cc_plain(self, override_settings):
         override_settings(PII_ACTION="redact")
-        result = await scan_for_pii("Card: 4111111111111111")
+        result = scan_for_pii("Card: 4111111111111111")
         assert "CREDIT_CARD" in result.detections
         assert "[REDACTED_CC]" in result.redacted_content
 
-    async def test_valid_cc_dashes(self, override_settings):
+    def test_valid_cc_dashes(self, override_settings):
         override_settings(PII_ACTION="redact")
-        result = await scan_for_pii("Card: 4111-1111-1111-1111")
+        result = scan_for_pii("Card: 4111-1111-1111-1111")
         assert "CREDIT_CARD" in result.detections
 
-    async def test_valid_cc_spaces(self, override_settings):
+    def test_valid_cc_spaces(self, override_settings):
         override_settings(PII_ACTION="redact")
-        result = await scan_for_pii("Card: 4111 1111 1111 1111")
+        result = scan_for_pii("Card: 4111 1111 1111 1111")
         assert "CREDIT_CARD" in result.detections
 
-    async def test_invalid_cc_fails_luhn(self, override_settings):
+    def test_invalid_cc_fails_luhn(self, override_settings):
         """Number that matches CC regex but fails Luhn should NOT be detected."""
         override_settings(PII_ACTION="redact")
-        result = await scan_for_pii("Number: 4111111111111112")
+        result = scan_for_pii("Number: 4111111111111112")
         assert "CREDIT_CARD" not in result.detections
 
 
+    @pytest.mark.parametrize("text", [
+        "1" * 40, "1-2-3-4-5-6-7-8-9-0-1-2-3-4-5-6-7-8-9-0", "12 34 56 78 90 12 34 56 78 90",
+    ])
+    def test_candidates_always_have_13_to_19_digits(self, text):
+        from src.security.pii import _PII_PATTERNS
+
+        cc_pattern = next(p for p, pii_type, _ in _PII_PATTERNS if pii_type == "CREDIT_CARD")
+        for match in cc_pattern.finditer(text):
+            assert 13 <= sum(c.isdigit() for c in match.group()) <= 19
+
+
 class TestEmailDetection:
 
-    async def test_simple_email(self, override_settings):
+    def test_simple_email(self, override_settings):
         override_settings(PII_ACTION="redact")
-        result = await scan_for_pii("Contact me at user@example.com")
+        result = scan_for_pii("Contact me at user@example.com")
         assert "EMAIL" in result.detections
         assert "[REDACTED_EMAIL]" in result.redacted_content
 
-    async def test_email_with_plus(self, override_settings):
+    def test_email_with_plus(self, override_settings):
         override_settings(PII_ACTION="redact")
-        result = await scan_for_pii("user+tag@example.com")
+        result = scan_for_pii("user+tag@example.com")
         assert "EMAIL" in result.detections
 
 
 class TestPhoneDetection:
 
-    async def test_phone_dashes(self, override_settings):
+    def test_phone_dashes(self, override_settings):
         override_settings(PII_ACTION="redact")
-        result = await scan_for_pii("Call me at 123-456-7890")
+        result = scan_for_pii("Call me at 123-456-7890")
         assert "PHONE" in result.detections
         assert "[REDACTED_PHONE]" in result.redacted_content
 
-    async def test_phone_dots(self, override_settings):
+    def test_phone_dots(self, override_settings):
         override_settings(PII_ACTION="redact")
-        result = await scan_for_pii("Call me at 123.456.7890")
+        result = scan_for_pii("Call me at 123.456.7890")
         assert "PHONE" in result.detections
 
-    async def test_phone_parens(self, override_settings):
+    def test_phone_parens(self, override_settings):
         override_settings(PII_ACTION="redact")
-        result = await scan_for_pii("Call me at (123) 456-7890")
+        result = scan_for_pii("Call me at (123) 456-7890")
         assert "PHONE" in result.detections
 
-    async def test_bare_digits_not_phone(self, override_settings):
+    def test_bare_digits_not_phone(self, override_settings):
         """10 consecutive digits without separators should not match phone."""
         override_settings(PII_ACTION="redact")
-        result = await scan_for_pii("Order ID: 1234567890")
+        result = scan_for_pii("Order ID: 1234567890")
         assert "PHONE" not in result.detections
 
 
 class TestIPDetection:
 
-    async def test_ipv4(self, override_settings):
+    def test_ipv4(self, override_settings):
         override_settings(PII_ACTION="redact")
-        result = await scan_for_pii("Server at 192.168.1.100")
+        result = scan_for_pii("Server at 192.168.1.100")
         assert "IP_ADDRESS" in result.detections
         assert "[REDACTED_IP]" in result.redacted_content
 
-    async def test_boundary_ip(self, override_settings):
+    def test_boundary_ip(self, override_settings):
         override_settings(PII_ACTION="redact")
-        result = await scan_for_pii("IP: 255.255.255.255")
+        result = scan_for_pii("IP: 255.255.255.255")
         assert "IP_ADDRESS" in result.detections
 
 
 class TestPIIActions:
 
-    async def test_redact_mode(self, override_settings):
+    def test_redact_mode(self, override_settings):
         override_settings(PII_ACTION="redact")
-        result = await scan_for_pii("Email: test@example.com")
+        result = scan_for_pii("Email: test@example.com")
         assert result.clean is False
         assert result.redacted_content is not None
         assert "test@example.com" not in result.redacted_content
 
-    async def test_block_mode(self, override_settings):
+    def test_block_mode(self, override_settings):
         override_settings(PII_ACTION="block")
-        result = await scan_for_pii("Email: test@example.com")
+        result = scan_for_pii("Email: test@example.com")
         assert result.clean is False
         assert result.redacted_content is None
         assert result.detection_count == 1
 
-    async def test_log_only_mode(self, override_settings):
+    def test_log_only_mode(self, override_settings):
         override_settings(PII_ACTION="log_only")
-        result = await scan_for_pii("Email: test@example.com")
+        result = scan_for_pii("Email: test@example.com")
         assert result.clean is True
         assert result.detection_count == 1
         assert "EMAIL" in result.detections
 
-    async def test_empty_input(self, override_settings):
+    def test_empty_input(self, override_settings):
         override_settings(PII_ACTION="redact")
-        result = await scan_for_pii("")
+        result = scan_for_pii("")
         assert result.clean is True
         assert result.detection_count == 0
 
-    async def test_no_pii(self, override_settings):
+    def test_no_pii(self, override_settings):
         override_settings(PII_ACTION="redact")
-        result = await scan_for_pii("This is a clean message with no PII.")
+        result = scan_for_pii("This is a clean message with no PII.")
         assert result.clean is True
 
-    async def test_multiple_pii_types(self, override_settings):
+    def test_multiple_pii_types(self, override_settings):
         override_settings(PII_ACTION="redact")
-        result = await scan_for_pii(
+        result = scan_for_pii(
             "My email is user@test.com and my SSN is 123-45-6789"
         )
         assert "EMAIL" in result.detections
         assert "SSN" in result.detections
         assert result.detection_count == 2
+
+
+class TestSinglePassRedaction:
+
+    def test_fused_groups_cover_every_pattern(self):
+        """Each fused regex has exactly one named group per PII pattern, all dispatchable."""
+        from src.security.pii import (
+            _COMBINED_PII, _COMBINED_PII_ASCII, _META, _NON_CC_META, _NON_CC_PII, _PII_PATTERNS,
+        )
+
+        assert set(_COMBINED_PII.groupindex) == set(_META) == set(_COMBINED_PII_ASCII.groupindex)
+        assert len(_META) == len(_PII_PATTERNS)
+        assert set(_NON_CC_PII.groupindex) == set(_NON_CC_META)
+        assert "CREDIT_CARD" not in {pii_type for pii_type, _ in _NON_CC_META.values()}
+
+    def test_detections_in_pattern_order(self, override_settings):
+        override_settings(PII_ACTION="redact")
+        result = scan_for_pii("ip 10.0.0.1, mail a@b.com, ssn 123-45-6789")
+        assert result.detections == ["SSN", "EMAIL", "IP_ADDRESS"]
+
+    def test_each_occurrence_redacted_in_place(self, override_settings):
+        override_settings(PII_ACTION="redact")
+        result = scan_for_pii("a@b.com then a@b.com")
+        assert result.redacted_content == "[REDACTED_EMAIL] then [REDACTED_EMAIL]"
+        assert result.detection_count == 2
+
+    def test_many_matches_deduplicated(self, override_settings):
+        override_settings(PII_ACTION="log_only")
+        result = scan_for_pii(" ".join(f"user{i}@example.com 10.0.0.{i % 250}" for i in range(500)))
+        assert result.detections == ["EMAIL", "IP_ADDRESS"]
+        assert result.detection_count == 1000
+
+    def test_pii_inside_failed_cc_candidate(self, override_settings):
+        """Digits that look like a card but fail Luhn are still scanned for other types."""
+        override_settings(PII_ACTION="redact")
+        result = scan_for_pii("ref 5555 123-45-6789")
+        assert result.detections == ["SSN"]
+        assert result.redacted_content == "ref 5555 [REDACTED_SSN]"
+
+    @pytest.mark.parametrize("text, pii_type, redacted", [
+        ("Order 4111111111111112 123-45-6789", "SSN", "Order 4111111111111112 [REDACTED_SSN]"),
+        ("id 1234 5678 9012 3456 192.168.1.1", "IP_ADDRESS", "id 1234 5678 9012 3456 [REDACTED_IP]"),
+        ("ssn ١٢٣٤ ٥٦٧٨ ٩٠١٢ ١٢٣-٤٥-٦٧٨٩", "SSN", "ssn ١٢٣٤ ٥٦٧٨ ٩٠١٢ [REDACTED_SSN]"),
+    ])
+    def test_pii_straddling_failed_cc_candidate(self, override_settings, text, pii_type, redacted):
+        """PII that starts inside a Luhn-failing candidate and ends past it is still found."""
+        override_settings(PII_ACTION="redact")
+        result = scan_for_pii(text)
+        assert result.detections == [pii_type]
+        assert result.redacted_content == redacted
+
+    def test_pii_straddling_failed_cc_candidate_blocked(self, override_settings):
+        override_settings(PII_ACTION="block")
+        result = scan_for_pii("Order 4111111111111112 123-45-6789")
+        assert result.clean is False
+        assert result.detections == ["SSN"]
+
+
+class TestTriggerPrefilter:
+
+    def test_prose_without_digits_or_at_is_clean(self, override_settings):
+        override_settings(PII_ACTION="redact")
+        result = scan_for_pii("Hello, how are you today? Tell me about Paris.")
+        assert result.clean is True
+        assert result.redacted_content is None
+
+    def test_prose_never_reaches_regex_pass(self, override_settings):
+        override_settings(PII_ACTION="redact")
+        with patch("src.security.pii._detect") as detect, patch("src.security.pii._detect_cached") as cached:
+            scan_for_pii("No digits, no at-signs. Dots are fine... and so is punctuation!")
+        detect.assert_not_called()
+        cached.assert_not_called()
+
+    def test_non_ascii_digits_still_scanned(self, override_settings):
+        """\\d in the patterns matches any Unicode digit; the prefilter must too."""
+        override_settings(PII_ACTION="redact")
+        result = scan_for_pii("ssn ١٢٣-٤٥-٦٧٨٩")
+        assert result.detections == ["SSN"]
+
+
+class TestLinearTime:
+
+    @pytest.mark.parametrize("text", [
+        "a-" * 10_000 + "@", "x@" + "a-" * 10_000,
+        "(555) " * 10_000, "+1-555-" * 10_000, "555.555." * 10_000, "1." * 50_000,
+        "1234567890123 " * 10_000 + "123-45-6789",
+    ])
+    def test_adversarial_input_scans_quickly(self, override_settings, text):
+        """Phone/IP/email/card shapes repeated at length stay linear (no catastrophic backtracking)."""
+        override_settings(PII_ACTION="redact")
+        start = time.perf_counter()
+        scan_for_pii(text)
+        assert time.perf_counter() - start < 1.0
+
+    def test_email_after_long_prefix_still_redacted(self, override_settings):
+        override_settings(PII_ACTION="redact")
+        result = scan_for_pii("-" * 100 + " john.doe@example.com")
+        assert result.detections == ["EMAIL"]
+
+
+class TestAsciiBytesPath:
+
+    def test_bytes_patterns_match_str_patterns(self):
+        """On ASCII input the bytes-mode regexes find exactly the str-mode spans."""
+        from src.security.pii import (
+            _COMBINED_PII, _COMBINED_PII_ASCII, _NON_CC_PII, _NON_CC_PII_ASCII,
+        )
+
+        tokens = ["4111", "1111", "123", "45", "6789", "a@b.com", "x.y", "10.0.0.1",
+                  "(555)", "-", " ", "\t", "\x1c", "\x1f", ".", "+1", "word", "_"]
+        rng = random.Random(0)
+        for _ in range(2000):
+            text = "".join(rng.choice(tokens) for _ in range(rng.randint(1, 12)))
+            for str_re, bytes_re in ((_COMBINED_PII, _COMBINED_PII_ASCII), (_NON_CC_PII, _NON_CC_PII_ASCII)):
+                assert [(m.span(), m.lastgroup) for m in str_re.finditer(text)] == \
+                    [(m.span(), m.lastgroup) for m in bytes_re.finditer(text.encode())], text
+
+    def test_redacted_content_is_str(self, override_settings):
+        override_settings(PII_ACTION="redact")
+        result = scan_for_pii("card 4111-1111-1111-1111, ssn 123\x1c45\x1c6789")
+        assert result.redacted_content == "card [REDACTED_CC], ssn [REDACTED_SSN]"
+
+    def test_non_ascii_content_uses_str_path(self, override_settings):
+        override_settings(PII_ACTION="redact")
+        result = scan_for_pii("café a@b.com ssn ١٢٣-٤٥-٦٧٨٩")
+        assert result.redacted_content == "café [REDACTED_EMAIL] ssn [REDACTED_SSN]"
+
+
+class TestPrecompiled:
+
+    def test_scan_compiles_no_regex(self, override_settings, monkeypatch):
+        import re
+
+        override_settings()
+        monkeypatch.setattr(re, "compile", None)
+        monkeypatch.setattr(re, "_compile", None)
+        scan_for_pii("SSN 123-45-6789, card 4111 1111 1111 1111, uncached 3e1d")
+
+
+class TestScanCache:
+
+    def test_action_applied_per_call(self, override_settings):
+        """The action is applied per call, never cached; changing PII_ACTION takes effect."""
+        text = "cache probe a1b2 mail me at cache@example.com"
+        override_settings(PII_ACTION="redact")
+        assert scan_for_pii(text).redacted_content == "cache probe a1b2 mail me at [REDACTED_EMAIL]"
+        override_settings(PII_ACTION="log_only")
+        result = scan_for_pii(text)
+        assert result.clean is True
+        assert result.redacted_content is None
+        assert result.detections == ["EMAIL"]
+
+    def test_clean_result_served_from_cache(self, override_settings):
+        from src.security.pii import scan_cache_stats
+
+        override_settings(PII_ACTION="redact")
+        text = "version 1.2 released @ noon, cache probe 4d8e"
+        assert scan_for_pii(text).clean is True
+        hits = scan_cache_stats()["hits"]
+        assert scan_for_pii(text).clean is True
+        assert scan_cache_stats()["hits"] == hits + 1
+
+    def test_detections_not_cached(self, override_settings):
+        """Caching a detection would mean keeping the redacted prompt around."""
+        from src.security.pii import scan_cache_stats
+
+        override_settings(PII_ACTION="redact")
+        text = "no-cache probe 9b7f, ssn 123-45-6789"
+        scan_for_pii(text)
+        size = scan_cache_stats()["size"]
+        assert scan_for_pii(text).detections == ["SSN"]
+        assert scan_cache_stats()["size"] == size
@@ -1,22 +1,61 @@
 """Tests for src/providers/bedrock.py — Bedrock Converse API provider."""
 
+import asyncio
+import binascii
+import copy
 import json
-from unittest.mock import MagicMock, patch
+import struct
+import threading
+from unittest.mock import AsyncMock, MagicMock, patch
 
+import httpx
 import pytest
+from botocore.credentials import Credentials
 from fastapi import HTTPException
 
 from src.providers.bedrock import BedrockProvider
 
 
 @pytest.fixture
-def provider():
-    return BedrockProvider()
+async def provider():
+    """Fresh per test: __init__ only reads settings (boto3 is built lazily),
+    and tests swap transports/settings. Closed so its thread pool doesn't leak."""
+    p = BedrockProvider()
+    yield p
+    await p.close()
+
+
+def _returns(value):
+    """Stub for a blocking boto3 call whose calls the test doesn't inspect."""
+    return lambda **kwargs: value
+
+
+def _raises(exc):
+    def call(**kwargs):
+        raise exc
+    return call
 
 
 # --- Request translation tests (pure logic, no mocking) ---
 
 
+# Minimal request; providers never mutate the body, so tests share it
+_USER_X = {"messages": [{"role": "user", "content": "x"}]}
+
+_FULL_BODY = {
+    "messages": [
+        {"role": "system", "content": "Rule"},
+        {"role": "user", "content": [{"type": "text", "text": "Hi"}]},
+        {"role": "assistant", "content": "Hello!"},
+        {"role": "user", "content": "Go"},
+    ],
+    "temperature": 0.5,
+    "max_tokens": 100,
+    "top_p": 0.9,
+    "stop": ["END"],
+}
+
+
 class TestTranslateRequest:
 
     def test_system_and_user_messages(self):
@@ -47,7 +86,7 @@ class TestTranslateRequest:
 
     def test_inference_params(self):
         body = {
-            "messages": [{"role": "user", "content": "x"}],
+            **_USER_X,
             "temperature": 0.5,
             "max_tokens": 100,
             "top_p": 0.9,
@@ -60,16 +99,12 @@ class TestTranslateRequest:
         }
 
     def test_stop_sequences(self):
-        body = {
-            "messages": [{"role": "user", "content": "x"}],
-            "stop": ["END", "STOP"],
-        }
+        body = {**_USER_X, "stop": ["END", "STOP"]}
         result = BedrockProvider._translate_request(body, "model-id")
         assert result["inferenceConfig"]["stopSequences"] == ["END", "STOP"]
 
     def test_no_inference_config_when_empty(self):
-        body = {"messages": [{"role": "user", "content": "x"}]}
-        result = BedrockProvider._translate_request(body, "model-id")
+        result = BedrockProvider._translate_request(_USER_X, "model-id")
         assert "inferenceConfig" not in result
 
     def test_multiple_system_messages(self):
@@ -84,10 +119,73 @@ class TestTranslateRequest:
         assert len(result["system"]) == 2
         assert result["system"][0]["text"] == "Rule 1"
 
+    def test_does_not_mutate_body(self):
+        """The request body is reused after dispatch (response cache key, audit)."""
+        body = copy.deepcopy(_FULL_BODY)
+        BedrockProvider._translate_request(body, "model-id")
+        assert body == _FULL_BODY
+
 
 # --- Response translation tests ---
 
 
+class TestPromptCaching:
+
+    LONG = "x" * 5000
+
+    def test_no_cache_points_by_default(self):
+        body = {"messages": [
+            {"role": "system", "content": self.LONG},
+            {"role": "user", "content": self.LONG},
+        ]}
+        result = BedrockProvider._translate_request(body, "m")
+        assert result["system"] == [{"text": self.LONG}]
+        assert result["messages"][0]["content"] == [{"text": self.LONG}]
+
+    def test_auto_cache_long_prefixes(self):
+        body = {"messages": [
+            {"role": "system", "content": self.LONG},
+            {"role": "user", "content": self.LONG},
+            {"role": "assistant", "content": "ok"},
+            {"role": "user", "content": self.LONG},
+        ]}
+        result = BedrockProvider._translate_request(body, "m", auto_cache=True)
+        assert result["system"] == [{"text": self.LONG}, {"cachePoint": {"type": "default"}}]
+        assert result["messages"][0]["content"][-1] == {"cachePoint": {"type": "default"}}
+        # Only the first user message gets a breakpoint
+        assert result["messages"][2]["content"] == [{"text": self.LONG}]
+
+    def test_auto_cache_skips_short_prompts(self):
+        body = {"messages": [
+            {"role": "system", "content": "short"},
+            {"role": "user", "content": "hi"},
+        ]}
+        result = BedrockProvider._translate_request(body, "m", auto_cache=True)
+        assert result["system"] == [{"text": "short"}]
+        assert result["messages"][0]["content"] == [{"text": "hi"}]
+
+    def test_cache_control_parts_normalized(self):
+        body = {"messages": [
+            {"role": "system", "content": [
+                {"type": "text", "text": "rules", "cache_control": {"type": "ephemeral"}},
+            ]},
+            {"role": "user", "content": [
+                {"type": "text", "text": "a"},
+                {"type": "image_url", "image_url": {"url": "x"}},
+                {"type": "text", "text": "b"},
+            ], "cache_control": {"type": "ephemeral"}},
+        ]}
+        result = BedrockProvider._translate_request(body, "m")
+        assert result["system"] == [{"text": "rules"}, {"cachePoint": {"type": "default"}}]
+        assert result["messages"][0]["content"] == [
+            {"text": "a"}, {"text": "b"}, {"cachePoint": {"type": "default"}},
+        ]
+
+    def test_setting_enables_auto_cache(self, override_settings):
+        override_settings(BEDROCK_PROMPT_CACHING="true")
+        assert BedrockProvider()._prompt_caching is True
+
+
 class TestTranslateResponse:
 
     def test_basic_response(self):
@@ -126,6 +224,24 @@ class TestTranslateResponse:
         result = BedrockProvider._translate_response(response, "model-id")
         assert result["choices"][0]["message"]["content"] == "Part 1 Part 2"
 
+    @pytest.mark.parametrize("stop_reason, expected", [
+        ("end_turn", "stop"),
+        ("stop_sequence", "stop"),
+        ("guardrail_intervened", "content_filter"),
+        ("tool_use", "stop"),
+        (None, "stop"),
+    ])
+    def test_finish_reason_mapping(self, stop_reason, expected):
+        response = {"output": {"message": {"content": []}}, "usage": {}}
+        if stop_reason:
+            response["stopReason"] = stop_reason
+        result = BedrockProvider._translate_response(response, "model-id")
+        assert result["choices"][0]["finish_reason"] == expected
+
+    def test_id_matches_created(self):
+        result = BedrockProvider._translate_response({"usage": {}}, "model-id")
+        assert result["id"] == f"bedrock-{result['created']}"
+
 
 # --- chat_completion tests (mock _call_converse) ---
 
@@ -138,7 +254,7 @@ class TestChatCompletion:
             "stopReason": "end_turn",
             "usage": {"inputTokens": 8, "outputTokens": 3},
         }
-        provider._call_converse = MagicMock(return_value=converse_response)
+        provider._call_converse = _returns(converse_response)
 
         result = await provider.chat_completion(
             body={"messages": [{"role": "user", "content": "Hello"}]},
@@ -154,52 +270,65 @@ class TestChatCompletion:
         assert exc_info.value.status_code == 400
         assert "bedrock_model_id" in exc_info.value.detail
 
-    async def test_throttling_raises_429(self, provider):
-        exc = Exception("Rate exceeded")
-        exc.response = {"Error": {"Code": "ThrottlingException"}}
-        provider._call_converse = MagicMock(side_effect=exc)
+    @pytest.mark.parametrize("code, status", [
+        ("ThrottlingException", 429),
+        ("ValidationException", 400),
+        ("AccessDeniedException", 403),
+        (None, 502),
+    ])
+    async def test_error_code_mapping(self, provider, code, status):
+        exc = Exception("boom")
+        if code:
+            exc.response = {"Error": {"Code": code}}
+        provider._call_converse = _raises(exc)
 
         with pytest.raises(HTTPException) as exc_info:
             await provider.chat_completion(
-                body={"messages": [{"role": "user", "content": "x"}]},
+                body=_USER_X,
                 api_key="", model_id="model-id",
             )
-        assert exc_info.value.status_code == 429
+        assert exc_info.value.status_code == status
 
-    async def test_validation_raises_400(self, provider):
-        exc = Exception("Invalid input")
-        exc.response = {"Error": {"Code": "ValidationException"}}
-        provider._call_converse = MagicMock(side_effect=exc)
 
-        with pytest.raises(HTTPException) as exc_info:
-            await provider.chat_completion(
-                body={"messages": [{"role": "user", "content": "x"}]},
-                api_key="", model_id="model-id",
-            )
-        assert exc_info.value.status_code == 400
-
-    async def test_access_denied_raises_403(self, provider):
-        exc = Exception("Not authorized")
-        exc.response = {"Error": {"Code": "AccessDeniedException"}}
-        provider._call_converse = MagicMock(side_effect=exc)
+class TestBoto3ThreadPool:
 
-        with pytest.raises(HTTPException) as exc_info:
-            await provider.chat_completion(
-                body={"messages": [{"role": "user", "content": "x"}]},
-                api_key="", model_id="model-id",
-            )
-        assert exc_info.value.status_code == 403
+    async def test_calls_run_on_bedrock_pool(self, provider):
+        seen = {}
 
-    async def test_generic_error_raises_502(self, provider):
-        exc = Exception("Something broke")
-        provider._call_converse = MagicMock(side_effect=exc)
+        def converse(**kwargs):
+            seen["thread"] = threading.current_thread().name
+            return {"output": {"message": {"content": [{"text": "ok"}]}}, "usage": {}}
 
-        with pytest.raises(HTTPException) as exc_info:
-            await provider.chat_completion(
-                body={"messages": [{"role": "user", "content": "x"}]},
-                api_key="", model_id="model-id",
-            )
-        assert exc_info.value.status_code == 502
+        provider._call_converse = converse
+        await provider.chat_completion(
+            body=_USER_X, api_key="", model_id="m",
+        )
+        assert seen["thread"].startswith("bedrock")
+        assert provider._executor._max_workers == 64
+
+    async def test_pool_size_from_settings(self, override_settings):
+        override_settings(BEDROCK_MAX_WORKERS="8")
+        p = BedrockProvider()
+        with patch("boto3.client") as mock_client:
+            p._get_client()
+        assert mock_client.call_args.kwargs["config"].max_pool_connections == 8
+        await p._run_blocking(lambda: None)
+        assert p._executor._max_workers == 8
+        await p.close()
+
+    def test_construction_builds_no_client(self):
+        with patch("boto3.client") as mock_client:
+            p = BedrockProvider()
+        mock_client.assert_not_called()
+        assert p._client is None
+        assert p._executor is None
+
+    async def test_close_shuts_down_pool(self, provider):
+        await provider._run_blocking(lambda: None)
+        executor = provider._executor
+        await provider.close()
+        assert provider._executor is None
+        assert executor._shutdown
 
 
 # --- Streaming tests ---
@@ -214,17 +343,13 @@ class TestBedrockStreaming:
             {"contentBlockDelta": {"delta": {"text": " world"}}},
             {"messageStop": {"stopReason": "end_turn"}},
         ]
-        provider._call_converse_stream = MagicMock(
-            return_value={"stream": stream_events}
-        )
+        provider._call_converse_stream = _returns({"stream": stream_events})
 
-        chunks = []
-        async for chunk in provider.chat_completion_stream(
+        chunks = [c async for c in provider.chat_completion_stream(
             body={"messages": [{"role": "user", "content": "hi"}]},
             api_key="",
             model_id="anthropic.claude-3-sonnet",
-        ):
-            chunks.append(chunk)
+        )]
 
         # 2 content + 1 finish_reason + 1 [DONE]
         assert len(chunks) == 4
@@ -239,23 +364,40 @@ class TestBedrockStreaming:
         assert parsed["object"] == "chat.completion.chunk"
         assert parsed["choices"][0]["delta"]["content"] == "Hello"
 
+    async def test_stream_delta_escaping(self, provider):
+        """Delta chunks are pre-serialized bytes with the text JSON-escaped."""
+        text = 'say "hi"\n\u00e9'
+        provider._call_converse_stream = _returns({"stream": [
+            {"contentBlockDelta": {"delta": {"text": text}}},
+            {"messageStop": {"stopReason": "end_turn"}},
+        ]})
+
+        chunks = [c async for c in provider.chat_completion_stream(
+            body=_USER_X,
+            api_key="", model_id="m",
+        )]
+
+        assert isinstance(chunks[0].data, bytes)
+        assert json.loads(chunks[0].data) == {
+            "id": json.loads(chunks[1].data)["id"],
+            "object": "chat.completion.chunk",
+            "model": "m",
+            "choices": [{"index": 0, "delta": {"content": text}, "finish_reason": None}],
+        }
+
     async def test_stream_max_tokens_finish_reason(self, provider):
         """max_tokens stop reason maps to 'length' finish_reason."""
         stream_events = [
             {"contentBlockDelta": {"delta": {"text": "trunca"}}},
             {"messageStop": {"stopReason": "max_tokens"}},
         ]
-        provider._call_converse_stream = MagicMock(
-            return_value={"stream": stream_events}
-        )
+        provider._call_converse_stream = _returns({"stream": stream_events})
 
-        chunks = []
-        async for chunk in provider.chat_completion_stream(
-            body={"messages": [{"role": "user", "content": "x"}]},
+        chunks = [c async for c in provider.chat_completion_stream(
+            body=_USER_X,
             api_key="",
             model_id="model-id",
-        ):
-            chunks.append(chunk)
+        )]
 
         # finish_reason chunk (second-to-last before [DONE])
         finish_chunk = json.loads(chunks[-2].data)
@@ -269,16 +411,263 @@ class TestBedrockStreaming:
                 pass
         assert exc_info.value.status_code == 400
 
-    async def test_stream_throttling_error(self, provider):
-        exc = Exception("Rate exceeded")
-        exc.response = {"Error": {"Code": "ThrottlingException"}}
-        provider._call_converse_stream = MagicMock(side_effect=exc)
+    @pytest.mark.parametrize("code, status", [
+        ("ThrottlingException", 429),
+        ("ValidationException", 400),
+        ("AccessDeniedException", 403),
+        (None, 502),
+    ])
+    async def test_stream_error_code_mapping(self, provider, code, status):
+        exc = Exception("boom")
+        if code:
+            exc.response = {"Error": {"Code": code}}
+        provider._call_converse_stream = _raises(exc)
 
         with pytest.raises(HTTPException) as exc_info:
             async for _ in provider.chat_completion_stream(
-                body={"messages": [{"role": "user", "content": "x"}]},
+                body=_USER_X,
                 api_key="",
                 model_id="model-id",
             ):
                 pass
+        assert exc_info.value.status_code == status
+
+
+# --- aioboto3 transport tests ---
+
+
+class _FakeAsyncBedrockClient:
+    """Stand-in for an aioboto3 bedrock-runtime client context."""
+
+    def __init__(self, converse_response=None, stream_events=None, error=None):
+        self._converse_response = converse_response
+        self._stream_events = stream_events or []
+        self._error = error
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    async def converse(self, **kwargs):
+        if self._error:
+            raise self._error
+        return self._converse_response
+
+    async def converse_stream(self, **kwargs):
+        if self._error:
+            raise self._error
+
+        async def events():
+            for event in self._stream_events:
+                yield event
+
+        return {"stream": events()}
+
+
+@pytest.fixture
+def async_provider():
+    p = BedrockProvider()
+    p._transport = "aioboto3"
+    p._session = MagicMock()
+    return p
+
+
+class TestAioboto3Transport:
+
+    def test_transport_from_settings(self, override_settings):
+        override_settings(BEDROCK_TRANSPORT="aioboto3")
+        assert BedrockProvider()._transport == "aioboto3"
+
+    async def test_chat_completion(self, async_provider):
+        async_provider._session.client.return_value = _FakeAsyncBedrockClient(converse_response={
+            "output": {"message": {"content": [{"text": "async hi"}]}},
+            "stopReason": "end_turn",
+            "usage": {"inputTokens": 1, "outputTokens": 2},
+        })
+
+        result = await async_provider.chat_completion(
+            body=_USER_X,
+            api_key="", model_id="model-id",
+        )
+        assert result.body["choices"][0]["message"]["content"] == "async hi"
+
+    async def test_stream(self, async_provider):
+        async_provider._session.client.return_value = _FakeAsyncBedrockClient(stream_events=[
+            {"contentBlockDelta": {"delta": {"text": "Hi"}}},
+            {"messageStop": {"stopReason": "end_turn"}},
+        ])
+
+        chunks = [c async for c in async_provider.chat_completion_stream(
+            body=_USER_X,
+            api_key="", model_id="model-id",
+        )]
+        assert chunks[0].text_delta == "Hi"
+        assert chunks[-1].is_done
+
+    async def test_client_reused_across_requests(self, async_provider):
+        fake = _FakeAsyncBedrockClient(converse_response={
+            "output": {"message": {"content": [{"text": "ok"}]}},
+            "stopReason": "end_turn",
+            "usage": {},
+        })
+        async_provider._session.client.return_value = fake
+
+        await asyncio.gather(*(
+            async_provider.chat_completion(body=_USER_X, api_key="", model_id="model-id")
+            for _ in range(3)
+        ))
+        assert async_provider._session.client.call_count == 1
+
+    async def test_close_exits_client(self, async_provider):
+        fake = _FakeAsyncBedrockClient()
+        fake.__aexit__ = AsyncMock(return_value=False)
+        async_provider._session.client.return_value = fake
+
+        await async_provider._get_async_client()
+        await async_provider.close()
+
+        fake.__aexit__.assert_awaited_once()
+        assert async_provider._async_client is None
+
+    async def test_error_mapping(self, async_provider):
+        exc = Exception("Rate exceeded")
+        exc.response = {"Error": {"Code": "ThrottlingException"}}
+        async_provider._session.client.return_value = _FakeAsyncBedrockClient(error=exc)
+
+        with pytest.raises(HTTPException) as exc_info:
+            await async_provider.chat_completion(
+                body=_USER_X,
+                api_key="", model_id="model-id",
+            )
+        assert exc_info.value.status_code == 429
+
+
+# --- httpx (SigV4) transport tests ---
+
+
+def _event_frame(headers: dict, payload: dict) -> bytes:
+    """Encode one AWS event-stream message (string headers only)."""
+    raw_headers = b""
+    for name, value in headers.items():
+        n, v = name.encode(), value.encode()
+        raw_headers += bytes([len(n)]) + n + b"\x07" + struct.pack(">H", len(v)) + v
+    body = json.dumps(payload).encode()
+    total = 12 + len(raw_headers) + len(body) + 4
+    prelude = struct.pack(">II", total, len(raw_headers))
+    prelude += struct.pack(">I", binascii.crc32(prelude))
+    message = prelude + raw_headers + body
+    return message + struct.pack(">I", binascii.crc32(message))
+
+
+def _event(event_type: str, payload: dict) -> bytes:
+    return _event_frame(
+        {":message-type": "event", ":event-type": event_type, ":content-type": "application/json"},
+        payload,
+    )
+
+
+def _http_provider(handler) -> BedrockProvider:
+    p = BedrockProvider()
+    p._transport = "httpx"
+    p._credentials = Credentials("AKIDEXAMPLE", "secret")
+    p._http = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return p
+
+
+class TestHttpxTransport:
+
+    async def test_chat_completion_signed_request(self):
+        seen = {}
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            seen["request"] = request
+            return httpx.Response(200, json={
+                "output": {"message": {"content": [{"text": "signed hi"}]}},
+                "stopReason": "end_turn",
+                "usage": {"inputTokens": 1, "outputTokens": 2},
+            })
+
+        p = _http_provider(handler)
+        result = await p.chat_completion(
+            body={**_USER_X, "max_tokens": 5},
+            api_key="", model_id="anthropic.claude-3:0",
+        )
+
+        request = seen["request"]
+        assert result.body["choices"][0]["message"]["content"] == "signed hi"
+        assert request.url.raw_path.endswith(b"/model/anthropic.claude-3%3A0/converse")
+        assert request.headers["authorization"].startswith("AWS4-HMAC-SHA256 Credential=AKIDEXAMPLE/")
+        assert "x-amz-date" in request.headers
+        sent = json.loads(request.content)
+        assert "modelId" not in sent
+        assert sent["inferenceConfig"] == {"maxTokens": 5}
+
+    async def test_error_mapping(self):
+        def handler(request):
+            return httpx.Response(
+                429, json={"message": "Too many requests"},
+                headers={"x-amzn-ErrorType": "ThrottlingException:http://internal.amazon.com/"},
+            )
+
+        p = _http_provider(handler)
+        with pytest.raises(HTTPException) as exc_info:
+            await p.chat_completion(
+                body=_USER_X,
+                api_key="", model_id="model-id",
+            )
         assert exc_info.value.status_code == 429
+
+    async def test_stream_decodes_event_stream(self):
+        frames = (
+            _event("messageStart", {"role": "assistant"})
+            + _event("contentBlockDelta", {"delta": {"text": "Hel"}, "contentBlockIndex": 0})
+            + _event("contentBlockDelta", {"delta": {"text": "lo"}, "contentBlockIndex": 0})
+            + _event("messageStop", {"stopReason": "max_tokens"})
+        )
+
+        async def body():
+            # Split mid-frame to exercise buffering across reads
+            for i in range(0, len(frames), 7):
+                yield frames[i:i + 7]
+
+        def handler(request):
+            assert request.url.path.endswith("/converse-stream")
+            return httpx.Response(200, content=body())
+
+        p = _http_provider(handler)
+        chunks = [c async for c in p.chat_completion_stream(
+            body=_USER_X,
+            api_key="", model_id="model-id",
+        )]
+
+        assert [c.text_delta for c in chunks[:2]] == ["Hel", "lo"]
+        assert json.loads(chunks[2].data)["choices"][0]["finish_reason"] == "length"
+        assert chunks[-1].is_done
+
+    async def test_stream_exception_event(self):
+        frame = _event_frame(
+            {":message-type": "exception", ":exception-type": "ValidationException"},
+            {"message": "bad input"},
+        )
+
+        def handler(request):
+            return httpx.Response(200, content=frame)
+
+        p = _http_provider(handler)
+        with pytest.raises(HTTPException) as exc_info:
+            async for _ in p.chat_completion_stream(
+                body=_USER_X,
+                api_key="", model_id="model-id",
+            ):
+                pass
+        assert exc_info.value.status_code == 400
+
+    async def test_close_releases_shared_client(self):
+        p = _http_provider(lambda request: httpx.Response(200, json={}))
+        http = p._http
+        await p.close()
+        assert not http.is_closed
+        assert p._http is None
+        await http.aclose()
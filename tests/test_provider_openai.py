@@ -1,13 +1,20 @@
 """Tests for src/providers/openai.py — OpenAI provider."""
 
 import json
-from unittest.mock import AsyncMock, MagicMock, patch
+from unittest.mock import AsyncMock, MagicMock
 
 import pytest
 import httpx
 from fastapi import HTTPException
 
-from src.providers.openai import OpenAIProvider
+from src.providers.base import ProviderResponse
+from src.providers.openai import OpenAIProvider, _parse_sse_line
+
+
+@pytest.fixture(autouse=True)
+def upstream_base_url(override_settings):
+    """Pin the upstream so a developer's UPSTREAM_BASE_URL can't leak in."""
+    override_settings(UPSTREAM_BASE_URL="https://api.openai.com")
 
 
 @pytest.fixture
@@ -15,21 +22,48 @@ def provider():
     return OpenAIProvider()
 
 
-class TestOpenAIProvider:
+@pytest.fixture
+def mock_client(provider):
+    """Upstream httpx client double, installed on the provider."""
+    client = AsyncMock()
+    client.is_closed = False
+    client.stream = MagicMock()  # sync call returning an async context manager
+    provider._client = client
+    return client
 
-    async def test_chat_completion_success(self, provider, override_settings):
-        override_settings(
-            UPSTREAM_BASE_URL="https://api.openai.com",
-            UPSTREAM_API_KEY="sk-global",
-        )
-        mock_response = MagicMock()
-        mock_response.status_code = 200
-        mock_response.json.return_value = {"choices": [{"message": {"content": "Hi"}}]}
 
-        mock_client = AsyncMock()
-        mock_client.post.return_value = mock_response
-        mock_client.is_closed = False
-        provider._client = mock_client
+@pytest.fixture
+def upstream(provider):
+    """Install a real httpx client on the provider, served by `handler(request)`.
+
+    Returns the list of requests the handler has seen.
+    """
+    def install(handler) -> list[httpx.Request]:
+        seen = []
+
+        def record(request):
+            seen.append(request)
+            return handler(request)
+
+        provider._client = httpx.AsyncClient(transport=httpx.MockTransport(record))
+        return seen
+    return install
+
+
+_OK_CONTENT = b'{"choices": [{"message": {"content": "Hi"}}]}'
+
+
+def _raise(exc):
+    def handler(request):
+        raise exc
+    return handler
+
+
+class TestOpenAIProvider:
+
+    async def test_chat_completion_success(self, provider, upstream, override_settings):
+        override_settings(UPSTREAM_API_KEY="sk-global")
+        seen = upstream(lambda request: httpx.Response(200, content=_OK_CONTENT))
 
         result = await provider.chat_completion(
             body={"model": "gpt-4o", "messages": []},
@@ -37,73 +71,117 @@ class TestOpenAIProvider:
             model_id="",
         )
         assert result.status_code == 200
+        assert result.raw == _OK_CONTENT
         assert result.body["choices"][0]["message"]["content"] == "Hi"
 
         # Per-client key should be used (not global)
-        call_kwargs = mock_client.post.call_args
-        assert "Bearer sk-per-client" in call_kwargs.kwargs["headers"]["Authorization"]
+        (request,) = seen
+        assert str(request.url) == "https://api.openai.com/v1/chat/completions"
+        assert request.headers["Authorization"] == "Bearer sk-per-client"
+        assert json.loads(request.content) == {"model": "gpt-4o", "messages": []}
 
-    async def test_fallback_to_global_key(self, provider, override_settings):
-        override_settings(
-            UPSTREAM_BASE_URL="https://api.openai.com",
-            UPSTREAM_API_KEY="sk-global-key",
-        )
-        mock_response = MagicMock()
-        mock_response.status_code = 200
-        mock_response.json.return_value = {}
-
-        mock_client = AsyncMock()
-        mock_client.post.return_value = mock_response
-        mock_client.is_closed = False
-        provider._client = mock_client
+    async def test_fallback_to_global_key(self, provider, upstream, override_settings):
+        override_settings(UPSTREAM_API_KEY="sk-global-key")
+        seen = upstream(lambda request: httpx.Response(200, content=b"{}"))
 
         await provider.chat_completion(body={}, api_key="", model_id="")
-        call_kwargs = mock_client.post.call_args
-        assert "Bearer sk-global-key" in call_kwargs.kwargs["headers"]["Authorization"]
+        assert seen[0].headers["Authorization"] == "Bearer sk-global-key"
 
-    async def test_connect_error_raises_502(self, provider, override_settings):
-        override_settings(UPSTREAM_BASE_URL="https://api.openai.com")
-        mock_client = AsyncMock()
-        mock_client.post.side_effect = httpx.ConnectError("Connection refused")
-        mock_client.is_closed = False
-        provider._client = mock_client
+    async def test_upstream_error_status_passed_through(self, provider, upstream):
+        upstream(lambda request: httpx.Response(429, content=b'{"error": "slow down"}'))
 
-        with pytest.raises(HTTPException) as exc_info:
-            await provider.chat_completion(body={}, api_key="k", model_id="")
-        assert exc_info.value.status_code == 502
+        result = await provider.chat_completion(body={}, api_key="k", model_id="")
+        assert result.status_code == 429
+        assert result.raw == b'{"error": "slow down"}'
 
-    async def test_timeout_raises_504(self, provider, override_settings):
-        override_settings(UPSTREAM_BASE_URL="https://api.openai.com")
-        mock_client = AsyncMock()
-        mock_client.post.side_effect = httpx.ReadTimeout("Timed out")
-        mock_client.is_closed = False
-        provider._client = mock_client
+    async def test_upstream_content_type_captured(self, provider, upstream):
+        upstream(lambda request: httpx.Response(
+            502, content=b"<html>Bad Gateway</html>", headers={"content-type": "text/html"},
+        ))
+
+        result = await provider.chat_completion(body={}, api_key="k", model_id="")
+        assert result.content_type == "text/html"
+
+    @pytest.mark.parametrize("exc, status", [
+        (httpx.ConnectError("Connection refused"), 502),
+        (httpx.ReadTimeout("Timed out"), 504),
+        (httpx.RemoteProtocolError("Server disconnected"), 502),
+    ])
+    async def test_transport_error_mapping(self, provider, upstream, exc, status):
+        upstream(_raise(exc))
 
         with pytest.raises(HTTPException) as exc_info:
             await provider.chat_completion(body={}, api_key="k", model_id="")
-        assert exc_info.value.status_code == 504
-
-    async def test_close(self, provider):
-        mock_client = AsyncMock()
-        mock_client.is_closed = False
-        provider._client = mock_client
+        assert exc_info.value.status_code == status
 
+    async def test_close(self, provider, mock_client):
         await provider.close()
-        mock_client.aclose.assert_called_once()
+        # Shared pool: closed by close_all_providers, not per provider
+        mock_client.aclose.assert_not_called()
         assert provider._client is None
 
+    async def test_uses_shared_http_client(self, provider):
+        other = OpenAIProvider()
+        assert await provider._get_client() is await other._get_client()
+
     async def test_close_when_no_client(self, provider):
         """Closing without a client should not raise."""
         await provider.close()
 
 
+class TestUpstreamSettingsCapture:
+
+    def test_url_built_once(self, provider, override_settings):
+        override_settings(UPSTREAM_BASE_URL="https://example.test/")
+        assert provider._upstream_url() == "https://example.test/v1/chat/completions"
+        assert provider._upstream_url() is provider._upstream_url()
+
+    def test_default_headers_shared(self, provider, override_settings):
+        override_settings(UPSTREAM_API_KEY="sk-global")
+        headers = provider._build_headers("")
+        assert headers["Authorization"] == "Bearer sk-global"
+        assert provider._build_headers("") is headers
+
+    def test_client_key_headers_not_shared(self, provider, override_settings):
+        override_settings(UPSTREAM_API_KEY="sk-global")
+        assert provider._build_headers("sk-a")["Authorization"] == "Bearer sk-a"
+        assert provider._build_headers("")["Authorization"] == "Bearer sk-global"
+
+
+class TestProviderResponse:
+
+    def test_body_parsed_lazily_once(self):
+        response = ProviderResponse(status_code=200, raw=b'{"a": 1}')
+        assert response._body is None
+        assert response.body == {"a": 1}
+        assert response.body is response.body
+
+    def test_body_without_raw(self):
+        response = ProviderResponse(status_code=200, body={"a": 1})
+        assert response.raw is None
+        assert response.body == {"a": 1}
+
+
+class TestParseSSELine:
+
+    @pytest.mark.parametrize("line", [b"", b"\r", b": keep-alive", b"event: ping", b"id: 7"])
+    def test_non_data_lines_skipped(self, line):
+        assert _parse_sse_line(line) is None
+
+    @pytest.mark.parametrize("line", [b"data: [DONE]", b"data:[DONE]\r"])
+    def test_done(self, line):
+        assert _parse_sse_line(line).is_done
+
+    def test_payload_trimmed_without_decoding(self):
+        chunk = _parse_sse_line(b'data:  {"choices":[{"delta":{"role":"assistant"}}]}\r')
+        assert chunk.data == b'{"choices":[{"delta":{"role":"assistant"}}]}'
+        assert chunk.text_delta == ""
+
+
 class TestOpenAIStreaming:
 
-    async def test_stream_yields_chunks(self, provider, override_settings):
-        override_settings(
-            UPSTREAM_BASE_URL="https://api.openai.com",
-            UPSTREAM_API_KEY="sk-test",
-        )
+    async def test_stream_yields_chunks(self, provider, mock_client, override_settings):
+        override_settings(UPSTREAM_API_KEY="sk-test")
         # Simulate SSE lines from upstream
         sse_lines = [
             'data: {"id":"x","object":"chat.completion.chunk","choices":[{"index":0,"delta":{"content":"Hello"},"finish_reason":null}]}',
@@ -116,35 +194,29 @@ class TestOpenAIStreaming:
 
         mock_response = AsyncMock()
         mock_response.status_code = 200
-        mock_response.aiter_lines = MagicMock(return_value=_async_iter(sse_lines))
+        mock_response.aiter_bytes = MagicMock(return_value=_async_iter(_sse_bytes(sse_lines)))
         mock_response.__aenter__ = AsyncMock(return_value=mock_response)
         mock_response.__aexit__ = AsyncMock(return_value=False)
 
-        mock_client = AsyncMock()
-        mock_client.stream = MagicMock(return_value=mock_response)
-        mock_client.is_closed = False
-        provider._client = mock_client
+        mock_client.stream.return_value = mock_response
 
-        chunks = []
-        async for chunk in provider.chat_completion_stream(
+        chunks = [c async for c in provider.chat_completion_stream(
             body={"model": "gpt-4o", "messages": []},
             api_key="sk-test",
             model_id="",
-        ):
-            chunks.append(chunk)
+        )]
 
         assert len(chunks) == 3  # 2 content + 1 DONE
         assert chunks[0].text_delta == "Hello"
         assert chunks[1].text_delta == " world"
         assert chunks[2].is_done
         assert chunks[2].data == "[DONE]"
+        # Payloads pass through as the upstream bytes
+        assert chunks[0].data == sse_lines[0][len("data: "):].encode()
 
-    async def test_stream_extracts_empty_delta(self, provider, override_settings):
+    async def test_stream_extracts_empty_delta(self, provider, mock_client, override_settings):
         """Chunks without content delta should yield empty text_delta."""
-        override_settings(
-            UPSTREAM_BASE_URL="https://api.openai.com",
-            UPSTREAM_API_KEY="sk-test",
-        )
+        override_settings(UPSTREAM_API_KEY="sk-test")
         sse_lines = [
             'data: {"id":"x","object":"chat.completion.chunk","choices":[{"index":0,"delta":{"role":"assistant"},"finish_reason":null}]}',
             "",
@@ -154,54 +226,61 @@ class TestOpenAIStreaming:
 
         mock_response = AsyncMock()
         mock_response.status_code = 200
-        mock_response.aiter_lines = MagicMock(return_value=_async_iter(sse_lines))
+        mock_response.aiter_bytes = MagicMock(return_value=_async_iter(_sse_bytes(sse_lines)))
         mock_response.__aenter__ = AsyncMock(return_value=mock_response)
         mock_response.__aexit__ = AsyncMock(return_value=False)
 
-        mock_client = AsyncMock()
-        mock_client.stream = MagicMock(return_value=mock_response)
-        mock_client.is_closed = False
-        provider._client = mock_client
+        mock_client.stream.return_value = mock_response
 
-        chunks = []
-        async for chunk in provider.chat_completion_stream(
+        chunks = [c async for c in provider.chat_completion_stream(
             body={"model": "gpt-4o", "messages": []},
             api_key="sk-test",
             model_id="",
-        ):
-            chunks.append(chunk)
+        )]
 
         assert chunks[0].text_delta == ""
         assert chunks[1].is_done
 
-    async def test_stream_connect_error(self, provider, override_settings):
-        override_settings(UPSTREAM_BASE_URL="https://api.openai.com")
-        mock_client = AsyncMock()
-        mock_client.stream = MagicMock(side_effect=httpx.ConnectError("Connection refused"))
-        mock_client.is_closed = False
-        provider._client = mock_client
+    async def test_stream_handles_crlf_and_unterminated_tail(self, provider, mock_client):
+        raw = (
+            b': keep-alive\r\n\r\n'
+            b'data:{"choices":[{"delta":{"content":"caf\xc3\xa9"}}]}\r\n\r\n'
+            b'data: [DONE]'
+        )
+
+        mock_response = AsyncMock()
+        mock_response.status_code = 200
+        mock_response.aiter_bytes = MagicMock(return_value=_async_iter([raw[:40], raw[40:]]))
+        mock_response.__aenter__ = AsyncMock(return_value=mock_response)
+        mock_response.__aexit__ = AsyncMock(return_value=False)
+
+        mock_client.stream.return_value = mock_response
+
+        chunks = [c async for c in provider.chat_completion_stream(
+            body={"model": "gpt-4o", "messages": []}, api_key="k", model_id="",
+        )]
+
+        assert [c.text_delta for c in chunks] == ["café", ""]
+        assert chunks[-1].is_done
+
+    async def test_stream_connect_error(self, provider, mock_client):
+        mock_client.stream.side_effect = httpx.ConnectError("Connection refused")
 
         with pytest.raises(HTTPException) as exc_info:
             async for _ in provider.chat_completion_stream(body={}, api_key="k", model_id=""):
                 pass
         assert exc_info.value.status_code == 502
 
-    async def test_stream_upstream_error_status(self, provider, override_settings):
+    async def test_stream_upstream_error_status(self, provider, mock_client, override_settings):
         """Non-200 upstream status during stream should raise HTTPException."""
-        override_settings(
-            UPSTREAM_BASE_URL="https://api.openai.com",
-            UPSTREAM_API_KEY="sk-test",
-        )
+        override_settings(UPSTREAM_API_KEY="sk-test")
         mock_response = AsyncMock()
         mock_response.status_code = 401
         mock_response.aread = AsyncMock(return_value=b'{"error": "invalid key"}')
         mock_response.__aenter__ = AsyncMock(return_value=mock_response)
         mock_response.__aexit__ = AsyncMock(return_value=False)
 
-        mock_client = AsyncMock()
-        mock_client.stream = MagicMock(return_value=mock_response)
-        mock_client.is_closed = False
-        provider._client = mock_client
+        mock_client.stream.return_value = mock_response
 
         with pytest.raises(HTTPException) as exc_info:
             async for _ in provider.chat_completion_stream(
@@ -212,24 +291,18 @@ class TestOpenAIStreaming:
                 pass
         assert exc_info.value.status_code == 401
 
-    async def test_stream_sets_stream_true_in_body(self, provider, override_settings):
+    async def test_stream_sets_stream_true_in_body(self, provider, mock_client, override_settings):
         """The forwarded body should have stream: true set."""
-        override_settings(
-            UPSTREAM_BASE_URL="https://api.openai.com",
-            UPSTREAM_API_KEY="sk-test",
-        )
+        override_settings(UPSTREAM_API_KEY="sk-test")
         sse_lines = ["data: [DONE]", ""]
 
         mock_response = AsyncMock()
         mock_response.status_code = 200
-        mock_response.aiter_lines = MagicMock(return_value=_async_iter(sse_lines))
+        mock_response.aiter_bytes = MagicMock(return_value=_async_iter(_sse_bytes(sse_lines)))
         mock_response.__aenter__ = AsyncMock(return_value=mock_response)
         mock_response.__aexit__ = AsyncMock(return_value=False)
 
-        mock_client = AsyncMock()
-        mock_client.stream = MagicMock(return_value=mock_response)
-        mock_client.is_closed = False
-        provider._client = mock_client
+        mock_client.stream.return_value = mock_response
 
         async for _ in provider.chat_completion_stream(
             body={"model": "gpt-4o", "messages": []},
@@ -239,11 +312,65 @@ class TestOpenAIStreaming:
             pass
 
         call_kwargs = mock_client.stream.call_args
-        sent_body = call_kwargs.kwargs.get("json", {})
+        sent_body = json.loads(call_kwargs.kwargs["content"])
         assert sent_body.get("stream") is True
 
 
+class _TrackedStream(httpx.AsyncByteStream):
+    """Upstream response body that records whether httpx closed it."""
+
+    def __init__(self, chunks: list[bytes]):
+        self.chunks = chunks
+        self.closed = False
+
+    async def __aiter__(self):
+        for chunk in self.chunks:
+            yield chunk
+
+    async def aclose(self) -> None:
+        self.closed = True
+
+
+class TestStreamReleasesConnection:
+    """Every exit from chat_completion_stream hands the connection back to the pool."""
+
+    @pytest.fixture
+    def serve_stream(self, upstream):
+        def install(status: int, chunks: list[bytes]) -> _TrackedStream:
+            stream = _TrackedStream(chunks)
+            upstream(lambda request: httpx.Response(status, stream=stream))
+            return stream
+        return install
+
+    async def test_closed_on_error_status(self, provider, serve_stream):
+        stream = serve_stream(401, [b'{"error": "invalid key"}'])
+        with pytest.raises(HTTPException):
+            async for _ in provider.chat_completion_stream(body={}, api_key="k", model_id=""):
+                pass
+        assert stream.closed
+
+    async def test_closed_on_done_before_body_ends(self, provider, serve_stream):
+        stream = serve_stream(200, _sse_bytes(["data: [DONE]", "", ": trailing", ""]))
+        chunks = [c async for c in provider.chat_completion_stream(body={}, api_key="k", model_id="")]
+        assert chunks[-1].is_done
+        assert stream.closed
+
+    async def test_closed_when_consumer_stops_early(self, provider, serve_stream):
+        line = 'data: {"choices":[{"delta":{"content":"x"}}]}'
+        stream = serve_stream(200, _sse_bytes([line, "", line, "", "data: [DONE]", ""]))
+        gen = provider.chat_completion_stream(body={}, api_key="k", model_id="")
+        await anext(gen)
+        await gen.aclose()  # what StreamingResponse does when the client disconnects
+        assert stream.closed
+
+
 async def _async_iter(items):
     """Helper to make a sync list into an async iterator."""
     for item in items:
         yield item
+
+
+def _sse_bytes(lines: list[str], size: int = 16) -> list[bytes]:
+    """Encode SSE lines as an upstream byte stream, cut at arbitrary boundaries."""
+    raw = "\n".join(lines).encode()
+    return [raw[i:i + size] for i in range(0, len(raw), size)]
@@ -1,8 +1,16 @@
 """Tests for src/providers/registry.py — provider singleton registry."""
 
+import inspect
+import threading
+import time
+from pathlib import Path
+from unittest.mock import patch
+
 import pytest
 
+import src.providers.http as http_mod
 import src.providers.registry as registry_mod
+from src.providers.base import LLMProvider
 from src.providers.openai import OpenAIProvider
 
 
@@ -10,8 +18,6 @@ from src.providers.openai import OpenAIProvider
 def reset_registry(monkeypatch):
     """Clear the provider registry between tests."""
     monkeypatch.setattr(registry_mod, "_providers", {})
-    yield
-    monkeypatch.setattr(registry_mod, "_providers", {})
 
 
 class TestGetProvider:
@@ -25,6 +31,41 @@ class TestGetProvider:
         p2 = registry_mod.get_provider("openai")
         assert p1 is p2
 
+    def test_providers_share_canonical_base(self):
+        """One definition per provider module: no shadow copies of the base class."""
+        from src.providers.bedrock import BedrockProvider
+
+        src_root = Path(inspect.getfile(LLMProvider)).parent
+        assert Path(inspect.getfile(LLMProvider)) == src_root / "base.py"
+        for cls in (OpenAIProvider, BedrockProvider):
+            assert LLMProvider in cls.__mro__
+            assert Path(inspect.getfile(cls)).parent == src_root
+
+    def test_concurrent_first_use_creates_one_instance(self):
+        created = []
+        barrier = threading.Barrier(8)
+
+        class SlowProvider(OpenAIProvider):
+            def __init__(self):
+                created.append(self)
+                time.sleep(0.01)
+                super().__init__()
+
+        def worker(results):
+            barrier.wait()
+            results.append(registry_mod.get_provider("openai"))
+
+        results = []
+        with patch.object(registry_mod, "OpenAIProvider", SlowProvider):
+            threads = [threading.Thread(target=worker, args=(results,)) for _ in range(8)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+
+        assert len(created) == 1
+        assert all(p is results[0] for p in results)
+
     def test_unknown_provider_raises(self):
         with pytest.raises(ValueError, match="Unknown provider"):
             registry_mod.get_provider("fake-provider")
@@ -36,3 +77,29 @@ class TestCloseAllProviders:
         p = registry_mod.get_provider("openai")
         await registry_mod.close_all_providers()
         assert registry_mod._providers == {}
+
+    async def test_close_all_closes_shared_http_client(self):
+        client = http_mod.get_http_client()
+        await registry_mod.close_all_providers()
+        assert client.is_closed
+        assert http_mod._client is None
+
+
+class TestSharedHttpClient:
+
+    async def test_pool_settings(self, override_settings):
+        override_settings(UPSTREAM_MAX_CONNECTIONS="8", UPSTREAM_HTTP2="false")
+        await http_mod.close_http_client()
+        client = http_mod.get_http_client()
+        try:
+            pool = client._transport._pool
+            assert pool._max_connections == 8
+            assert pool._http2 is False
+        finally:
+            await http_mod.close_http_client()
+
+    async def test_recreated_after_close(self):
+        first = http_mod.get_http_client()
+        await http_mod.close_http_client()
+        assert http_mod.get_http_client() is not first
+        await http_mod.close_http_client()
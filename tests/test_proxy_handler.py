@@ -1,20 +1,22 @@
 """Tests for src/proxy/handler.py — proxy routing."""
 
+import asyncio
 from unittest.mock import AsyncMock, patch
 
 import pytest
 
 from src.clients.models import ClientConfig
 from src.providers.base import ProviderResponse
-from src.proxy.handler import forward_to_provider, close_client
+from src.proxy.handler import forward_to_provider, close_client, preflight_error
 import src.providers.registry as registry_mod
+import src.proxy.cache as cache_mod
+import src.proxy.handler as handler_mod
 
 
 @pytest.fixture(autouse=True)
 def reset_registry(monkeypatch):
     monkeypatch.setattr(registry_mod, "_providers", {})
-    yield
-    monkeypatch.setattr(registry_mod, "_providers", {})
+    monkeypatch.setattr(cache_mod, "_cache", None)
 
 
 class TestForwardToProvider:
@@ -56,9 +58,219 @@ class TestForwardToProvider:
             assert call_kwargs["model_id"] == "anthropic.claude-3"
 
 
+class TestRequestCoalescing:
+
+    @pytest.fixture
+    def client(self):
+        return ClientConfig(client_id="c1", api_key="k1", provider="openai")
+
+    @pytest.fixture
+    def slow_provider(self):
+        release = asyncio.Event()
+        provider = AsyncMock()
+
+        async def chat_completion(**kwargs):
+            await release.wait()
+            return ProviderResponse(status_code=200, body={"n": provider.chat_completion.await_count})
+
+        provider.chat_completion.side_effect = chat_completion
+        provider.release = release
+        with patch("src.proxy.handler.get_provider", return_value=provider):
+            yield provider
+
+    async def _burst(self, provider, bodies_and_clients):
+        tasks = [asyncio.create_task(forward_to_provider(b, c)) for b, c in bodies_and_clients]
+        await asyncio.sleep(0)
+        provider.release.set()
+        return await asyncio.gather(*tasks)
+
+    async def test_identical_requests_share_one_call(self, override_settings, client, slow_provider):
+        override_settings(REQUEST_COALESCING="true")
+        body = {"model": "gpt-4o", "messages": [{"role": "user", "content": "hi"}], "temperature": 0}
+
+        results = await self._burst(slow_provider, [(body, client)] * 5)
+
+        assert slow_provider.chat_completion.await_count == 1
+        assert all(r is results[0] for r in results)
+        assert handler_mod._inflight == {}
+
+    @pytest.mark.parametrize("body", [
+        {"model": "gpt-4o", "messages": []},
+        {"model": "gpt-4o", "messages": [], "temperature": 0.5},
+        {"model": "gpt-4o", "messages": [], "temperature": False},
+    ])
+    async def test_sampled_requests_not_coalesced(self, override_settings, client, slow_provider, body):
+        override_settings(REQUEST_COALESCING="true")
+        await self._burst(slow_provider, [(body, client)] * 3)
+        assert slow_provider.chat_completion.await_count == 3
+
+    async def test_scoped_per_client(self, override_settings, client, slow_provider):
+        override_settings(REQUEST_COALESCING="true")
+        body = {"model": "gpt-4o", "messages": [], "temperature": 0}
+        other = ClientConfig(client_id="c2", api_key="k2", provider="openai")
+
+        await self._burst(slow_provider, [(body, client), (body, other)])
+        assert slow_provider.chat_completion.await_count == 2
+
+    async def test_output_options_not_shared(self, override_settings, client, slow_provider):
+        override_settings(REQUEST_COALESCING="true")
+        body = {"model": "gpt-4o", "messages": [], "temperature": 0}
+        json_body = dict(body, response_format={"type": "json_object"})
+
+        await self._burst(slow_provider, [(body, client), (json_body, client)])
+        assert slow_provider.chat_completion.await_count == 2
+
+    async def test_disabled_by_default(self, override_settings, client, slow_provider):
+        override_settings()
+        body = {"model": "gpt-4o", "messages": [], "temperature": 0}
+        await self._burst(slow_provider, [(body, client)] * 3)
+        assert slow_provider.chat_completion.await_count == 3
+
+    async def test_error_shared_and_cleared(self, override_settings, client):
+        override_settings(REQUEST_COALESCING="true")
+        provider = AsyncMock()
+        provider.chat_completion.side_effect = RuntimeError("upstream down")
+        body = {"model": "gpt-4o", "messages": [], "temperature": 0}
+
+        with patch("src.proxy.handler.get_provider", return_value=provider):
+            results = await asyncio.gather(
+                forward_to_provider(body, client), forward_to_provider(body, client),
+                return_exceptions=True,
+            )
+
+        assert all(isinstance(r, RuntimeError) for r in results)
+        assert provider.chat_completion.await_count == 1
+        assert handler_mod._inflight == {}
+
+
+class TestPreflightError:
+
+    @pytest.fixture
+    def client(self):
+        return ClientConfig(client_id="c1", api_key="k1")
+
+    @pytest.mark.parametrize("body", [{}, {"messages": []}, {"messages": "hi"}])
+    def test_rejects_missing_messages(self, client, body):
+        assert preflight_error(body, client) is not None
+
+    def test_no_limit_by_default(self, override_settings, client):
+        override_settings()
+        body = {"messages": [{"role": "user", "content": "x" * 100_000}]}
+        assert preflight_error(body, client) is None
+
+    def test_global_limit_counts_text_parts(self, override_settings, client):
+        override_settings(MAX_PROMPT_CHARS="10")
+        body = {"messages": [
+            {"role": "system", "content": "12345"},
+            {"role": "user", "content": [
+                {"type": "text", "text": "678"},
+                {"type": "image_url", "image_url": {"url": "data:" + "A" * 500}},
+            ]},
+        ]}
+        assert preflight_error(body, client) is None
+        body["messages"].append({"role": "user", "content": "901"})
+        assert "limit 10" in preflight_error(body, client)
+
+    def test_client_limit_overrides_global(self, override_settings):
+        override_settings(MAX_PROMPT_CHARS="1000")
+        client = ClientConfig(client_id="c1", api_key="k1", max_prompt_chars=5)
+        body = {"messages": [{"role": "user", "content": "123456"}]}
+        assert preflight_error(body, client) is not None
+
+
 class TestCloseClient:
 
     async def test_delegates_to_close_all(self):
         with patch("src.proxy.handler.close_all_providers", new_callable=AsyncMock) as mock_close:
             await close_client()
             mock_close.assert_called_once()
+
+
+class TestResponseCache:
+
+    @pytest.fixture
+    def client(self):
+        return ClientConfig(client_id="c1", api_key="k1", provider="openai")
+
+    @pytest.fixture
+    def mock_provider(self):
+        provider = AsyncMock()
+        provider.chat_completion.return_value = ProviderResponse(
+            status_code=200, body={"choices": [{"message": {"content": "cached"}}]}
+        )
+        with patch("src.proxy.handler.get_provider", return_value=provider):
+            yield provider
+
+    async def test_disabled_by_default(self, override_settings, client, mock_provider):
+        override_settings()
+        body = {"model": "gpt-4o", "messages": [], "temperature": 0}
+        await forward_to_provider(body, client)
+        await forward_to_provider(body, client)
+        assert mock_provider.chat_completion.call_count == 2
+        assert cache_mod._cache is None
+
+    async def test_identical_request_served_from_cache(self, override_settings, client, mock_provider):
+        override_settings(RESPONSE_CACHE_TTL="60")
+        body = {"model": "gpt-4o", "messages": [{"role": "user", "content": "hi"}], "temperature": 0}
+
+        first = await forward_to_provider(body, client)
+        second = await forward_to_provider(dict(body, user="someone-else"), client)
+
+        assert mock_provider.chat_completion.call_count == 1
+        assert second is first
+        assert (cache_mod._cache.hits, cache_mod._cache.misses) == (1, 1)
+
+    async def test_scoped_per_client(self, override_settings, client, mock_provider):
+        override_settings(RESPONSE_CACHE_TTL="60")
+        body = {"model": "gpt-4o", "messages": [], "temperature": 0}
+        other = ClientConfig(client_id="c2", api_key="k2", provider="openai")
+
+        await forward_to_provider(body, client)
+        await forward_to_provider(body, other)
+        assert mock_provider.chat_completion.call_count == 2
+
+    @pytest.mark.parametrize("option", [
+        {"response_format": {"type": "json_object"}},
+        {"tools": [{"type": "function", "function": {"name": "lookup"}}]},
+        {"tool_choice": "none"}, {"n": 2}, {"seed": 7}, {"logit_bias": {"50256": -100}},
+        {"presence_penalty": 0.5}, {"max_completion_tokens": 16}, {"logprobs": True},
+    ])
+    async def test_output_options_are_part_of_key(self, override_settings, client, mock_provider, option):
+        override_settings(RESPONSE_CACHE_TTL="60")
+        body = {"model": "gpt-4o", "messages": [{"role": "user", "content": "hi"}], "temperature": 0}
+
+        await forward_to_provider(body, client)
+        await forward_to_provider(dict(body, **option), client)
+        assert mock_provider.chat_completion.call_count == 2
+
+    @pytest.mark.parametrize("body", [
+        {"model": "gpt-4o", "messages": []},  # default temperature 1.0
+        {"model": "gpt-4o", "messages": [], "temperature": 0.7},
+        {"model": "gpt-4o", "messages": [], "temperature": 0, "stream": True},
+    ])
+    async def test_uncacheable_requests(self, override_settings, client, mock_provider, body):
+        override_settings(RESPONSE_CACHE_TTL="60")
+        await forward_to_provider(body, client)
+        await forward_to_provider(body, client)
+        assert mock_provider.chat_completion.call_count == 2
+
+    async def test_error_responses_not_cached(self, override_settings, client, mock_provider):
+        override_settings(RESPONSE_CACHE_TTL="60")
+        mock_provider.chat_completion.return_value = ProviderResponse(status_code=500, body={})
+        body = {"model": "gpt-4o", "messages": [], "temperature": 0}
+
+        await forward_to_provider(body, client)
+        await forward_to_provider(body, client)
+        assert mock_provider.chat_completion.call_count == 2
+
+    def test_expiry_and_lru_eviction(self):
+        cache = cache_mod.ResponseCache(ttl=60, max_size=2)
+        responses = [ProviderResponse(status_code=200, body={"n": i}) for i in range(3)]
+        for i, response in enumerate(responses):
+            cache.put(bytes([i]), response)
+
+        assert cache.get(bytes([0])) is None  # evicted
+        assert cache.get(bytes([2])) is responses[2]
+
+        with patch("src.proxy.cache.time.monotonic", return_value=float("inf")):
+            assert cache.get(bytes([2])) is None
@@ -1,18 +1,28 @@
-"""Tests for src/security/ratelimit.py — sliding window rate limiter."""
+"""Tests for src/security/ratelimit.py — token bucket / sliding window rate limiter."""
 
 from unittest.mock import patch
 
 import pytest
 
-from src.security.ratelimit import check_rate_limit, reset_client, _client_windows
+import src.security.ratelimit as ratelimit_mod
+from src.security.ratelimit import check_rate_limit, reset_client, _buckets, _client_windows
 
 
 @pytest.fixture(autouse=True)
 def clean_rate_limits():
     """Clear all rate limit state between tests."""
     _client_windows.clear()
+    _buckets.clear()
     yield
     _client_windows.clear()
+    _buckets.clear()
+
+
+@pytest.fixture(autouse=True, params=["token_bucket", "sliding_window"])
+def algorithm(request, override_settings):
+    """Run every test against both algorithms."""
+    override_settings(RATE_LIMIT_ALGORITHM=request.param)
+    return request.param
 
 
 class TestCheckRateLimit:
@@ -50,18 +60,114 @@ class TestCheckRateLimit:
     async def test_window_expiry(self):
         """After window expires, requests should be allowed again."""
         # Fill up the limit
-        with patch("src.security.ratelimit.time.monotonic", return_value=1000.0):
+        with patch("src.security.ratelimit.time.monotonic_ns", return_value=1_000 * 10**9):
             for _ in range(5):
                 await check_rate_limit("client-1", limit=5)
             result = await check_rate_limit("client-1", limit=5)
             assert result.allowed is False
 
         # Jump forward past the 60s window
-        with patch("src.security.ratelimit.time.monotonic", return_value=1061.0):
+        with patch("src.security.ratelimit.time.monotonic_ns", return_value=1_061 * 10**9):
             result = await check_rate_limit("client-1", limit=5)
             assert result.allowed is True
             assert result.remaining == 4
 
+    async def test_reset_seconds_from_ns_window(self):
+        """reset_seconds counts down to when the oldest request leaves the window."""
+        with patch("src.security.ratelimit.time.monotonic_ns", return_value=1_000 * 10**9):
+            await check_rate_limit("client-1", limit=1)
+        with patch("src.security.ratelimit.time.monotonic_ns", return_value=1_045 * 10**9):
+            result = await check_rate_limit("client-1", limit=1)
+        assert result.allowed is False
+        assert result.reset_seconds == 15.0
+
+    async def test_headers(self):
+        result = await check_rate_limit("client-1", limit=5)
+        assert result.headers() == {
+            "X-RateLimit-Limit": "5",
+            "X-RateLimit-Remaining": "4",
+            "X-RateLimit-Reset": str(int(result.reset_seconds)),
+        }
+
+
+class TestTokenBucket:
+
+    @pytest.fixture(autouse=True)
+    def algorithm(self, override_settings):
+        override_settings(RATE_LIMIT_ALGORITHM="token_bucket")
+
+    async def test_partial_refill(self):
+        """Tokens refill continuously: 12s at 5/min buys exactly one request."""
+        with patch("src.security.ratelimit.time.monotonic_ns", return_value=1_000 * 10**9):
+            for _ in range(5):
+                await check_rate_limit("client-1", limit=5)
+        with patch("src.security.ratelimit.time.monotonic_ns", return_value=1_012 * 10**9):
+            assert (await check_rate_limit("client-1", limit=5)).allowed is True
+            assert (await check_rate_limit("client-1", limit=5)).allowed is False
+
+    async def test_state_is_one_tuple_per_client(self):
+        for _ in range(50):
+            await check_rate_limit("client-1", limit=100)
+        assert set(_buckets) == {"client-1"}
+        assert not _client_windows
+
+
+class TestSlidingWindow:
+
+    @pytest.fixture(autouse=True)
+    def algorithm(self, override_settings):
+        override_settings(RATE_LIMIT_ALGORITHM="sliding_window")
+
+    async def test_expired_timestamps_trimmed_from_head(self):
+        for second in (1_000, 1_030, 1_050):
+            with patch("src.security.ratelimit.time.monotonic_ns", return_value=second * 10**9):
+                await check_rate_limit("client-1", limit=10)
+        with patch("src.security.ratelimit.time.monotonic_ns", return_value=1_070 * 10**9):
+            result = await check_rate_limit("client-1", limit=10)
+
+        # 1_000 fell out of the window; 1_030, 1_050 and 1_070 remain, oldest first
+        assert list(_client_windows["client-1"]) == [1_030 * 10**9, 1_050 * 10**9, 1_070 * 10**9]
+        assert result.remaining == 7
+        assert not _buckets
+
+
+class TestClientEviction:
+
+    @staticmethod
+    def _state(algorithm):
+        return _buckets if algorithm == "token_bucket" else _client_windows
+
+    async def test_idle_clients_dropped(self, algorithm):
+        """A client idle for a full window is swept on the next check."""
+        with patch("src.security.ratelimit.time.monotonic_ns", return_value=1_000 * 10**9):
+            await check_rate_limit("idle", limit=5)
+        with patch("src.security.ratelimit.time.monotonic_ns", return_value=1_061 * 10**9):
+            await check_rate_limit("active", limit=5)
+        assert list(self._state(algorithm)) == ["active"]
+
+    async def test_recent_clients_kept(self, algorithm):
+        with patch("src.security.ratelimit.time.monotonic_ns", return_value=1_000 * 10**9):
+            await check_rate_limit("a", limit=5)
+        with patch("src.security.ratelimit.time.monotonic_ns", return_value=1_030 * 10**9):
+            await check_rate_limit("b", limit=5)
+        assert list(self._state(algorithm)) == ["a", "b"]
+
+    async def test_capped_at_max_clients_lru(self, algorithm, monkeypatch):
+        monkeypatch.setattr(ratelimit_mod, "MAX_CLIENTS", 2)
+        await check_rate_limit("a", limit=5)
+        await check_rate_limit("b", limit=5)
+        await check_rate_limit("a", limit=5)  # touch: b is now least recently used
+        await check_rate_limit("c", limit=5)
+        assert list(self._state(algorithm)) == ["a", "c"]
+
+
+    async def test_denied_unknown_client_not_stored(self, algorithm):
+        """A rejected first request (limit 0) leaves no per-client state."""
+        result = await check_rate_limit("probe", limit=0)
+        assert result.allowed is False
+        assert result.reset_seconds == 60.0
+        assert "probe" not in self._state(algorithm)
+
 
 class TestResetClient:
 
@@ -1,6 +1,6 @@
 """Tests for src/config/settings.py — Settings and api_keys_list."""
 
-from src.config.settings import Settings, get_settings
+from src.config.settings import get_settings
 
 
 class TestSettings:
@@ -17,17 +17,34 @@ class TestSettings:
     def test_api_keys_list_single(self, override_settings):
         override_settings(GATEWAY_API_KEYS="my-key")
         s = get_settings()
-        assert s.api_keys_list == ["my-key"]
+        assert s.api_keys_list == frozenset({"my-key"})
 
     def test_api_keys_list_multiple(self, override_settings):
         override_settings(GATEWAY_API_KEYS="key1, key2 , key3")
         s = get_settings()
-        assert s.api_keys_list == ["key1", "key2", "key3"]
+        assert s.api_keys_list == frozenset({"key1", "key2", "key3"})
 
     def test_api_keys_list_strips_empty(self, override_settings):
         override_settings(GATEWAY_API_KEYS="k1,,k2,")
         s = get_settings()
-        assert s.api_keys_list == ["k1", "k2"]
+        assert s.api_keys_list == frozenset({"k1", "k2"})
+
+    def test_api_keys_list_parsed_once(self, override_settings):
+        override_settings(GATEWAY_API_KEYS="k1,k2")
+        s = get_settings()
+        assert s.api_keys_list is s.api_keys_list
+
+    def test_pii_modes_normalized(self, override_settings):
+        override_settings(PII_ACTION="Block", RESPONSE_PII_ACTION="LOG_ONLY")
+        s = get_settings()
+        assert s.pii_mode == "block"
+        assert s.response_pii_mode == "log_only"
+
+    def test_pii_modes_recomputed_after_cache_clear(self, override_settings):
+        override_settings(PII_ACTION="redact")
+        assert get_settings().pii_mode == "redact"
+        override_settings(PII_ACTION="block")
+        assert get_settings().pii_mode == "block"
 
     def test_env_override(self, override_settings):
         override_settings(
@@ -39,3 +56,17 @@ class TestSettings:
         assert s.injection_threshold == 0.5
         assert s.pii_action == "block"
         assert s.rate_limit_rpm == 120
+
+    def test_scanners_do_not_reread_env(self, override_settings, monkeypatch):
+        """Settings are parsed once; later env changes only apply after cache_clear()."""
+        from src.security.injection import scan_prompt
+        from src.security.pii import scan_for_pii
+
+        override_settings(PII_ACTION="redact", INJECTION_THRESHOLD="0.7")
+        scan_for_pii("SSN 123-45-6789")
+        monkeypatch.setenv("PII_ACTION", "block")
+        monkeypatch.setenv("INJECTION_THRESHOLD", "0.1")
+
+        assert scan_for_pii("SSN 123-45-6789").redacted_content == "SSN [REDACTED_SSN]"
+        assert scan_prompt("you are now a pirate").allowed is True
+        assert get_settings.cache_info().currsize == 1
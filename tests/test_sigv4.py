@@ -0,0 +1,60 @@
+"""Tests for src/providers/sigv4.py — SigV4 signing-key cache."""
+
+import pytest
+from botocore.auth import SigV4Auth
+from botocore.awsrequest import AWSRequest
+from botocore.credentials import Credentials
+
+import src.providers.sigv4 as sigv4_mod
+from src.providers.sigv4 import CachedSigV4Auth, signing_key
+
+
+@pytest.fixture(autouse=True)
+def clear_signing_keys(monkeypatch):
+    monkeypatch.setattr(sigv4_mod, "_signing_keys", {})
+
+
+def _request() -> AWSRequest:
+    request = AWSRequest(
+        method="POST",
+        url="https://bedrock-runtime.us-east-1.amazonaws.com/model/m/converse",
+        data=b'{"messages":[]}',
+        headers={"Content-Type": "application/json"},
+    )
+    request.context["timestamp"] = "20260115T120000Z"
+    return request
+
+
+class TestCachedSigV4Auth:
+
+    def test_signature_matches_botocore(self):
+        creds = Credentials("AKIDEXAMPLE", "wJalrXUtnFEMI/K7MDENG+bPxRfiCYEXAMPLEKEY")
+        string_to_sign = "AWS4-HMAC-SHA256\n20260115T120000Z\nscope\nhash"
+
+        expected = SigV4Auth(creds, "bedrock", "us-east-1").signature(string_to_sign, _request())
+        actual = CachedSigV4Auth(creds, "bedrock", "us-east-1").signature(string_to_sign, _request())
+        assert actual == expected
+
+    def test_signing_key_derived_once_per_day(self, monkeypatch):
+        calls = []
+        real_hmac = sigv4_mod._hmac
+        monkeypatch.setattr(sigv4_mod, "_hmac", lambda k, m: calls.append(m) or real_hmac(k, m))
+
+        first = signing_key("secret", "20260115", "us-east-1", "bedrock")
+        second = signing_key("secret", "20260115", "us-east-1", "bedrock")
+        assert first is second
+        assert len(calls) == 4
+
+        signing_key("secret", "20260116", "us-east-1", "bedrock")
+        assert len(calls) == 8
+
+    def test_rotated_credentials_get_new_key(self):
+        a = signing_key("secret-a", "20260115", "us-east-1", "bedrock")
+        b = signing_key("secret-b", "20260115", "us-east-1", "bedrock")
+        assert a != b
+
+    def test_cache_bounded(self, monkeypatch):
+        monkeypatch.setattr(sigv4_mod, "_MAX_KEYS", 2)
+        for day in range(5):
+            signing_key("secret", f"2026011{day}", "us-east-1", "bedrock")
+        assert len(sigv4_mod._signing_keys) <= 2
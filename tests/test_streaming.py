@@ -1,16 +1,19 @@
 """Integration tests for SSE streaming + response scanning in streaming mode."""
 
 import json
-from unittest.mock import AsyncMock, patch
+import logging
+import time
+from contextlib import asynccontextmanager
+from unittest.mock import patch
 
 import pytest
 import httpx
 
 import src.clients.factory as factory_mod
 import src.providers.registry as registry_mod
-from src.clients.models import ClientConfig
+from src.main import app
 from src.providers.base import ProviderResponse, StreamChunk
-from src.security.ratelimit import _client_windows
+from src.security.ratelimit import _buckets, _client_windows
 from tests.conftest import make_stream_chunks
 
 
@@ -19,32 +22,49 @@ def reset_singletons(monkeypatch):
     monkeypatch.setattr(factory_mod, "_store", None)
     monkeypatch.setattr(registry_mod, "_providers", {})
     _client_windows.clear()
+    _buckets.clear()
     yield
-    monkeypatch.setattr(factory_mod, "_store", None)
-    monkeypatch.setattr(registry_mod, "_providers", {})
     _client_windows.clear()
+    _buckets.clear()
+
+
+class _FakeProvider:
+    """Provider double: streams the given chunks, returns a canned completion."""
 
+    def __init__(self, stream_chunks: list[StreamChunk], response: ProviderResponse | None = None):
+        self.stream_chunks = stream_chunks
+        self.response = response or ProviderResponse(
+            status_code=200,
+            body={"choices": [{"message": {"content": "Hello!"}}]},
+        )
 
-def _make_mock_provider(stream_chunks: list[StreamChunk]):
-    """Create a mock provider with streaming support."""
-    provider = AsyncMock()
-    provider.chat_completion.return_value = ProviderResponse(
-        status_code=200,
-        body={"choices": [{"message": {"content": "Hello!"}}]},
-    )
+    async def chat_completion(self, body, api_key, model_id):
+        return self.response
 
-    async def mock_stream(*args, **kwargs):
-        for chunk in stream_chunks:
+    async def chat_completion_stream(self, body, api_key, model_id):
+        for chunk in self.stream_chunks:
             yield chunk
 
-    provider.chat_completion_stream = mock_stream
-    return provider
+
+# Request bodies shared by most tests (never mutated)
+_HI = {"model": "gpt-4o", "messages": [{"role": "user", "content": "hi"}]}
+_HI_STREAM = {**_HI, "stream": True}
+
+
+def _sse_payloads(text: str) -> list[str]:
+    """Payloads of the 'data: ...' events in an SSE body, checking the framing."""
+    events = [e for e in text.split("\n\n") if e.strip()]
+    assert all(e.startswith("data: ") for e in events), events
+    return [e.removeprefix("data: ") for e in events]
 
 
 @pytest.fixture
 def stream_app_client(override_settings, clients_json_file):
-    """Factory fixture: create an app client with a specific mock provider."""
-    def _make(stream_chunks: list[StreamChunk], **extra_settings):
+    """Factory fixture: `async with stream_app_client(chunks) as client` serves the
+    app against a fake provider; the patch and client are undone on exit."""
+    @asynccontextmanager
+    async def _make(stream_chunks: list[StreamChunk], response: ProviderResponse | None = None,
+                    **extra_settings):
         settings = {
             "CLIENT_STORE_BACKEND": "json",
             "CLIENT_CONFIG_PATH": clients_json_file,
@@ -56,15 +76,13 @@ def stream_app_client(override_settings, clients_json_file):
             **extra_settings,
         }
         override_settings(**settings)
-        mock_provider = _make_mock_provider(stream_chunks)
-        ctx = patch("src.proxy.handler.get_provider", return_value=mock_provider)
-        mock_get = ctx.start()
-        from src.main import app
-        transport = httpx.ASGITransport(app=app)
-        client = httpx.AsyncClient(transport=transport, base_url="http://test")
-        return client, ctx, mock_provider
+        provider = _FakeProvider(stream_chunks, response)
+        with patch("src.proxy.handler.get_provider", return_value=provider):
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                yield client
 
-    yield _make
+    return _make
 
 
 class TestStreamingSSEFormat:
@@ -72,66 +90,93 @@ class TestStreamingSSEFormat:
     async def test_stream_returns_sse_events(self, stream_app_client):
         """Verify SSE format: 'data: ...\n\n' per event, ending with [DONE]."""
         chunks = make_stream_chunks("Hello world")
-        client, ctx, _ = stream_app_client(chunks)
-        try:
+        async with stream_app_client(chunks) as client:
             resp = await client.post(
                 "/v1/chat/completions",
-                json={"model": "gpt-4o", "messages": [{"role": "user", "content": "hi"}], "stream": True},
+                json=_HI_STREAM,
                 headers={"X-API-Key": "key-aaa-111"},
             )
             assert resp.status_code == 200
             assert resp.headers["content-type"].startswith("text/event-stream")
 
-            # Parse SSE events
-            events = [e for e in resp.text.split("\n\n") if e.strip()]
-            # Each event should start with "data: "
-            for event in events:
-                assert event.startswith("data: ")
-
-            # Last event should be [DONE]
-            assert events[-1].strip() == "data: [DONE]"
-        finally:
-            ctx.stop()
-            await client.aclose()
+            # Every event is a "data: " line; the last one is [DONE]
+            assert _sse_payloads(resp.text)[-1] == "[DONE]"
 
     async def test_stream_content_chunks(self, stream_app_client):
         """Verify that streamed chunk data contains proper JSON."""
         chunks = make_stream_chunks("Hi")
-        client, ctx, _ = stream_app_client(chunks)
-        try:
+        async with stream_app_client(chunks) as client:
             resp = await client.post(
                 "/v1/chat/completions",
-                json={"model": "gpt-4o", "messages": [{"role": "user", "content": "hi"}], "stream": True},
+                json=_HI_STREAM,
                 headers={"X-API-Key": "key-aaa-111"},
             )
-            events = [e for e in resp.text.split("\n\n") if e.strip()]
             # First content event should be valid JSON with delta
-            first_data = events[0].replace("data: ", "", 1)
-            parsed = json.loads(first_data)
+            parsed = json.loads(_sse_payloads(resp.text)[0])
             assert parsed["object"] == "chat.completion.chunk"
             assert "delta" in parsed["choices"][0]
+
+    async def test_stream_bytes_chunks(self, stream_app_client):
+        """Providers may hand back pre-serialized bytes payloads."""
+        chunks = [
+            StreamChunk(data=b'{"choices":[{"delta":{"content":"Hi"}}]}', is_done=False, text_delta="Hi"),
+            StreamChunk(data="[DONE]", is_done=True, text_delta=""),
+        ]
+        async with stream_app_client(chunks) as client:
+            resp = await client.post(
+                "/v1/chat/completions",
+                json=_HI_STREAM,
+                headers={"X-API-Key": "key-aaa-111"},
+            )
+            assert _sse_payloads(resp.text) == ['{"choices":[{"delta":{"content":"Hi"}}]}', "[DONE]"]
+
+
+class TestStreamingAuditLog:
+
+    async def test_stream_log_includes_client_context(self, stream_app_client):
+        """Stream completion log carries client_id/client_ip from the request context."""
+        from src.logging.audit import JSONFormatter, get_audit_logger
+
+        records = []
+
+        class _Capture(logging.Handler):
+            def emit(self, record):
+                records.append(json.loads(JSONFormatter().format(record)))
+
+        handler = _Capture()
+        logger = get_audit_logger()
+        original_level = logger.level
+        logger.setLevel(logging.INFO)
+        logger.addHandler(handler)
+        chunks = make_stream_chunks("ok")
+        try:
+            async with stream_app_client(chunks) as client:
+                await client.post(
+                    "/v1/chat/completions",
+                    json=_HI_STREAM,
+                    headers={"X-API-Key": "key-aaa-111"},
+                )
+            completed = [r for r in records if r["message"] == "Stream completed"]
+            assert completed[0]["client_id"] == "client-a"
+            assert "client_ip" in completed[0]
         finally:
-            ctx.stop()
-            await client.aclose()
+            logger.removeHandler(handler)
+            logger.setLevel(original_level)
 
 
 class TestStreamingHeaders:
 
     async def test_stream_has_rate_limit_headers(self, stream_app_client):
         chunks = make_stream_chunks("ok")
-        client, ctx, _ = stream_app_client(chunks)
-        try:
+        async with stream_app_client(chunks) as client:
             resp = await client.post(
                 "/v1/chat/completions",
-                json={"model": "gpt-4o", "messages": [{"role": "user", "content": "hi"}], "stream": True},
+                json=_HI_STREAM,
                 headers={"X-API-Key": "key-aaa-111"},
             )
             assert "x-request-id" in resp.headers
             assert "x-ratelimit-limit" in resp.headers
             assert resp.headers.get("cache-control") == "no-cache"
-        finally:
-            ctx.stop()
-            await client.aclose()
 
 
 class TestStreamingSecurityPipeline:
@@ -139,8 +184,7 @@ class TestStreamingSecurityPipeline:
     async def test_injection_blocked_before_stream(self, stream_app_client):
         """Injection scan runs before streaming starts — should return 400 JSON."""
         chunks = make_stream_chunks("ok")
-        client, ctx, _ = stream_app_client(chunks)
-        try:
+        async with stream_app_client(chunks) as client:
             resp = await client.post(
                 "/v1/chat/completions",
                 json={
@@ -152,31 +196,20 @@ class TestStreamingSecurityPipeline:
             )
             assert resp.status_code == 400
             assert "security policy" in resp.json()["error"]
-        finally:
-            ctx.stop()
-            await client.aclose()
 
     async def test_rate_limit_before_stream(self, stream_app_client):
         """Rate limit applies before streaming starts."""
         chunks = make_stream_chunks("ok")
-        client, ctx, _ = stream_app_client(chunks)
-        try:
-            # Exhaust rate limit (client-a has 30 rpm)
-            for _ in range(30):
-                await client.post(
-                    "/v1/chat/completions",
-                    json={"model": "gpt-4o", "messages": [{"role": "user", "content": "hi"}], "stream": True},
-                    headers={"X-API-Key": "key-aaa-111"},
-                )
+        async with stream_app_client(chunks) as client:
+            # client-a's bucket is already empty; exhausting it end to end is
+            # TestRateLimiting's job in test_main
+            _buckets["client-a"] = (0.0, time.monotonic_ns())
             resp = await client.post(
                 "/v1/chat/completions",
-                json={"model": "gpt-4o", "messages": [{"role": "user", "content": "hi"}], "stream": True},
+                json=_HI_STREAM,
                 headers={"X-API-Key": "key-aaa-111"},
             )
             assert resp.status_code == 429
-        finally:
-            ctx.stop()
-            await client.aclose()
 
 
 class TestStreamResponseScanning:
@@ -184,89 +217,69 @@ class TestStreamResponseScanning:
     async def test_clean_stream_sends_done(self, stream_app_client):
         """Clean response: stream completes with [DONE]."""
         chunks = make_stream_chunks("The weather is sunny today.")
-        client, ctx, _ = stream_app_client(chunks)
-        try:
+        async with stream_app_client(chunks) as client:
             resp = await client.post(
                 "/v1/chat/completions",
-                json={"model": "gpt-4o", "messages": [{"role": "user", "content": "hi"}], "stream": True},
+                json=_HI_STREAM,
                 headers={"X-API-Key": "key-aaa-111"},
             )
             assert "data: [DONE]" in resp.text
-        finally:
-            ctx.stop()
-            await client.aclose()
 
     async def test_pii_in_stream_log_only(self, stream_app_client):
         """PII in response with log_only — stream completes normally."""
         chunks = make_stream_chunks("Contact me at user@example.com")
-        client, ctx, _ = stream_app_client(chunks, RESPONSE_PII_ACTION="log_only", PII_ACTION="log_only")
-        try:
+        async with stream_app_client(chunks, RESPONSE_PII_ACTION="log_only", PII_ACTION="log_only") as client:
             resp = await client.post(
                 "/v1/chat/completions",
-                json={"model": "gpt-4o", "messages": [{"role": "user", "content": "hi"}], "stream": True},
+                json=_HI_STREAM,
                 headers={"X-API-Key": "key-aaa-111"},
             )
             assert "data: [DONE]" in resp.text
-        finally:
-            ctx.stop()
-            await client.aclose()
 
     async def test_pii_in_stream_block_mode(self, stream_app_client):
         """PII in response with block mode — error event instead of [DONE]."""
         chunks = make_stream_chunks("Contact me at user@example.com")
-        client, ctx, _ = stream_app_client(chunks, RESPONSE_PII_ACTION="block", PII_ACTION="block")
-        try:
+        async with stream_app_client(chunks, RESPONSE_PII_ACTION="block", PII_ACTION="block") as client:
             resp = await client.post(
                 "/v1/chat/completions",
-                json={"model": "gpt-4o", "messages": [{"role": "user", "content": "hi"}], "stream": True},
+                json=_HI_STREAM,
                 headers={"X-API-Key": "key-aaa-111"},
             )
             assert "data: [DONE]" not in resp.text
             # Should contain an error event
-            events = [e for e in resp.text.split("\n\n") if e.strip()]
-            last_data = events[-1].replace("data: ", "", 1)
-            parsed = json.loads(last_data)
+            parsed = json.loads(_sse_payloads(resp.text)[-1])
             assert "error" in parsed
             assert "blocked" in parsed["error"].lower() or "sensitive" in parsed["error"].lower()
-        finally:
-            ctx.stop()
-            await client.aclose()
 
 
 class TestLambdaStreamingGuard:
 
-    async def test_lambda_rejects_stream(self, stream_app_client, monkeypatch):
-        """Streaming on Lambda returns 400."""
+    @pytest.fixture(autouse=True)
+    def on_lambda(self, monkeypatch):
         monkeypatch.setenv("AWS_LAMBDA_FUNCTION_NAME", "my-gateway-lambda")
+
+    async def test_lambda_rejects_stream(self, stream_app_client):
+        """Streaming on Lambda returns 400."""
         chunks = make_stream_chunks("ok")
-        client, ctx, _ = stream_app_client(chunks)
-        try:
+        async with stream_app_client(chunks) as client:
             resp = await client.post(
                 "/v1/chat/completions",
-                json={"model": "gpt-4o", "messages": [{"role": "user", "content": "hi"}], "stream": True},
+                json=_HI_STREAM,
                 headers={"X-API-Key": "key-aaa-111"},
             )
             assert resp.status_code == 400
             assert "streaming" in resp.json()["error"].lower()
-        finally:
-            ctx.stop()
-            await client.aclose()
 
-    async def test_non_stream_works_on_lambda(self, stream_app_client, monkeypatch):
+    async def test_non_stream_works_on_lambda(self, stream_app_client):
         """Non-streaming requests still work on Lambda."""
-        monkeypatch.setenv("AWS_LAMBDA_FUNCTION_NAME", "my-gateway-lambda")
         chunks = make_stream_chunks("ok")
-        client, ctx, _ = stream_app_client(chunks)
-        try:
+        async with stream_app_client(chunks) as client:
             resp = await client.post(
                 "/v1/chat/completions",
-                json={"model": "gpt-4o", "messages": [{"role": "user", "content": "hi"}]},
+                json=_HI,
                 headers={"X-API-Key": "key-aaa-111"},
             )
             assert resp.status_code == 200
-        finally:
-            ctx.stop()
-            await client.aclose()
 
 
 class TestNonStreamingResponseScan:
@@ -274,41 +287,36 @@ class TestNonStreamingResponseScan:
     async def test_response_pii_blocked_non_streaming(self, stream_app_client):
         """PII in non-streaming response with block mode triggers 400."""
         # Provider returns response with PII
-        provider = AsyncMock()
-        provider.chat_completion.return_value = ProviderResponse(
+        response = ProviderResponse(
             status_code=200,
             body={"choices": [{"message": {"content": "Your SSN is 123-45-6789"}}]},
         )
-        chunks = make_stream_chunks("ok")
-        client, ctx, _ = stream_app_client(chunks, RESPONSE_PII_ACTION="block", PII_ACTION="block")
-        ctx.stop()
-
-        with patch("src.proxy.handler.get_provider", return_value=provider):
+        async with stream_app_client([], response, RESPONSE_PII_ACTION="block", PII_ACTION="block") as client:
             resp = await client.post(
                 "/v1/chat/completions",
-                json={"model": "gpt-4o", "messages": [{"role": "user", "content": "hi"}]},
+                json=_HI,
                 headers={"X-API-Key": "key-aaa-111"},
             )
             assert resp.status_code == 400
             assert "sensitive data" in resp.json()["error"].lower() or "blocked" in resp.json()["error"].lower()
-        await client.aclose()
 
     async def test_response_pii_log_only_non_streaming(self, stream_app_client):
         """PII in non-streaming response with log_only — passes through."""
-        provider = AsyncMock()
-        provider.chat_completion.return_value = ProviderResponse(
+        response = ProviderResponse(
             status_code=200,
             body={"choices": [{"message": {"content": "Contact user@example.com"}}]},
         )
-        chunks = make_stream_chunks("ok")
-        client, ctx, _ = stream_app_client(chunks, RESPONSE_PII_ACTION="log_only", PII_ACTION="log_only")
-        ctx.stop()
-
-        with patch("src.proxy.handler.get_provider", return_value=provider):
+        async with stream_app_client([], response, RESPONSE_PII_ACTION="log_only", PII_ACTION="log_only") as client:
             resp = await client.post(
                 "/v1/chat/completions",
-                json={"model": "gpt-4o", "messages": [{"role": "user", "content": "hi"}]},
+                json=_HI,
                 headers={"X-API-Key": "key-aaa-111"},
             )
             assert resp.status_code == 200
-        await client.aclose()
+
+
+class TestStreamChunk:
+
+    def test_uses_slots(self):
+        chunk = StreamChunk(data="[DONE]", is_done=True, text_delta="")
+        assert not hasattr(chunk, "__dict__")